@@ -0,0 +1,185 @@
+"""
+Load-aware admission control for the agent worker.
+
+LiveKit only dispatches jobs to workers whose reported load is below
+`load_threshold`. The default load is average CPU, which lets a worker keep
+accepting calls while its sessions already degrade. `AdmissionController` is
+a `load_fnc` that reports the most saturated of four signals (active
+sessions, event-loop lag, CPU and RSS) and applies hysteresis: once the
+worker reports full it stays full until load falls well below the threshold.
+Creating the drain file (AGENT_DRAIN_FILE) marks the worker full so running
+calls finish while dispatch sends new ones elsewhere.
+
+Loop lag is measured where the audio runs. Each job's entrypoint starts a
+`LoopLagProbe`, a task that sleeps a fixed interval and records how late it
+wakes up. The probe writes its recent worst lag to a small file in
+AGENT_LOOP_LAG_DIR, and the controller, in the main worker process, reads
+the fresh ones.
+
+    WorkerOptions(..., load_fnc=AdmissionController(), load_threshold=REJECT_ABOVE)
+    start_loop_lag_probe()            # in the job entrypoint
+"""
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, Optional
+
+import psutil
+
+logger = logging.getLogger("admission")
+
+REJECT_ABOVE = float(os.getenv("AGENT_REJECT_ABOVE", "0.85"))
+ACCEPT_BELOW = float(os.getenv("AGENT_ACCEPT_BELOW", "0.65"))
+# Shared by the worker and its job processes, which inherit the environment
+LOOP_LAG_DIR = Path(os.getenv("AGENT_LOOP_LAG_DIR", str(Path(tempfile.gettempdir()) / f"agent-loop-lag-{os.getpid()}")))
+os.environ.setdefault("AGENT_LOOP_LAG_DIR", str(LOOP_LAG_DIR))
+# Probe files older than this belong to jobs that have stopped reporting
+LOOP_LAG_STALE_S = 5.0
+
+
+class LoopLagProbe:
+    """Sleeps `interval` on the running loop and keeps the worst wake-up delay of the last `window` seconds."""
+
+    def __init__(self, interval: float = 0.1, window: float = 2.0, lag_dir: Optional[Path] = None):
+        self.interval = interval
+        self.lags: Deque[float] = deque(maxlen=max(1, int(window / interval)))
+        self.path = (lag_dir or LOOP_LAG_DIR) / f"{os.getpid()}-{threading.get_ident()}"
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def lag(self) -> float:
+        return max(self.lags, default=0.0)
+
+    def start(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        last_write, written = 0.0, None
+        try:
+            while True:
+                start = time.monotonic()
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                self.lags.append(max(now - start - self.interval, 0.0))
+                value = f"{self.lag:.3f}"
+                # Write on change, and every second anyway so the file stays fresh
+                if value != written or now - last_write >= 1.0:
+                    tmp = self.path.with_suffix(".tmp")
+                    tmp.write_text(value)
+                    os.replace(tmp, self.path)
+                    last_write, written = now, value
+        finally:
+            self.path.unlink(missing_ok=True)
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+
+_probes: Dict[int, LoopLagProbe] = {}
+
+
+def start_loop_lag_probe() -> LoopLagProbe:
+    """One probe per event loop (a job process, or a job thread with the thread executor)."""
+    loop = asyncio.get_running_loop()
+    probe = _probes.get(id(loop))
+    if probe is None or probe._task is None or probe._task.done():
+        probe = _probes[id(loop)] = LoopLagProbe()
+        probe.start()
+    return probe
+
+
+def read_loop_lag(lag_dir: Path = LOOP_LAG_DIR, stale_after: float = LOOP_LAG_STALE_S) -> float:
+    """Worst lag any job loop reported recently."""
+    lag = 0.0
+    now = time.time()
+    try:
+        entries = list(os.scandir(lag_dir))
+    except FileNotFoundError:
+        return 0.0
+    for entry in entries:
+        if entry.name.endswith(".tmp"):
+            continue
+        try:
+            if now - entry.stat().st_mtime > stale_after:
+                continue
+            lag = max(lag, float(Path(entry.path).read_text() or 0.0))
+        except (OSError, ValueError):
+            continue
+    return lag
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_sessions: int = int(os.getenv("AGENT_MAX_SESSIONS", "25")),
+        max_loop_lag: float = float(os.getenv("AGENT_MAX_LOOP_LAG", "0.2")),
+        max_rss_mb: float = float(os.getenv("AGENT_MAX_RSS_MB", "4096")),
+        reject_above: float = REJECT_ABOVE,
+        accept_below: float = ACCEPT_BELOW,
+        drain_file: Optional[str] = os.getenv("AGENT_DRAIN_FILE"),
+        lag_dir: Path = LOOP_LAG_DIR,
+    ):
+        self.max_sessions = max_sessions
+        self.max_loop_lag = max_loop_lag
+        self.max_rss_mb = max_rss_mb
+        self.reject_above = reject_above
+        self.accept_below = accept_below
+        self.drain_file = Path(drain_file) if drain_file else None
+        self.lag_dir = lag_dir
+
+        self.rejecting = False
+        self.last_components: Dict[str, float] = {}
+        self._process = psutil.Process()
+        psutil.cpu_percent(interval=None)  # prime the counter
+
+    def _rss_mb(self) -> float:
+        rss = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                continue
+        return rss / (1024 * 1024)
+
+    def components(self, active_sessions: int) -> Dict[str, float]:
+        return {
+            "sessions": active_sessions / self.max_sessions,
+            "loop_lag": read_loop_lag(self.lag_dir) / self.max_loop_lag,
+            "cpu": psutil.cpu_percent(interval=None) / 100,
+            "rss": self._rss_mb() / self.max_rss_mb,
+        }
+
+    def draining(self) -> bool:
+        return self.drain_file is not None and self.drain_file.exists()
+
+    def score(self, active_sessions: int) -> float:
+        """Combine the signals, then apply drain mode and hysteresis."""
+        self.last_components = self.components(active_sessions)
+        load = min(max(self.last_components.values()), 1.0)
+
+        if self.draining():
+            if not self.rejecting:
+                logger.info("Drain file present, rejecting new jobs")
+            self.rejecting = True
+            return 1.0
+
+        if not self.rejecting and load >= self.reject_above:
+            self.rejecting = True
+            logger.warning(f"Worker overloaded ({load:.2f}), rejecting new jobs: {self.last_components}")
+        elif self.rejecting and load <= self.accept_below:
+            self.rejecting = False
+            logger.info(f"Worker load recovered ({load:.2f}), accepting jobs again")
+
+        # While rejecting, keep reporting at least the threshold so dispatch skips this worker
+        return max(load, self.reject_above) if self.rejecting else load
+
+    def __call__(self, worker=None) -> float:
+        active = len(worker.active_jobs) if worker is not None else 0
+        return self.score(active)
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
@@ -22,17 +23,55 @@ from livekit.agents import (
     metrics,
     function_tool,
     RunContext,
+    StopResponse,
     llm,
 )
-from livekit.plugins import silero, google, deepgram, noise_cancellation, murf
+from livekit.plugins import deepgram, noise_cancellation, murf
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
+from pydantic import BaseModel, Field
 
 try:
-    from src.cart import Cart
+    from src.cart import EMPTY_CART, Cart
     from src.order_manager import OrderManager
+    from src.phrase_cache import PhraseCache, say_cached, say_phrase
+    from src.llm_cache import LLMCacheStats, build_gemini_llm, build_static_prefix
+    from src.context_window import ContextWindow
+    from src.intent_router import Intent, IntentRouter
+    from src.admission import REJECT_ABOVE, AdmissionController, start_loop_lag_probe
+    from src.vad_batcher import load_vad
+    from src.stt_hedge import build_stt
+    from src.llm_hedge import HedgedLLM, hedge_llm
+    from src.session_state import SessionState, SessionStateSync, get_state_store, session_key
+    from src.menu_search import MenuIndex
+    from src.text_index import tokenize
+    from src.cart_commands import CartCommandQueue
+    from src.tool_tracing import TOOL_STATS, flush_tool_traces, setup_tool_tracing, traced_tool
+    from src.memory_accounting import MEMORY_TRACKER, setup_memory_accounting
+    from src.log_pipeline import drain_log_pipeline, log_pipeline_stats, setup_log_file, setup_log_pipeline
+    from src.usage_ledger import SessionUsage, get_usage_ledger
+    from src.sales_analytics import SalesAnalytics, get_sales_analytics
+    from src.order_events import publish_order
 except ImportError:
-    from cart import Cart
+    from cart import EMPTY_CART, Cart
     from order_manager import OrderManager
+    from phrase_cache import PhraseCache, say_cached, say_phrase
+    from llm_cache import LLMCacheStats, build_gemini_llm, build_static_prefix
+    from context_window import ContextWindow
+    from intent_router import Intent, IntentRouter
+    from admission import REJECT_ABOVE, AdmissionController, start_loop_lag_probe
+    from vad_batcher import load_vad
+    from stt_hedge import build_stt
+    from llm_hedge import HedgedLLM, hedge_llm
+    from session_state import SessionState, SessionStateSync, get_state_store, session_key
+    from menu_search import MenuIndex
+    from text_index import tokenize
+    from cart_commands import CartCommandQueue
+    from tool_tracing import TOOL_STATS, flush_tool_traces, setup_tool_tracing, traced_tool
+    from memory_accounting import MEMORY_TRACKER, setup_memory_accounting
+    from log_pipeline import drain_log_pipeline, log_pipeline_stats, setup_log_file, setup_log_pipeline
+    from usage_ledger import SessionUsage, get_usage_ledger
+    from sales_analytics import SalesAnalytics, get_sales_analytics
+    from order_events import publish_order
 
 logger = logging.getLogger("grocery-agent")
 
@@ -46,14 +85,159 @@ except Exception as e:
     logger.error(f"Failed to load catalog: {e}")
     CATALOG = []
 
+# Built once per process; answers descriptive questions about the menu
+MENU_INDEX = MenuIndex(CATALOG)
+
+
+class CartLine(BaseModel):
+    item_name: str = Field(description="The name of the item to add")
+    quantity: int = Field(1, description="The quantity to add")
+    notes: str = Field("", description="Any special notes (e.g., 'no onions')")
+
+
+GREETING = "Welcome to Burger King! Home of the Whopper. What can I get for you today?"
+
+# Cart confirmations. The fast path speaks them directly, so they are played from the phrase cache:
+# the fixed ones whole, the templated ones with only their values synthesized.
+ADDED_REPLY = "Added {items} to cart. Total: {total}"
+REMOVED_REPLY = "Removed {item} from your cart."
+NOT_IN_CART_REPLY = "I couldn't find '{item}' in your cart."
+CACHED_PHRASES = (GREETING, EMPTY_CART)
+CACHED_TEMPLATES = (ADDED_REPLY, REMOVED_REPLY, NOT_IN_CART_REPLY)
+
+# Fixed phrases are rendered once per voice and streamed from disk afterwards
+PHRASE_CACHE = PhraseCache(namespace="burgerking")
+
+LLM_MODEL = "gemini-2.5-flash"
+
 class GroceryAgent(Agent):
-    def __init__(self) -> None:
+    def __init__(self, analytics: Optional[SalesAnalytics] = None) -> None:
+        # Instructions + catalog form a byte-stable prefix so Gemini can cache it across turns
+        self.static_prefix = build_static_prefix(self._get_instructions(), catalog=CATALOG)
         super().__init__(
-            instructions=self._get_instructions(),
+            instructions=self.static_prefix.text,
         )
         self.cart = Cart()
-        self.order_manager = OrderManager(orders_dir=str(Path(__file__).parent.parent / "orders"))
+        # Every cart mutation goes through here, so repeated or speculative tool calls can't double up
+        self.cart_commands = CartCommandQueue(self.cart, on_change=self._save_state)
+        self.order_manager = OrderManager(
+            orders_dir=str(Path(__file__).parent.parent / "orders"),
+            # Passed in by the entrypoint, so tests and benchmarks don't write the shared rollups
+            analytics=analytics,
+            on_placed=publish_order,
+        )
         self.catalog_lookup = {item["name"].lower(): item for item in CATALOG}
+        self.catalog_tokens = [(set(tokenize(item["name"])), item) for item in CATALOG]
+        self.intent_router = IntentRouter(CATALOG)
+        self.context_window = ContextWindow(
+            state_hint="The cart may have changed since; call `view_cart` for its current contents instead of relying on earlier turns."
+        )
+        # Set by the entrypoint once the caller is known; snapshots the cart after each change
+        self.state_sync: Optional[SessionStateSync] = None
+        # Set by the entrypoint; calls that place an order are priced per order from it
+        self.usage: Optional[SessionUsage] = None
+
+    async def resume_state(self, state_sync: SessionStateSync) -> bool:
+        """Attach the session's state store and restore a cart left by an earlier connection."""
+        self.state_sync = state_sync
+        state = await state_sync.restore()
+        if state is None or not state.cart:
+            return False
+        state.restore_cart(self.cart)
+        logger.info(f"Restored cart with {len(self.cart.items)} items for {state_sync.key}")
+        return True
+
+    def _save_state(self) -> None:
+        if self.state_sync is None:
+            return
+        if self.cart.items:
+            self.state_sync.snapshot(SessionState.from_cart(self.cart))
+        else:
+            # Order placed (or everything removed): a new call from this caller should start fresh
+            self.state_sync.clear()
+
+    async def on_user_turn_completed(self, turn_ctx: llm.ChatContext, new_message: llm.ChatMessage) -> None:
+        # Simple cart commands are answered locally without an LLM round trip
+        intent = self.intent_router.route(new_message.text_content or "", in_cart=set(self.cart.items))
+        if intent:
+            reply = await self._run_intent(intent)
+            # StopResponse skips the framework's own append of the user message, so add it here; otherwise
+            # the templated reply below would follow no user turn in the history the LLM sees next
+            chat_ctx = self.chat_ctx.copy()
+            chat_ctx.items.append(new_message)
+            await self.update_chat_ctx(chat_ctx)
+            say_phrase(
+                self.session, PHRASE_CACHE, reply, phrases=CACHED_PHRASES, templates=CACHED_TEMPLATES, add_to_chat_ctx=True
+            )
+            raise StopResponse()
+
+        # Keep prompt size flat on long orders
+        await self.context_window.apply(self, turn_ctx)
+
+    async def _run_intent(self, intent: Intent) -> str:
+        if intent.action == "add":
+            return await self._add_item(intent.item, intent.quantity)
+        if intent.action == "remove":
+            return await self._remove_item(intent.item["name"], item_id=intent.item["id"])
+        return str(self.cart)
+
+    def _match_item(self, item_name: str) -> Optional[Dict[str, Any]]:
+        # Simple fuzzy match or direct lookup
+        item_key = item_name.lower()
+
+        # Exact match
+        if item_key in self.catalog_lookup:
+            return self.catalog_lookup[item_key]
+
+        # Partial match
+        for name, item in self.catalog_lookup.items():
+            if item_key in name or name in item_key:
+                return item
+
+        # Word match, for spoken forms like "large fries" or "pepsis": the most specific
+        # item whose name contains every word said
+        words = set(tokenize(item_name))
+        candidates = [(len(tokens - words), item) for tokens, item in self.catalog_tokens if words and words <= tokens]
+        return min(candidates, key=lambda c: c[0])[1] if candidates else None
+
+    async def _add_item(
+        self, matched_item: Dict[str, Any], quantity: int, notes: str = "", ctx: Optional[RunContext] = None
+    ) -> str:
+        def add(cart: Cart) -> str:
+            cart.add_item(
+                item_id=matched_item["id"],
+                name=matched_item["name"],
+                price=matched_item["price"],
+                quantity=quantity,
+                notes=notes
+            )
+            return ADDED_REPLY.format(items=f"{quantity}x {matched_item['name']}", total=f"₹{cart.get_total():.2f}")
+
+        args = {"item": matched_item["id"], "quantity": quantity, "notes": notes}
+        return await self.cart_commands.submit("add", args, add, ctx)
+
+    async def _remove_item(
+        self, item_name: str, ctx: Optional[RunContext] = None, item_id: Optional[str] = None
+    ) -> str:
+        def remove(cart: Cart) -> str:
+            # Find item in cart by id when the caller already resolved it, else by name
+            item_id_to_remove = None
+            if item_id is not None:
+                item_id_to_remove = item_id if item_id in cart.items else None
+            else:
+                for item in cart.items.values():
+                    if item_name.lower() in item.name.lower():
+                        item_id_to_remove = item.id
+                        break
+
+            if item_id_to_remove:
+                removed = cart.remove_item(item_id_to_remove)
+                return REMOVED_REPLY.format(item=removed.name)
+            else:
+                return NOT_IN_CART_REPLY.format(item=item_name)
+
+        args = {"item": item_id} if item_id is not None else {"item_name": item_name.lower()}
+        return await self.cart_commands.submit("remove", args, remove, ctx)
 
     def _get_instructions(self) -> str:
         return """
@@ -70,7 +254,7 @@ class GroceryAgent(Agent):
         5.  **Checkout:** Confirm the order and save it.
 
         **CATALOG:**
-        You have access to the Burger King menu, including these **SPECIAL DEALS**:
+        The full Burger King menu is listed in the CATALOG JSON below. It includes these **SPECIAL DEALS**:
         - **Whopper Meal Deal** (₹299): Whopper + Fries + Pepsi.
         - **Family Feast** (₹599): 2 Whoppers + 2 Fries + 2 Pepsis + Onion Rings.
         - **Snack Box** (₹199): Crispy Veg + Small Fries + Pepsi.
@@ -84,7 +268,9 @@ class GroceryAgent(Agent):
         - When the user says "that's all" or "place order", summarize the cart and ask for confirmation.
 
         **TOOLS:**
-        - `add_to_cart`: Add items.
+        - `search_menu`: Find items by description, taste, category or budget (e.g. "spicy chicken under ₹200"). Use it before guessing an item name.
+        - `add_to_cart`: Add one item.
+        - `add_items_to_cart`: Add several items at once (e.g. "two Whoppers, large fries and three Pepsis"). Use it instead of repeated `add_to_cart` calls.
         - `remove_from_cart`: Remove items.
         - `view_cart`: Get current cart state.
         - `place_order`: Finalize the order.
@@ -92,6 +278,7 @@ class GroceryAgent(Agent):
         """
 
     @function_tool
+    @traced_tool
     async def add_to_cart(
         self,
         ctx: RunContext,
@@ -100,68 +287,96 @@ class GroceryAgent(Agent):
         notes: Annotated[str, "Any special notes (e.g., 'no onions')"] = "",
     ):
         """Add an item to the cart. Tries to match item_name to catalog."""
-        logger.info(f"Tool add_to_cart called: {item_name} x{quantity}")
-        
-        # Simple fuzzy match or direct lookup
-        item_key = item_name.lower()
-        matched_item = None
-        
-        # Exact match
-        if item_key in self.catalog_lookup:
-            matched_item = self.catalog_lookup[item_key]
-        else:
-            # Partial match
-            for name, item in self.catalog_lookup.items():
-                if item_key in name or name in item_key:
-                    matched_item = item
-                    break
+        logger.info("Tool add_to_cart called: %s x%s", item_name, quantity)
         
+        matched_item = self._match_item(item_name)
         if not matched_item:
             return f"I couldn't find '{item_name}' in our menu. We have favorites like the Whopper, Chicken Royale, and more."
 
-        added_item = self.cart.add_item(
-            item_id=matched_item["id"],
-            name=matched_item["name"],
-            price=matched_item["price"],
-            quantity=quantity,
-            notes=notes
-        )
-        
-        return f"Added {quantity}x {matched_item['name']} to cart. Total: ₹{self.cart.get_total():.2f}"
+        return await self._add_item(matched_item, quantity, notes, ctx)
+
+    @function_tool
+    @traced_tool
+    async def add_items_to_cart(
+        self,
+        ctx: RunContext,
+        items: Annotated[List[CartLine], "Every item the user asked for, each with its quantity and notes"],
+    ):
+        """Add several items to the cart in one call. Prefer this whenever the user orders more than one item."""
+        logger.info("Tool add_items_to_cart called with %d lines", len(items))
+
+        # Resolve every line first, merging repeats of the same item
+        resolved: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for line in items:
+            matched_item = self._match_item(line.item_name)
+            if not matched_item or line.quantity <= 0:
+                missing.append(line.item_name)
+                continue
+            entry = resolved.setdefault(matched_item["id"], {"item": matched_item, "quantity": 0, "notes": []})
+            entry["quantity"] += line.quantity
+            if line.notes:
+                entry["notes"].append(line.notes)
+
+        def add_all(cart: Cart) -> str:
+            added = []
+            for entry in resolved.values():
+                item = entry["item"]
+                cart.add_item(item["id"], item["name"], item["price"], entry["quantity"], ", ".join(entry["notes"]))
+                added.append(f"{entry['quantity']}x {item['name']}")
+            summary = f"Added {', '.join(added)} to cart." if added else "Nothing was added."
+            if missing:
+                summary += f" I couldn't find {', '.join(repr(name) for name in missing)} on our menu."
+            return f"{summary} Total: ₹{cart.get_total():.2f}"
+
+        # One command for the whole list: applied, deduplicated and rolled back as a unit
+        args = {
+            "lines": [[item_id, e["quantity"], e["notes"]] for item_id, e in resolved.items()],
+            "missing": missing,
+        }
+        return await self.cart_commands.submit("add_many", args, add_all, ctx)
+
+    @function_tool
+    @traced_tool
+    async def search_menu(
+        self,
+        ctx: RunContext,
+        query: Annotated[str, "What the user is looking for, e.g. 'spicy chicken' or 'something sweet'"],
+        max_price: Annotated[Optional[float], "Highest acceptable price in rupees"] = None,
+        category: Annotated[Optional[str], "Burgers, Sides, Beverages, Desserts or Deals"] = None,
+    ):
+        """Search the menu by description, category and price. Returns the best matching items."""
+        hits = MENU_INDEX.search(query, max_price=max_price, category=category)
+        logger.info("Tool search_menu called: %r max_price=%s -> %d hits", query, max_price, len(hits))
+        if not hits:
+            return "Nothing on the menu matches that. Suggest the closest alternatives from the menu."
+        return "\n".join(hit.render() for hit in hits)
 
     @function_tool
+    @traced_tool
     async def remove_from_cart(
         self,
         ctx: RunContext,
         item_name: Annotated[str, "The name of the item to remove"],
     ):
         """Remove an item from the cart."""
-        # Find item in cart by name
-        item_id_to_remove = None
-        for item in self.cart.items.values():
-            if item_name.lower() in item.name.lower():
-                item_id_to_remove = item.id
-                break
-        
-        if item_id_to_remove:
-            removed = self.cart.remove_item(item_id_to_remove)
-            return f"Removed {removed.name} from your cart."
-        else:
-            return f"I couldn't find '{item_name}' in your cart."
+        return await self._remove_item(item_name, ctx)
 
     @function_tool
+    @traced_tool
     async def view_cart(self, ctx: RunContext):
         """Get the current status of the cart."""
         return str(self.cart)
 
     @function_tool
+    @traced_tool
     async def recommend_meal_upgrade(
         self,
         ctx: RunContext,
         base_item: Annotated[str, "The item the user just ordered (e.g., 'burger')"],
     ):
         """Suggests adding fries and a drink to make it a meal."""
-        logger.info(f"Tool recommend_meal_upgrade called for: {base_item}")
+        logger.info("Tool recommend_meal_upgrade called for: %s", base_item)
         
         suggestions = []
         if "fries" not in str(self.cart).lower():
@@ -176,25 +391,35 @@ class GroceryAgent(Agent):
             return "You've got a great meal there! Anything else?"
 
     @function_tool
+    @traced_tool
     async def place_order(self, ctx: RunContext):
         """Finalize the order and save it."""
-        if not self.cart.items:
-            return "Your cart is empty. I can't place an empty order."
-        
-        try:
-            order_id = self.order_manager.place_order(self.cart)
-            total = self.cart.get_total()
-            self.cart.clear() # Clear cart after order
+        def place(cart: Cart) -> str:
+            order_id = self.order_manager.place_order(cart)
+            total = cart.get_total()
+            cart.clear() # Clear cart after order
+            if self.usage is not None:
+                self.usage.outcome("order", order_id, value=total)
             return f"Order placed successfully! Order ID is {order_id}. Total amount: ₹{total:.2f}. Thank you for choosing Burger King!"
+
+        try:
+            # A repeated place_order in the same turn returns the first confirmation instead of ordering twice
+            return await self.cart_commands.submit("place_order", {}, place, ctx)
+        except ValueError:
+            return "Your cart is empty. I can't place an empty order."
         except Exception as e:
             logger.error(f"Failed to place order: {e}")
             return "I'm sorry, there was an issue placing your order. Please try again."
 
 def prewarm(proc: JobProcess):
     try:
+        # Logging goes through a background writer from here on
+        setup_log_pipeline()
         logger.info("Starting prewarm...")
-        proc.userdata["vad"] = silero.VAD.load()
-        proc.userdata["stt"] = deepgram.STT(model="nova-3")
+        proc.userdata["vad"] = load_vad()
+        proc.userdata["stt"] = build_stt()
+        setup_tool_tracing()
+        setup_memory_accounting()
         # proc.userdata["turn_detection"] = MultilingualModel()
         
         if not os.getenv("DEEPGRAM_API_KEY"):
@@ -212,11 +437,18 @@ async def entrypoint(ctx: JobContext):
         logger.info("Entrypoint started")
         ctx.log_context_fields = {"room": ctx.room.name}
         
-        agent = GroceryAgent()
+        # Loop lag of this job's event loop, read by the worker's AdmissionController
+        start_loop_lag_probe()
+
+        # MEMORY_ACCOUNTING=1: memory growth per session, and a check that its objects are freed afterwards
+        if MEMORY_TRACKER.enabled:
+            MEMORY_TRACKER.session_start(ctx.room.name)
+
+        agent = GroceryAgent(analytics=get_sales_analytics())
         
         session = AgentSession(
-            stt=ctx.proc.userdata.get("stt") or deepgram.STT(model="nova-3"),
-            llm=google.LLM(model="gemini-2.5-flash"),
+            stt=ctx.proc.userdata.get("stt") or build_stt(),
+            llm=hedge_llm(await build_gemini_llm(LLM_MODEL, agent.static_prefix, agent.tools)),
             tts=deepgram.TTS(model="aura-helios-en"), 
             turn_detection=ctx.proc.userdata.get("turn_detection") or MultilingualModel(),
             vad=ctx.proc.userdata["vad"],
@@ -224,17 +456,37 @@ async def entrypoint(ctx: JobContext):
         )
         
         usage_collector = metrics.UsageCollector()
+        # Per-turn usage and cost, persisted across sessions
+        agent.usage = get_usage_ledger().session("grocery", ctx.room.name)
+        cache_stats = LLMCacheStats()
         
         @session.on("metrics_collected")
         def _on_metrics_collected(ev: MetricsCollectedEvent):
             metrics.log_metrics(ev.metrics)
             usage_collector.collect(ev.metrics)
+            agent.usage.collect(ev.metrics)
+            cache_stats.collect(ev.metrics)
 
         async def log_usage():
             summary = usage_collector.get_summary()
             logger.info(f"Usage: {summary}")
+            await asyncio.to_thread(agent.usage.close)
+            logger.info(f"Call cost: ${agent.usage.cost:.4f} over {agent.usage.turns} turns")
+            logger.info(f"LLM prompt cache: {cache_stats.summary()}")
+            if isinstance(session.llm, HedgedLLM):
+                logger.info(f"LLM hedging: {session.llm.summary()}")
+            logger.info(f"Tool latency: {TOOL_STATS.summary(ctx.room.name)}")
+            TOOL_STATS.drop(ctx.room.name)
+            await flush_tool_traces()
+            if MEMORY_TRACKER.enabled:
+                MEMORY_TRACKER.session_end(ctx.room.name)
+            logger.info(f"Log pipeline: {log_pipeline_stats()}")
+            await drain_log_pipeline()
 
         ctx.add_shutdown_callback(log_usage)
+        if MEMORY_TRACKER.enabled:
+            for label, obj in {"agent": agent, "cart": agent.cart, "session": session, "usage_collector": usage_collector}.items():
+                MEMORY_TRACKER.watch(ctx.room.name, label, obj)
 
         logger.info("Starting session...")
         await session.start(
@@ -248,21 +500,39 @@ async def entrypoint(ctx: JobContext):
         logger.info("Connecting to room...")
         await ctx.connect()
         logger.info("Connected to room")
-        
-        # Initial greeting
-        await session.say("Welcome to Burger King! Home of the Whopper. What can I get for you today?", add_to_chat_ctx=True)
-        logger.info("Initial greeting sent")
+
+        # Resume the order in progress if this caller dropped out of an earlier connection
+        participant = await ctx.wait_for_participant()
+        state_sync = SessionStateSync(get_state_store(), session_key("burgerking", participant.identity))
+        ctx.add_shutdown_callback(state_sync.aclose)
+        if await agent.resume_state(state_sync):
+            await session.say(f"Welcome back! {agent.cart} What else can I get for you?", add_to_chat_ctx=True)
+        else:
+            # Initial greeting
+            await say_cached(session, PHRASE_CACHE, GREETING, add_to_chat_ctx=True)
+            logger.info(f"Initial greeting sent (phrase cache: {PHRASE_CACHE.stats()})")
+
+        # Render the confirmations the fast path speaks, once per voice, while the caller talks
+        warm = asyncio.create_task(PHRASE_CACHE.warm(session.tts, CACHED_PHRASES, templates=CACHED_TEMPLATES))
+
+        async def stop_warming():
+            warm.cancel()
+
+        ctx.add_shutdown_callback(stop_warming)
 
     except Exception as e:
         logger.error(f"Error in entrypoint: {e}")
         raise e
 
 if __name__ == "__main__":
+    setup_log_file()
     cli.run_app(
         WorkerOptions(
             entrypoint_fnc=entrypoint, 
             prewarm_fnc=prewarm,
             agent_name="freshmarket-agent",
+            load_fnc=AdmissionController(),
+            load_threshold=REJECT_ABOVE,
             ws_url=os.getenv("LIVEKIT_URL"),
             api_key=os.getenv("LIVEKIT_API_KEY"),
             api_secret=os.getenv("LIVEKIT_API_SECRET"),
@@ -7,10 +7,12 @@ import os
 env_path = Path(__file__).parent.parent / ".env.local"
 load_dotenv(dotenv_path=env_path)
 
+import asyncio
 import json
 import traceback
+import uuid
 from datetime import datetime
-from typing import Annotated, Dict, Any
+from typing import Annotated, Dict, Any, Optional, Tuple
 
 from livekit.agents import (
     Agent,
@@ -26,38 +28,116 @@ from livekit.agents import (
     RunContext,
     llm,
 )
-from livekit.plugins import openai, silero, google, deepgram, noise_cancellation
+from livekit.plugins import openai, deepgram, noise_cancellation
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
+try:
+    from src.llm_cache import PROMPT_CACHE, LLMCacheStats, StaticPrefix, build_gemini_llm, build_static_prefix
+    from src.context_window import ContextWindow
+    from src.admission import REJECT_ABOVE, AdmissionController, start_loop_lag_probe
+    from src.vad_batcher import load_vad
+    from src.stt_hedge import build_stt
+    from src.llm_hedge import HedgedLLM, hedge_llm
+    from src.session_state import SessionState, SessionStateSync, get_state_store, session_key
+    from src.text_index import FAQIndex
+    from src.lead_export import append_lead
+    from src.lead_fields import extract_lead_fields
+    from src.tool_tracing import TOOL_STATS, flush_tool_traces, setup_tool_tracing, traced_tool
+    from src.memory_accounting import MEMORY_TRACKER, setup_memory_accounting
+    from src.log_pipeline import drain_log_pipeline, log_pipeline_stats, setup_log_file, setup_log_pipeline
+    from src.usage_ledger import SessionUsage, get_usage_ledger
+except ImportError:
+    from llm_cache import PROMPT_CACHE, LLMCacheStats, StaticPrefix, build_gemini_llm, build_static_prefix
+    from context_window import ContextWindow
+    from admission import REJECT_ABOVE, AdmissionController, start_loop_lag_probe
+    from vad_batcher import load_vad
+    from stt_hedge import build_stt
+    from llm_hedge import HedgedLLM, hedge_llm
+    from session_state import SessionState, SessionStateSync, get_state_store, session_key
+    from text_index import FAQIndex
+    from lead_export import append_lead
+    from lead_fields import extract_lead_fields
+    from tool_tracing import TOOL_STATS, flush_tool_traces, setup_tool_tracing, traced_tool
+    from memory_accounting import MEMORY_TRACKER, setup_memory_accounting
+    from log_pipeline import drain_log_pipeline, log_pipeline_stats, setup_log_file, setup_log_pipeline
+    from usage_ledger import SessionUsage, get_usage_ledger
+
 logger = logging.getLogger("pw-sdr-agent")
 
+LLM_MODEL = "gemini-2.5-flash"
+
+CONTENT_PATH = Path(__file__).resolve().parent.parent.parent / "shared-data" / "pw_content.json"
+
+# BM25 score a passage needs before it is injected into the caller's turn. Editing the turn's context
+# throws away the reply `preemptive_generation` already started, so only clear FAQ questions pay that;
+# small talk and qualification answers rely on the `lookup_faq` tool.
+FAQ_NOTES_MIN_SCORE = float(os.getenv("PW_FAQ_NOTES_MIN_SCORE", "2.5"))
+
 
 class PhysicsWallahSDRAgent(Agent):
     def __init__(self) -> None:
-        # Load content
-        self.content = self._load_content()
         self.leads_path = Path(__file__).resolve().parent.parent.parent / "shared-data" / "leads.json"
         
+        # Persona and offerings form a byte-stable prefix so Gemini can cache it across turns; FAQ
+        # answers are retrieved per turn instead. Both are built once per process and rebuilt only
+        # when pw_content.json changes.
+        self.content, (self.static_prefix, self.faq_index) = PROMPT_CACHE.get(CONTENT_PATH, self._build_prompt)
         super().__init__(
-            instructions=self._get_instructions(),
+            instructions=self.static_prefix.text,
         )
+        # Lead details picked out of each caller turn, snapshotted so a dropped call can pick up where
+        # it left off. They are pinned into the context window, so dropped turns never lose them.
+        self.lead: Dict[str, str] = {}
+        self.context_window = ContextWindow(
+            state_hint="Do not ask again for details captured above; ask only for lead details that are still missing.",
+            pinned=lambda: self.lead,
+        )
+        self.lead_saved = False
+        self.state_sync: Optional[SessionStateSync] = None
+        # Set by the entrypoint; calls that save a lead are priced per lead from it
+        self.usage: Optional[SessionUsage] = None
 
-    def _load_content(self) -> Dict[str, Any]:
-        try:
-            content_path = Path(__file__).resolve().parent.parent.parent / "shared-data" / "pw_content.json"
-            with open(content_path, "r") as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Error loading content: {e}")
-            return {}
+    async def resume_state(self, state_sync: SessionStateSync) -> bool:
+        """Attach the session's state store and restore lead details from an earlier connection."""
+        self.state_sync = state_sync
+        state = await state_sync.restore()
+        if state is None or not state.lead:
+            return False
+        self.lead = dict(state.lead)
+        logger.info(f"Restored {len(self.lead)} lead fields for {state_sync.key}")
+        return True
 
-    def _get_instructions(self) -> str:
-        company_info = self.content.get("company_info", {})
-        verticals = self.content.get("verticals", [])
-        faqs = self.content.get("faqs", [])
+    def _save_state(self) -> None:
+        if self.state_sync is not None:
+            self.state_sync.snapshot(SessionState(lead=self.lead))
+
+    async def on_user_turn_completed(self, turn_ctx: llm.ChatContext, new_message: llm.ChatMessage) -> None:
+        # Only the extracted fields are kept, never the raw transcript; no LLM call is involved
+        fields = extract_lead_fields(new_message.text_content or "")
+        if fields and not self.lead_saved and any(self.lead.get(key) != value for key, value in fields.items()):
+            self.lead.update(fields)
+            self._save_state()
+
+        # Keep prompt size flat on long counselling calls
+        await self.context_window.apply(self, turn_ctx)
+
+        # Only the FAQ entries relevant to this question reach the LLM. turn_ctx is this reply's copy of
+        # the context, so the notes never enter the stored history; as a system message they are not
+        # mistaken for something the agent said.
+        reference = self.faq_index.context_for(new_message.text_content or "", min_score=FAQ_NOTES_MIN_SCORE)
+        if reference:
+            turn_ctx.add_message(role="system", content=f"Reference notes for the caller's question:\n{reference}")
+
+    @classmethod
+    def _build_prompt(cls, content: Dict[str, Any]) -> Tuple[StaticPrefix, FAQIndex]:
+        return build_static_prefix(cls._get_instructions(content)), FAQIndex.from_content(content)
+
+    @staticmethod
+    def _get_instructions(content: Dict[str, Any]) -> str:
+        company_info = content.get("company_info", {})
+        verticals = content.get("verticals", [])
         
-        verticals_str = "\n".join([f"- {v['name']}: {v['description']}" for v in verticals])
-        faqs_str = "\n".join([f"Q: {f['question']}\nA: {f['answer']}" for f in faqs])
+        verticals_str = "\n".join([f"- {v['name']}" for v in verticals])
         
         return f"""
         You are a friendly and energetic Sales Development Representative (SDR) for **{company_info.get('name', 'Physics Wallah')}**.
@@ -69,12 +149,12 @@ class PhysicsWallahSDRAgent(Agent):
         **KEY OFFERINGS:**
         {verticals_str}
         
-        **FAQ KNOWLEDGE BASE:**
-        {faqs_str}
+        **KNOWLEDGE BASE:**
+        Details on courses, batches, fees, study material and scholarships come with the caller's turn as reference notes. If they don't cover the question, call `lookup_faq`. Never make up prices or batch names.
         
         **YOUR GOAL:**
         1.  **Qualify the Lead:** Warmly engage with the student or parent. Find out who they are (Student/Parent), their Class/Grade, and what Exam they are targeting (JEE, NEET, Boards, etc.).
-        2.  **Answer Questions:** Use the FAQ and Offerings info to answer questions about courses, pricing (mention affordability), and faculties.
+        2.  **Answer Questions:** Use the reference notes and Offerings info to answer questions about courses, pricing (mention affordability), and faculties.
         3.  **Close:** Once you have their details and have answered their questions, summarize their interest and end the call with high energy ("Padhai Karte Raho!", "All the best!").
         
         **YOUR PERSONA:**
@@ -94,6 +174,20 @@ class PhysicsWallahSDRAgent(Agent):
         """
 
     @function_tool
+    @traced_tool
+    async def lookup_faq(
+        self,
+        ctx: RunContext,
+        question: Annotated[str, "The caller's question, in a few keywords"],
+    ):
+        """Search the Physics Wallah knowledge base (courses, batches, fees, material, scholarships)."""
+        passages = self.faq_index.lookup(question, k=3)
+        if not passages:
+            return "Nothing in the knowledge base covers that. Offer to have a counsellor follow up."
+        return "\n\n".join(p.render() for p in passages)
+
+    @function_tool
+    @traced_tool
     async def save_lead(
         self,
         ctx: RunContext,
@@ -110,6 +204,7 @@ class PhysicsWallahSDRAgent(Agent):
         """Save the lead's information to the database. Call this at the end of the conversation."""
         try:
             lead_data = {
+                "lead_id": uuid.uuid4().hex,
                 "timestamp": datetime.now().isoformat(),
                 "name": name,
                 "role": role,
@@ -136,8 +231,19 @@ class PhysicsWallahSDRAgent(Agent):
             # Save back
             with open(self.leads_path, "w") as f:
                 json.dump(leads, f, indent=2)
+
+            # Append-only log tailed by the CRM export (src/lead_export.py)
+            append_lead(self.leads_path.with_suffix(".ndjson"), lead_data)
                 
-            logger.info(f"Lead saved: {name}, {target_exam}")
+            self.lead.update({key: value for key, value in lead_data.items() if key not in ("lead_id", "timestamp")})
+            self.lead_saved = True
+            # The call's goal is done: a new call from this caller should not resume it
+            if self.state_sync is not None:
+                self.state_sync.clear()
+            if self.usage is not None:
+                self.usage.outcome("lead", lead_data["lead_id"])
+
+            logger.info("Lead saved: %s, %s", name, target_exam)
             return "Lead saved successfully. All the best for your preparation!"
             
         except Exception as e:
@@ -146,11 +252,18 @@ class PhysicsWallahSDRAgent(Agent):
 
 def prewarm(proc: JobProcess):
     """Preload models to minimize first-call latency"""
+    # Logging goes through a background writer from here on
+    setup_log_pipeline()
+
     # Preload VAD model
-    proc.userdata["vad"] = silero.VAD.load()
+    proc.userdata["vad"] = load_vad()
     
     # Preload STT model to reduce initialization time
-    proc.userdata["stt"] = deepgram.STT(model="nova-3")
+    proc.userdata["stt"] = build_stt()
+
+    # Export tool spans if TOOL_TRACE_EXPORTER is set
+    setup_tool_tracing()
+    setup_memory_accounting()
 
 
 async def entrypoint(ctx: JobContext):
@@ -159,35 +272,60 @@ async def entrypoint(ctx: JobContext):
             "room": ctx.room.name,
         }
 
+        # Loop lag of this job's event loop, read by the worker's AdmissionController
+        start_loop_lag_probe()
+
         # Initialize the agent
+        # MEMORY_ACCOUNTING=1: memory growth per session, and a check that its objects are freed afterwards
+        if MEMORY_TRACKER.enabled:
+            MEMORY_TRACKER.session_start(ctx.room.name)
+
         agent = PhysicsWallahSDRAgent()
 
         session = AgentSession(
-            stt=ctx.proc.userdata.get("stt") or deepgram.STT(model="nova-3"),
-            llm=google.LLM(
-                model="gemini-2.5-flash",
-            ),
+            stt=ctx.proc.userdata.get("stt") or build_stt(),
+            llm=hedge_llm(await build_gemini_llm(LLM_MODEL, agent.static_prefix, agent.tools)),
             # Use Deepgram Aura TTS (reliable fallback)
             tts=deepgram.TTS(
                 model="aura-helios-en",  # Professional male voice
             ), 
-            turn_detection=MultilingualModel(),
+            turn_detection=ctx.proc.userdata.get("turn_detection") or MultilingualModel(),
             vad=ctx.proc.userdata["vad"],
             preemptive_generation=True,
         )
         
         usage_collector = metrics.UsageCollector()
+        # Per-turn usage and cost, persisted across sessions
+        agent.usage = get_usage_ledger().session("pw", ctx.room.name)
+        cache_stats = LLMCacheStats()
 
         @session.on("metrics_collected")
         def _on_metrics_collected(ev: MetricsCollectedEvent):
             metrics.log_metrics(ev.metrics)
             usage_collector.collect(ev.metrics)
+            agent.usage.collect(ev.metrics)
+            cache_stats.collect(ev.metrics)
 
         async def log_usage():
             summary = usage_collector.get_summary()
             logger.info(f"Usage: {summary}")
+            await asyncio.to_thread(agent.usage.close)
+            logger.info(f"Call cost: ${agent.usage.cost:.4f} over {agent.usage.turns} turns")
+            logger.info(f"LLM prompt cache: {cache_stats.summary()}")
+            if isinstance(session.llm, HedgedLLM):
+                logger.info(f"LLM hedging: {session.llm.summary()}")
+            logger.info(f"Tool latency: {TOOL_STATS.summary(ctx.room.name)}")
+            TOOL_STATS.drop(ctx.room.name)
+            await flush_tool_traces()
+            if MEMORY_TRACKER.enabled:
+                MEMORY_TRACKER.session_end(ctx.room.name)
+            logger.info(f"Log pipeline: {log_pipeline_stats()}")
+            await drain_log_pipeline()
 
         ctx.add_shutdown_callback(log_usage)
+        if MEMORY_TRACKER.enabled:
+            for label, obj in {"agent": agent, "session": session, "usage_collector": usage_collector}.items():
+                MEMORY_TRACKER.watch(ctx.room.name, label, obj)
 
         await session.start(
             agent=agent,
@@ -198,6 +336,17 @@ async def entrypoint(ctx: JobContext):
         )
 
         await ctx.connect()
+
+        # Pick up a counselling call that dropped out of an earlier connection
+        participant = await ctx.wait_for_participant()
+        state_sync = SessionStateSync(get_state_store(), session_key("pw", participant.identity))
+        ctx.add_shutdown_callback(state_sync.aclose)
+        if await agent.resume_state(state_sync):
+            known = ", ".join(f"{key}: {value}" for key, value in agent.lead.items())
+            session.generate_reply(
+                instructions=f"The caller reconnected after the call dropped. You already know: {known}. "
+                "Collect whatever is still missing. Welcome them back without asking for these details again."
+            )
     
     except Exception as e:
         logger.error(f"Error in entrypoint: {e}")
@@ -206,10 +355,13 @@ async def entrypoint(ctx: JobContext):
 
 
 if __name__ == "__main__":
+    setup_log_file()
     cli.run_app(
         WorkerOptions(
             entrypoint_fnc=entrypoint, 
             prewarm_fnc=prewarm,
+            load_fnc=AdmissionController(),
+            load_threshold=REJECT_ABOVE,
             ws_url=os.getenv("LIVEKIT_URL"),
             api_key=os.getenv("LIVEKIT_API_KEY"),
             api_secret=os.getenv("LIVEKIT_API_SECRET"),
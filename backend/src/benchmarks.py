@@ -0,0 +1,271 @@
+"""
+Micro-benchmarks for the backend hot paths, with stored baselines.
+
+Covers the cart, catalog matching in `add_to_cart`, `OrderManager.place_order`,
+`save_lead` and the fraud-case database functions, each over synthetic data of
+every requested size (cart lines, catalog items, existing leads or fraud
+cases). Each case is calibrated to run for at least `--min-time` per repeat
+and reports the median and best time per call.
+
+Results are compared against benchmarks/baseline.json, printing the speedup
+(>1 is faster than baseline) per case; `--save` records the current run as the
+new baseline. Baselines are machine-specific, so record one before a change
+and compare after it on the same machine.
+
+    python -m src.benchmarks --save                        # record a baseline
+    python -m src.benchmarks                               # compare against it
+    python -m src.benchmarks --only database --sizes 10,1000000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from src import database
+    from src.cart import Cart
+    from src.order_manager import OrderManager
+except ImportError:
+    import database
+    from cart import Cart
+    from order_manager import OrderManager
+
+logger = logging.getLogger("benchmarks")
+
+BASELINE_PATH = Path(__file__).parent.parent / "benchmarks" / "baseline.json"
+DEFAULT_SIZES = "10,1000,100000"
+# A change is flagged when it is this much slower than baseline
+REGRESSION_THRESHOLD = 0.10
+
+
+@dataclass
+class Case:
+    group: str
+    name: str
+    # setup(size, workdir) -> zero-argument callable timed per call
+    setup: Callable[[int, Path], Callable[[], Any]]
+
+
+def _filled_cart(size: int) -> Cart:
+    cart = Cart()
+    for i in range(size):
+        cart.add_item(f"item-{i}", f"Item {i}", 99.0 + i % 50, 1 + i % 3, "no onions" if i % 7 == 0 else "")
+    return cart
+
+
+def _setup_cart_add(size: int, workdir: Path):
+    cart = _filled_cart(size)
+    item_id = f"item-{size // 2}"
+    return lambda: cart.add_item(item_id, "Item", 99.0, 1)
+
+
+def _setup_cart_total(size: int, workdir: Path):
+    return _filled_cart(size).get_total
+
+
+def _setup_cart_str(size: int, workdir: Path):
+    return _filled_cart(size).__str__
+
+
+def _grocery_agent(size: int):
+    try:
+        from src.agent import GroceryAgent
+    except ImportError:
+        from agent import GroceryAgent
+
+    agent = GroceryAgent()
+    agent.catalog_lookup = {
+        f"menu item {i:07d}": {"id": f"bk-{i}", "name": f"Menu Item {i:07d}", "price": 149.0, "category": "Burgers"}
+        for i in range(size)
+    }
+    return agent
+
+
+def _setup_add_to_cart(query: Callable[[int], str]):
+    def setup(size: int, workdir: Path):
+        agent = _grocery_agent(size)
+        name = query(size)
+        loop = asyncio.new_event_loop()
+
+        def call():
+            return loop.run_until_complete(agent.add_to_cart(None, name, 1))
+
+        return call
+
+    return setup
+
+
+def _setup_place_order(size: int, workdir: Path):
+    manager = OrderManager(orders_dir=str(workdir / "orders"))
+    cart = _filled_cart(size)
+    return lambda: manager.place_order(cart)
+
+
+def _setup_save_lead(size: int, workdir: Path):
+    try:
+        from src.agent_pw import PhysicsWallahSDRAgent
+    except ImportError:
+        from agent_pw import PhysicsWallahSDRAgent
+
+    agent = PhysicsWallahSDRAgent()
+    agent.leads_path = workdir / "leads.json"
+    lead = {"name": "Riya", "role": "Student", "grade": "12th", "target_exam": "NEET", "email": "riya@example.com"}
+    agent.leads_path.write_text(json.dumps([dict(lead, timestamp=datetime.now().isoformat()) for _ in range(size)]))
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(agent.save_lead(None, **lead))
+
+
+def _fraud_db(size: int, workdir: Path) -> None:
+    database.DB_PATH = workdir / "fraud_cases.db"
+    database.init_db()
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.executemany(
+        "INSERT INTO fraud_cases VALUES (?, ?, ?, 'pending_review', 'Purchase', '₹1,000', "
+        "'2023-10-27 14:30:00', 'Mumbai, India', 'Store', 'Question?', 'Answer', '')",
+        ((f"user_{i:07d}", f"{i:05d}", f"{i % 10000:04d}") for i in range(size)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _setup_get_case(size: int, workdir: Path):
+    _fraud_db(size, workdir)
+    username = f"user_{size // 2:07d}"
+    return lambda: database.get_case(username)
+
+
+def _setup_find_user_fuzzy(size: int, workdir: Path):
+    _fraud_db(size, workdir)
+    # Spoken form of the last row: the worst case for a scan
+    spoken = f"User {size - 1:07d}"
+    return lambda: database.find_user_fuzzy(spoken)
+
+
+def _setup_update_case_status(size: int, workdir: Path):
+    _fraud_db(size, workdir)
+    username = f"user_{size // 2:07d}"
+    return lambda: database.update_case_status(username, "confirmed_safe", "benchmark")
+
+
+CASES = [
+    Case("cart", "Cart.add_item", _setup_cart_add),
+    Case("cart", "Cart.get_total", _setup_cart_total),
+    Case("cart", "Cart.__str__", _setup_cart_str),
+    Case("catalog", "add_to_cart[exact]", _setup_add_to_cart(lambda size: f"menu item {size - 1:07d}")),
+    Case("catalog", "add_to_cart[partial]", _setup_add_to_cart(lambda size: f"item {size - 1:07d}")),
+    Case("catalog", "add_to_cart[miss]", _setup_add_to_cart(lambda size: "unicorn shake")),
+    Case("orders", "OrderManager.place_order", _setup_place_order),
+    Case("leads", "save_lead", _setup_save_lead),
+    Case("database", "get_case", _setup_get_case),
+    Case("database", "find_user_fuzzy", _setup_find_user_fuzzy),
+    Case("database", "update_case_status", _setup_update_case_status),
+]
+
+
+def measure(fn: Callable[[], Any], min_time: float = 0.05, repeats: int = 5) -> Dict[str, float]:
+    """Seconds per call: calibrate a loop count that takes `min_time`, then time `repeats` loops."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+
+    # Calls slower than a second are timed fewer times
+    repeats = 1 if elapsed > 1.0 else repeats
+    timings = [elapsed / loops]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        timings.append((time.perf_counter() - start) / loops)
+    return {"median_us": statistics.median(timings) * 1e6, "best_us": min(timings) * 1e6, "loops": loops}
+
+
+def run(sizes: List[int], only: Optional[List[str]] = None, min_time: float = 0.05) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    db_path = database.DB_PATH
+    try:
+        for case in CASES:
+            if only and case.group not in only and case.name not in only:
+                continue
+            for size in sizes:
+                with tempfile.TemporaryDirectory() as tmp:
+                    fn = case.setup(size, Path(tmp))
+                    fn()  # warm-up, also keeps one-off setup costs out of the timings
+                    results[f"{case.name}[{size}]"] = measure(fn, min_time)
+    finally:
+        # Database cases point the module at a scratch file
+        database.DB_PATH = db_path
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]) -> List[Dict[str, Any]]:
+    rows = []
+    for key, current in results.items():
+        before = baseline.get(key)
+        speedup = before["median_us"] / current["median_us"] if before and current["median_us"] else None
+        rows.append({
+            "case": key,
+            "median_us": round(current["median_us"], 2),
+            "baseline_us": round(before["median_us"], 2) if before else None,
+            "speedup": round(speedup, 2) if speedup else None,
+            "regression": bool(speedup and speedup < 1 / (1 + REGRESSION_THRESHOLD)),
+        })
+    return rows
+
+
+def _print_table(rows: List[Dict[str, Any]]) -> None:
+    print(f"{'case':<40} {'median_us':>12} {'baseline_us':>12} {'speedup':>8}")
+    for row in rows:
+        baseline = f"{row['baseline_us']:.2f}" if row["baseline_us"] is not None else "-"
+        speedup = f"{row['speedup']:.2f}x" if row["speedup"] else "-"
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['case']:<40} {row['median_us']:>12.2f} {baseline:>12} {speedup:>8}{flag}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmark the backend hot paths against a stored baseline")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated record counts")
+    parser.add_argument("--only", help="Comma-separated groups (cart, catalog, orders, leads, database) or case names")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Minimum seconds per timed repeat")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 1 if any case regressed")
+    args = parser.parse_args(argv)
+
+    sizes = [int(n) for n in args.sizes.split(",")]
+    results = run(sizes, args.only.split(",") if args.only else None, args.min_time)
+
+    stored = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    rows = compare(results, stored.get("results", {}))
+    _print_table(rows)
+
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        # Merge, so a partial run (--only) refreshes just its own cases
+        stored.setdefault("results", {}).update(results)
+        stored["machine"] = {"python": sys.version.split()[0], "platform": platform.platform()}
+        stored["recorded_at"] = datetime.now().isoformat(timespec="seconds")
+        args.baseline.write_text(json.dumps(stored, indent=2, sort_keys=True))
+        logger.warning(f"Baseline saved to {args.baseline}")
+
+    return 1 if args.fail_on_regression and any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
@@ -2,6 +2,9 @@ from typing import List, Dict, Optional
 import json
 from dataclasses import dataclass, asdict
 
+EMPTY_CART = "Your cart is empty."
+
+
 @dataclass
 class CartItem:
     id: str
@@ -52,7 +55,7 @@ class Cart:
 
     def __str__(self) -> str:
         if not self.items:
-            return "Your cart is empty."
+            return EMPTY_CART
         
         lines = ["Here is what you have in your cart:"]
         for item in self.items.values():
@@ -0,0 +1,75 @@
+"""
+Serialized, idempotent cart mutations.
+
+With `preemptive_generation=True` a speculative or regenerated LLM turn can
+replay a tool call, so the same "add a Whopper" call may arrive twice. Every
+cart mutation goes through the session's `CartCommandQueue` instead of
+touching the `Cart` directly:
+
+- Commands run one at a time, in arrival order.
+- A command carrying an LLM function-call id that was already applied
+  returns the first result instead of applying again.
+
+Idempotency is keyed on the call id only. Two calls with the same tool and
+arguments but different ids are both applied: "two Whoppers" may legitimately
+arrive as two parallel `add_to_cart` calls. Commands without a call id (the
+local intent fast path) always apply.
+
+There is no rollback: LiveKit only runs tools once their speech is
+scheduled, and an interrupted tool call stays in the chat history with its
+output, so the model already knows the cart changed.
+
+    queue = CartCommandQueue(cart, on_change=save_state)
+    result = await queue.submit("add", {"item": "bk-001", "quantity": 1}, lambda cart: ..., ctx)
+"""
+import asyncio
+import copy
+import logging
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+try:
+    from src.cart import Cart
+except ImportError:
+    from cart import Cart
+
+logger = logging.getLogger("cart-commands")
+
+
+class CartCommandQueue:
+    def __init__(self, cart: Cart, on_change: Optional[Callable[[], None]] = None, max_keys: int = 256):
+        self.cart = cart
+        self.on_change = on_change
+        self.max_keys = max_keys
+        self.stats: Counter = Counter()
+        self._lock = asyncio.Lock()
+        # Function-call id -> the result it returned when applied
+        self._results: "OrderedDict[str, str]" = OrderedDict()
+
+    def _remember(self, call_id: str, result: str) -> None:
+        self._results[call_id] = result
+        self._results.move_to_end(call_id)
+        while len(self._results) > self.max_keys:
+            self._results.popitem(last=False)
+
+    async def submit(self, tool: str, args: Dict[str, Any], mutate: Callable[[Cart], str], ctx: Any = None) -> str:
+        """Apply `mutate` to the cart unless this call id already ran; returns its (or the original) result."""
+        function_call = getattr(ctx, "function_call", None)
+        call_id = function_call.call_id if function_call is not None else None
+
+        async with self._lock:
+            if call_id and call_id in self._results:
+                self.stats["deduplicated"] += 1
+                logger.info(f"Skipping replayed cart command {tool} {args} (call {call_id})")
+                return self._results[call_id]
+
+            before = copy.deepcopy(self.cart.items)
+            result = mutate(self.cart)
+            changed = self.cart.items != before
+            if call_id:
+                self._remember(call_id, result)
+            self.stats["applied"] += 1
+
+        if changed and self.on_change is not None:
+            self.on_change()
+        return result
@@ -0,0 +1,131 @@
+"""
+Bounded chat context with a truncated transcript excerpt.
+
+Long calls would otherwise resend every turn to the LLM. `ContextWindow` keeps
+the instructions and the last few turns verbatim and drops older turns. This is
+truncation, not summarization: the dropped turns survive only as a short
+excerpt of clipped lines, the caller's lines outliving the assistant's, and
+old tool calls are dropped entirely. State that must not be lost (the lead
+details captured so far) is pinned into the excerpt through `pinned`, and the
+cart is read back from the tools rather than replayed from the transcript.
+
+Usage:
+    window = ContextWindow(pinned=lambda: agent.lead)
+    await window.apply(agent, turn_ctx)  # from on_user_turn_completed
+"""
+import logging
+from typing import Callable, Dict, List, Optional
+
+from livekit.agents import llm
+
+logger = logging.getLogger("context-window")
+
+EXCERPT_ID = "context_excerpt"
+
+
+def estimate_tokens(item: llm.ChatItem) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    if item.type == "message":
+        return len(item.text_content or "") // 4 + 4
+    if item.type == "function_call":
+        return (len(item.name) + len(item.arguments)) // 4 + 4
+    if item.type == "function_call_output":
+        return len(item.output) // 4 + 4
+    return 4
+
+
+class ContextWindow:
+    def __init__(
+        self,
+        max_turns: int = 6,
+        max_tokens: int = 1500,
+        excerpt_chars: int = 1200,
+        line_chars: int = 160,
+        state_hint: str = "",
+        pinned: Optional[Callable[[], Dict[str, str]]] = None,
+    ):
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.excerpt_chars = excerpt_chars
+        self.line_chars = line_chars
+        self.state_hint = state_hint
+        # Returns details that stay in context however many turns are dropped
+        self.pinned = pinned
+        self.excerpt_lines: List[str] = []
+
+    def _split(self, items: List[llm.ChatItem]):
+        """Separate leading instructions from the conversation, grouped into user turns."""
+        head: List[llm.ChatItem] = []
+        rest = list(items)
+        while rest and rest[0].type == "message" and rest[0].role in ("system", "developer") and rest[0].id != EXCERPT_ID:
+            head.append(rest.pop(0))
+
+        turns: List[List[llm.ChatItem]] = []
+        for item in rest:
+            if item.id == EXCERPT_ID:
+                continue
+            if not turns or (item.type == "message" and item.role == "user"):
+                turns.append([])
+            turns[-1].append(item)
+        return head, turns
+
+    def _fold(self, turns: List[List[llm.ChatItem]]) -> None:
+        for turn in turns:
+            for item in turn:
+                # Tool calls are not kept; their effects are queried from the tools
+                if item.type != "message" or item.role not in ("user", "assistant"):
+                    continue
+                text = " ".join((item.text_content or "").split())
+                if not text:
+                    continue
+                if len(text) > self.line_chars:
+                    text = text[: self.line_chars - 3] + "..."
+                self.excerpt_lines.append(f"{item.role.capitalize()}: {text}")
+
+        # Over budget, the oldest assistant lines go first: what the caller said is harder to recover
+        while self.excerpt_lines and sum(len(line) + 1 for line in self.excerpt_lines) > self.excerpt_chars:
+            index = next((i for i, line in enumerate(self.excerpt_lines) if line.startswith("Assistant: ")), 0)
+            self.excerpt_lines.pop(index)
+
+    def excerpt_message(self) -> llm.ChatMessage:
+        text = "Earlier turns of this call were dropped; clipped lines from them:\n" + "\n".join(self.excerpt_lines)
+        details = {key: value for key, value in (self.pinned() if self.pinned else {}).items() if value}
+        if details:
+            text += "\nDetails captured so far: " + "; ".join(f"{key}: {value}" for key, value in details.items())
+        if self.state_hint:
+            text += f"\n{self.state_hint}"
+        # Context for the model, not something it said: a system message, like the PW agent's FAQ notes
+        return llm.ChatMessage(id=EXCERPT_ID, role="system", content=[text])
+
+    def compact(self, items: List[llm.ChatItem]) -> Optional[List[llm.ChatItem]]:
+        """Return the bounded item list, or None when `items` is already within budget."""
+        head, turns = self._split(items)
+
+        keep = turns[-self.max_turns :] if self.max_turns else []
+        while len(keep) > 1 and sum(estimate_tokens(i) for turn in keep for i in turn) > self.max_tokens:
+            keep = keep[1:]
+
+        dropped = turns[: len(turns) - len(keep)]
+        if not dropped:
+            return None
+
+        self._fold(dropped)
+        logger.info(
+            f"Compacted chat context: dropped {len(dropped)} turns, keeping {len(keep)} "
+            f"({len(self.excerpt_lines)} excerpt lines)"
+        )
+        return head + [self.excerpt_message()] + [item for turn in keep for item in turn]
+
+    async def apply(self, agent, turn_ctx: llm.ChatContext) -> None:
+        """Bound the agent's persistent context and the context used for the current reply.
+
+        Meant to be called from `Agent.on_user_turn_completed`.
+        """
+        chat_ctx = agent.chat_ctx
+        compacted = self.compact(chat_ctx.items)
+        if compacted is None:
+            return
+
+        await agent.update_chat_ctx(llm.ChatContext(compacted))
+        known = {item.id for item in chat_ctx.items}
+        turn_ctx.items[:] = compacted + [item for item in turn_ctx.items if item.id not in known]
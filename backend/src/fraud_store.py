@@ -0,0 +1,423 @@
+"""
+Partitioned, multi-tenant fraud case storage.
+
+`database.py` keeps every case in one fraud_cases.db, so every write takes
+the same file lock. `FraudStore` spreads cases over several SQLite files:
+
+    <root>/<tenant>/part-000.db, part-001.db, ...
+    <root>/manifest.json
+
+Each tenant (bank) has its own files. Within a tenant, a case belongs to
+one of BUCKETS hash buckets. The bucket is hashed from the normalized
+username, so exact and spoken-name ("John Doe") lookups land in the same
+place. The manifest maps each bucket to a partition. Writes to different
+partitions go through different files and connections, so write throughput
+grows with the partition count.
+
+Cross-partition views (`triage`, `status_counts`) query all partitions in
+parallel and merge the results. Each partition is read only for the buckets
+the manifest assigns to it, so a bucket being copied, or a stale copy left
+by a crashed move, is never counted twice. `rebalance` changes a tenant's
+partition count online. It moves one bucket at a time, and only that
+bucket's readers and writers wait. It then sweeps stale rows from every
+partition file, retired ones included. Re-running it after a crash
+finishes the job.
+
+    python -m src.fraud_store migrate --tenant hdfc          # import the legacy fraud_cases.db
+    python -m src.fraud_store rebalance --tenant hdfc --partitions 8
+    python -m src.fraud_store triage --status pending_review
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("fraud-store")
+
+DEFAULT_ROOT = Path(os.getenv("FRAUD_STORE_DIR", str(Path(__file__).parent.parent / "fraud_store")))
+LEGACY_DB_PATH = Path(__file__).parent.parent / "fraud_cases.db"
+BUCKETS = 256
+DEFAULT_PARTITIONS = int(os.getenv("FRAUD_STORE_PARTITIONS", "4"))
+
+CASE_FIELDS = [
+    "username", "security_identifier", "card_ending", "status", "transaction_name",
+    "transaction_amount", "transaction_time", "transaction_city", "transaction_merchant",
+    "security_question", "security_answer", "outcome_note",
+]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS fraud_cases (
+    username TEXT PRIMARY KEY,
+    username_key TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    {", ".join(f"{name} TEXT" for name in CASE_FIELDS[1:])}
+);
+CREATE INDEX IF NOT EXISTS idx_fraud_cases_key ON fraud_cases (username_key);
+CREATE INDEX IF NOT EXISTS idx_fraud_cases_bucket ON fraud_cases (bucket);
+CREATE INDEX IF NOT EXISTS idx_fraud_cases_status ON fraud_cases (status);
+"""
+
+_COLUMNS = ["username", "username_key", "bucket"] + CASE_FIELDS[1:]
+_UPSERT = f"INSERT OR REPLACE INTO fraud_cases ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+
+
+def normalize_username(name: str) -> str:
+    """Same normalization as database.find_user_fuzzy: no spaces or underscores, lowercase."""
+    return name.replace(" ", "").replace("_", "").lower()
+
+
+def bucket_for(username: str) -> int:
+    digest = hashlib.blake2b(normalize_username(username).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % BUCKETS
+
+
+def _case(row: sqlite3.Row) -> Dict[str, Any]:
+    return {name: row[name] for name in CASE_FIELDS}
+
+
+class Partition:
+    """One SQLite file; its connection is used by one thread at a time."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=10.0, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def query(self, sql: str, params: Tuple = ()) -> List[sqlite3.Row]:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        with self.lock, self.conn:
+            return fn(self.conn)
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class FraudStore:
+    def __init__(self, root: Path = DEFAULT_ROOT, default_partitions: int = DEFAULT_PARTITIONS, workers: int = 8):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.default_partitions = default_partitions
+        self.manifest_path = self.root / "manifest.json"
+        # tenant -> {"partitions": n, "buckets": [partition index per bucket]}
+        self.manifest: Dict[str, Dict[str, Any]] = (
+            json.loads(self.manifest_path.read_text()) if self.manifest_path.exists() else {}
+        )
+        self._partitions: Dict[Tuple[str, int], Partition] = {}
+        self._manifest_lock = threading.Lock()
+        # Striped per-bucket locks: held while a bucket is read, written or moved
+        self._bucket_locks = [threading.Lock() for _ in range(BUCKETS)]
+        # Bumped whenever a bucket changes partition, so scatter reads can tell they straddled a move
+        self._layout_version = 0
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fraud-store")
+
+    # -- layout -------------------------------------------------------------
+
+    def tenants(self) -> List[str]:
+        return sorted(self.manifest)
+
+    def _tenant(self, tenant: str) -> Dict[str, Any]:
+        with self._manifest_lock:
+            if tenant not in self.manifest:
+                n = self.default_partitions
+                self.manifest[tenant] = {"partitions": n, "buckets": [b % n for b in range(BUCKETS)]}
+                self._save_manifest()
+            return self.manifest[tenant]
+
+    def _save_manifest(self) -> None:
+        tmp = self.manifest_path.with_name(f".{self.manifest_path.name}.tmp")
+        tmp.write_text(json.dumps(self.manifest, indent=2))
+        os.replace(tmp, self.manifest_path)
+
+    def _partition(self, tenant: str, index: int) -> Partition:
+        key = (tenant, index)
+        partition = self._partitions.get(key)
+        if partition is None:
+            with self._manifest_lock:
+                partition = self._partitions.get(key)
+                if partition is None:
+                    partition = Partition(self.root / tenant / f"part-{index:03d}.db")
+                    self._partitions[key] = partition
+        return partition
+
+    def _route(self, tenant: str, username: str) -> Tuple[int, Partition]:
+        bucket = bucket_for(username)
+        return bucket, self._partition(tenant, self._tenant(tenant)["buckets"][bucket])
+
+    def _all_partitions(self, tenant: Optional[str] = None) -> List[Partition]:
+        tenants = [tenant] if tenant else self.tenants()
+        return [self._partition(t, i) for t in tenants for i in range(self._tenant(t)["partitions"])]
+
+    # -- single-case operations (the database.py API, per tenant) -----------
+
+    def upsert_case(self, tenant: str, case: Dict[str, Any]) -> None:
+        username = case["username"]
+        bucket = bucket_for(username)
+        with self._bucket_locks[bucket]:
+            _, partition = self._route(tenant, username)
+            row = [username, normalize_username(username), bucket] + [case.get(f, "") for f in CASE_FIELDS[1:]]
+            partition.write(lambda conn: conn.execute(_UPSERT, row))
+
+    def upsert_cases(self, tenant: str, cases: List[Dict[str, Any]]) -> int:
+        """Bulk load, one transaction per partition, partitions written in parallel."""
+        rows = [
+            [case["username"], normalize_username(case["username"]), bucket_for(case["username"])]
+            + [case.get(f, "") for f in CASE_FIELDS[1:]]
+            for case in cases
+        ]
+        # Hold the touched buckets (in a fixed order) so a concurrent rebalance can't move them mid-load
+        locks = [self._bucket_locks[b] for b in sorted({row[2] for row in rows})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            buckets = self._tenant(tenant)["buckets"]
+            by_partition: Dict[int, List[List[Any]]] = {}
+            for row in rows:
+                by_partition.setdefault(buckets[row[2]], []).append(row)
+
+            def load(item: Tuple[int, List[List[Any]]]) -> int:
+                index, batch = item
+                self._partition(tenant, index).write(lambda conn: conn.executemany(_UPSERT, batch))
+                return len(batch)
+
+            return sum(self._pool.map(load, by_partition.items()))
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def get_case(self, tenant: str, username: str) -> Optional[Dict[str, Any]]:
+        bucket = bucket_for(username)
+        with self._bucket_locks[bucket]:
+            _, partition = self._route(tenant, username)
+            rows = partition.query("SELECT * FROM fraud_cases WHERE username = ?", (username,))
+        return _case(rows[0]) if rows else None
+
+    def find_user_fuzzy(self, tenant: str, input_name: str) -> Optional[Dict[str, Any]]:
+        """Spoken or typed name ("John Doe") to case: one indexed lookup in one partition."""
+        bucket = bucket_for(input_name)
+        with self._bucket_locks[bucket]:
+            _, partition = self._route(tenant, input_name)
+            rows = partition.query(
+                "SELECT * FROM fraud_cases WHERE username_key = ? LIMIT 1", (normalize_username(input_name),)
+            )
+        return _case(rows[0]) if rows else None
+
+    def update_case_status(self, tenant: str, username: str, status: str, note: str) -> bool:
+        bucket = bucket_for(username)
+        with self._bucket_locks[bucket]:
+            _, partition = self._route(tenant, username)
+            cursor = partition.write(
+                lambda conn: conn.execute(
+                    "UPDATE fraud_cases SET status = ?, outcome_note = ? WHERE username = ?",
+                    (status, note, username),
+                )
+            )
+        logger.info(f"Updated case for {tenant}/{username} to {status}")
+        return cursor.rowcount > 0
+
+    # -- cross-partition views ----------------------------------------------
+
+    def _owned(self, tenant: Optional[str] = None) -> List[Tuple[Partition, List[int]]]:
+        """Each partition with the buckets the manifest currently assigns to it."""
+        owned = []
+        with self._manifest_lock:
+            layouts = {t: list(self.manifest[t]["buckets"]) for t in ([tenant] if tenant else self.manifest)}
+        for t, buckets in layouts.items():
+            by_index: Dict[int, List[int]] = {}
+            for bucket, index in enumerate(buckets):
+                by_index.setdefault(index, []).append(bucket)
+            owned.extend((self._partition(t, index), mine) for index, mine in sorted(by_index.items()))
+        return owned
+
+    def _scatter(self, sql: str, params: Tuple = (), tenant: Optional[str] = None) -> List[Tuple[Partition, List[sqlite3.Row]]]:
+        """Run `sql` on every partition; its "{owned}" condition limits each one to the buckets it owns."""
+        if tenant:
+            self._tenant(tenant)
+        for _ in range(3):
+            version = self._layout_version
+            owned = self._owned(tenant)
+
+            def query(item: Tuple[Partition, List[int]]) -> List[sqlite3.Row]:
+                partition, buckets = item
+                condition = f"bucket IN ({', '.join('?' * len(buckets))})"
+                return partition.query(sql.format(owned=condition), tuple(buckets) + params)
+
+            results = list(zip((p for p, _ in owned), self._pool.map(query, owned)))
+            # A bucket that moved mid-read may have been read from neither side; read again
+            if self._layout_version == version:
+                break
+        return results
+
+    def triage(self, status: str = "pending_review", tenant: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent cases with `status` across every partition (of one tenant, or all)."""
+        results = self._scatter(
+            "SELECT * FROM fraud_cases WHERE {owned} AND status = ? ORDER BY transaction_time DESC LIMIT ?",
+            (status, limit),
+            tenant,
+        )
+        cases = [
+            dict(_case(row), tenant=partition.path.parent.name) for partition, rows in results for row in rows
+        ]
+        cases.sort(key=lambda c: c["transaction_time"] or "", reverse=True)
+        return cases[:limit]
+
+    def status_counts(self, tenant: Optional[str] = None) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        sql = "SELECT status, COUNT(*) AS n FROM fraud_cases WHERE {owned} GROUP BY status"
+        for _, rows in self._scatter(sql, tenant=tenant):
+            for row in rows:
+                counts[row["status"]] = counts.get(row["status"], 0) + row["n"]
+        return counts
+
+    # -- rebalancing ----------------------------------------------------------
+
+    def _move_bucket(self, tenant: str, bucket: int, target: int) -> int:
+        layout = self._tenant(tenant)
+        with self._bucket_locks[bucket]:
+            source = layout["buckets"][bucket]
+            if source == target:
+                return 0
+            src, dst = self._partition(tenant, source), self._partition(tenant, target)
+            rows = [tuple(row) for row in src.query(f"SELECT {', '.join(_COLUMNS)} FROM fraud_cases WHERE bucket = ?", (bucket,))]
+            dst.write(lambda conn: conn.executemany(_UPSERT, rows))
+            # Flip the route before deleting: a crash in between leaves a stale copy that _sweep removes
+            with self._manifest_lock:
+                layout["buckets"][bucket] = target
+                self._layout_version += 1
+                self._save_manifest()
+            src.write(lambda conn: conn.execute("DELETE FROM fraud_cases WHERE bucket = ?", (bucket,)))
+        return len(rows)
+
+    def _partition_files(self, tenant: str) -> List[int]:
+        """Indexes of every partition file on disk for `tenant`, retired ones included."""
+        found = (re.fullmatch(r"part-(\d+)\.db", path.name) for path in (self.root / tenant).glob("part-*.db"))
+        return sorted(int(match.group(1)) for match in found if match)
+
+    def _sweep(self, tenant: str) -> int:
+        """Delete rows left in a partition that no longer owns their bucket, and retired partition files."""
+        layout = self._tenant(tenant)
+        removed = 0
+        for index in sorted(set(range(layout["partitions"])) | set(self._partition_files(tenant))):
+            partition = self._partition(tenant, index)
+            stale = [b for b, owner in enumerate(layout["buckets"]) if owner != index]
+            if not stale:
+                continue
+            # Hold the buckets so a concurrent move's fresh copy isn't swept before its route flips
+            locks = [self._bucket_locks[b] for b in stale]
+            for lock in locks:
+                lock.acquire()
+            try:
+                cursor = partition.write(
+                    lambda conn, stale=stale: conn.execute(
+                        f"DELETE FROM fraud_cases WHERE bucket IN ({', '.join('?' * len(stale))})", stale
+                    )
+                )
+                removed += cursor.rowcount
+            finally:
+                for lock in reversed(locks):
+                    lock.release()
+            if index >= layout["partitions"] and len(stale) == BUCKETS:
+                self._retire(tenant, index)
+        return removed
+
+    def _retire(self, tenant: str, index: int) -> None:
+        """Close and delete a partition file that owns no buckets."""
+        with self._manifest_lock:
+            partition = self._partitions.pop((tenant, index), None)
+        if partition is None:
+            return
+        with partition.lock:
+            partition.close()
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{partition.path}{suffix}").unlink(missing_ok=True)
+        logger.info(f"Removed retired partition {partition.path}")
+
+    def rebalance(self, tenant: str, partitions: int) -> Dict[str, int]:
+        """Spread a tenant's buckets evenly over `partitions` files, moving as few buckets as possible."""
+        if partitions < 1:
+            raise ValueError("A tenant needs at least one partition")
+        layout = self._tenant(tenant)
+        with self._manifest_lock:
+            layout["partitions"] = max(layout["partitions"], partitions)
+            self._save_manifest()
+
+        # Target share per partition; the first BUCKETS % partitions take one extra
+        target = {i: BUCKETS // partitions + (i < BUCKETS % partitions) for i in range(partitions)}
+        owned: Dict[int, List[int]] = {}
+        for bucket, owner in enumerate(layout["buckets"]):
+            owned.setdefault(owner, []).append(bucket)
+
+        # Buckets to give away: everything on retired partitions, the excess on full ones
+        spare = []
+        for owner, buckets in owned.items():
+            keep = target.get(owner, 0)
+            spare.extend(buckets[keep:])
+        moved_buckets = moved_rows = 0
+        for index in range(partitions):
+            while len(owned.get(index, [])) < target[index] and spare:
+                bucket = spare.pop()
+                moved_rows += self._move_bucket(tenant, bucket, index)
+                owned.setdefault(index, []).append(bucket)
+                moved_buckets += 1
+
+        with self._manifest_lock:
+            layout["partitions"] = partitions
+            self._save_manifest()
+        stale = self._sweep(tenant)
+        logger.info(f"Rebalanced {tenant} to {partitions} partitions: {moved_buckets} buckets, {moved_rows} cases moved")
+        return {"partitions": partitions, "moved_buckets": moved_buckets, "moved_cases": moved_rows, "stale_removed": stale}
+
+    def migrate_legacy(self, tenant: str, db_path: Path = LEGACY_DB_PATH) -> int:
+        """Import every case from a single-file database.py database into `tenant`."""
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            cases = [dict(row) for row in conn.execute("SELECT * FROM fraud_cases")]
+        finally:
+            conn.close()
+        return self.upsert_cases(tenant, cases)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+        for partition in self._partitions.values():
+            partition.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Partitioned multi-tenant fraud case storage")
+    parser.add_argument("command", choices=["migrate", "rebalance", "triage", "counts"])
+    parser.add_argument("--root", type=Path, default=DEFAULT_ROOT)
+    parser.add_argument("--tenant", help="Bank / tenant id (all tenants for triage and counts if omitted)")
+    parser.add_argument("--partitions", type=int, default=DEFAULT_PARTITIONS)
+    parser.add_argument("--status", default="pending_review")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--legacy-db", type=Path, default=LEGACY_DB_PATH)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    store = FraudStore(args.root)
+    if args.command in ("migrate", "rebalance") and not args.tenant:
+        parser.error(f"{args.command} needs --tenant")
+    if args.command == "migrate":
+        print(json.dumps({"imported": store.migrate_legacy(args.tenant, args.legacy_db)}))
+    elif args.command == "rebalance":
+        print(json.dumps(store.rebalance(args.tenant, args.partitions)))
+    elif args.command == "triage":
+        print(json.dumps(store.triage(args.status, args.tenant, args.limit), indent=2, ensure_ascii=False))
+    else:
+        print(json.dumps(store.status_counts(args.tenant)))
+    store.close()
@@ -0,0 +1,162 @@
+"""
+Deterministic fast path for simple cart commands.
+
+"add two Whoppers" or "remove the onion rings" don't need an LLM round trip.
+`IntentRouter` recognises a small grammar of high-frequency, unambiguous
+commands and resolves the item against the catalog. Every word in the
+utterance must be accounted for by the grammar; anything else (notes,
+questions, several items, unknown or ambiguous names) returns None and the
+turn goes to the LLM as usual. Checkout is left to the LLM too, since it
+needs a confirmation turn before `place_order`.
+"""
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger("intent-router")
+
+QUANTITY_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+MAX_QUANTITY = 20
+
+VERBS = {
+    "add": ["add", "i want", "i need", "id like", "i would like", "ill have", "ill take",
+            "can i get", "can i have", "could i get", "could i have", "give me", "get me"],
+    "remove": ["remove", "delete", "drop", "cancel", "take off", "take out", "get rid of"],
+    "view": ["view", "show", "show me", "check", "read", "whats in", "what is in"],
+}
+
+# Words that may appear around a command without changing its meaning
+FILLERS = {
+    "please", "um", "uh", "ok", "okay", "yeah", "yes", "so", "just", "also", "now",
+    "the", "my", "me", "to", "in", "into", "from", "of", "it", "some", "for", "thanks",
+    "can", "you", "could", "cart", "order", "basket",
+}
+
+
+def _tokens(text: str) -> List[str]:
+    words = re.sub(r"[^a-z0-9\s]", "", text.lower().replace("-", " ")).split()
+    # Naive singular form, applied to both utterances and menu names
+    return [w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in words]
+
+
+@dataclass
+class Intent:
+    action: str
+    item: Optional[Dict[str, Any]] = None
+    quantity: int = 1
+
+
+class IntentRouter:
+    def __init__(self, catalog: List[Dict[str, Any]]):
+        self.aliases: List[Tuple[Tuple[str, ...], Dict[str, Any]]] = []
+        for item in catalog:
+            for alias in self._aliases(item["name"]):
+                self.aliases.append((tuple(_tokens(alias)), item))
+        # Longest aliases first so "chicken whopper" wins over "whopper"
+        self.aliases.sort(key=lambda a: -len(a[0]))
+        self.verbs = sorted(
+            ((tuple(_tokens(v)), action) for action, phrases in VERBS.items() for v in phrases),
+            key=lambda v: -len(v[0]),
+        )
+        self.routed = 0
+        self.fallthrough = 0
+
+    @staticmethod
+    def _aliases(name: str) -> List[str]:
+        """"Fries (Medium)" can be said as "fries medium", "medium fries" or just "fries"."""
+        match = re.match(r"^(.*?)\s*\((.*)\)$", name)
+        if not match:
+            return [name]
+        base, variant = match.groups()
+        return [f"{base} {variant}", f"{variant} {base}", base]
+
+    def _find(self, tokens: List[str], table) -> List[Tuple[int, int, Any]]:
+        """Non-overlapping matches of `table` phrases in `tokens`, longest first."""
+        taken = [False] * len(tokens)
+        found = []
+        for phrase, value in table:
+            n = len(phrase)
+            for start in range(len(tokens) - n + 1):
+                if tuple(tokens[start : start + n]) == phrase and not any(taken[start : start + n]):
+                    found.append((start, start + n, value))
+                    for i in range(start, start + n):
+                        taken[i] = True
+        return found
+
+    def parse(self, text: str, in_cart: Optional[Set[str]] = None) -> Optional[Intent]:
+        """Parse `text` into an Intent, or None if it isn't a simple, unambiguous command.
+
+        `in_cart` holds the catalog ids currently in the cart, used to disambiguate removals.
+        """
+        if "?" in text and not re.search(r"\bcart\b", text.lower()):
+            return None
+        tokens = _tokens(text)
+        if not tokens:
+            return None
+
+        verbs = self._find(tokens, self.verbs)
+        if len({v[2] for v in verbs}) != 1:
+            return None
+        action = verbs[0][2]
+        used = {i for start, end, _ in verbs for i in range(start, end)}
+
+        items = self._find([t if i not in used else "" for i, t in enumerate(tokens)], self.aliases)
+        resolved = []
+        for start, end, item in items:
+            # A bare base name ("fries") that maps to several sizes is ambiguous, unless
+            # only one of them is in the cart when removing
+            phrase = tuple(tokens[start:end])
+            candidates = [other for alias, other in self.aliases if alias == phrase]
+            if len(candidates) > 1 and action == "remove" and in_cart:
+                candidates = [c for c in candidates if c["id"] in in_cart]
+            if len(candidates) != 1:
+                return None
+            resolved.append(candidates[0])
+        item_ids = {item["id"] for item in resolved}
+        used |= {i for start, end, _ in items for i in range(start, end)}
+
+        quantity = None
+        for i, token in enumerate(tokens):
+            if i in used:
+                continue
+            value = QUANTITY_WORDS.get(token) or (int(token) if token.isdigit() else None)
+            if value is not None:
+                if quantity is not None:
+                    return None
+                quantity = value
+                used.add(i)
+
+        if any(t not in FILLERS for i, t in enumerate(tokens) if i not in used):
+            return None
+
+        if action in ("add", "remove"):
+            if len(item_ids) != 1:
+                return None
+            if action == "remove" and quantity is not None:
+                # "remove one whopper" could mean decrement; let the LLM decide
+                return None
+            if quantity is None:
+                quantity = 1
+            # "add 0 whoppers" is not an add
+            if not 1 <= quantity <= MAX_QUANTITY:
+                return None
+            return Intent(action=action, item=resolved[0], quantity=quantity)
+
+        if resolved or quantity is not None:
+            return None
+        if "cart" not in tokens and "order" not in tokens:
+            return None
+        return Intent(action=action)
+
+    def route(self, text: str, in_cart: Optional[Set[str]] = None) -> Optional[Intent]:
+        intent = self.parse(text, in_cart)
+        if intent:
+            self.routed += 1
+            logger.info(f"Fast path: {intent.action} {intent.item['name'] if intent.item else ''} x{intent.quantity}")
+        else:
+            self.fallthrough += 1
+        return intent
@@ -0,0 +1,207 @@
+"""
+Incremental lead export for CRM sync.
+
+`save_lead` appends every captured lead as one line to an append-only log
+(shared-data/leads.ndjson, next to leads.json). `LeadExporter` tails that log
+from a persisted byte-offset checkpoint, normalizes new records and writes
+them as batched NDJSON, CSV or Parquet segments, so each run only reads what
+was captured since the last one.
+
+Exactly-once: a segment is named after the log offsets it covers and written
+atomically before the checkpoint moves. A run that dies between the two
+rewrites the same segment with the same content on the next run instead of
+emitting a duplicate.
+
+    python -m src.lead_export --format csv            # one incremental run
+    python -m src.lead_export --watch 30              # keep tailing every 30s
+    python -m src.lead_export --backfill              # seed the log from leads.json once
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+logger = logging.getLogger("lead-export")
+
+SHARED_DATA = Path(__file__).resolve().parent.parent.parent / "shared-data"
+DEFAULT_LOG = SHARED_DATA / "leads.ndjson"
+DEFAULT_OUT_DIR = SHARED_DATA / "lead_exports"
+
+EXPORT_FIELDS = [
+    "lead_id", "captured_at", "name", "email", "role", "grade", "target_exam",
+    "timeline", "use_case", "team_size", "company", "extra",
+]
+FORMATS = ("ndjson", "csv", "parquet")
+
+
+def append_lead(log_path: Path, lead: Dict[str, Any]) -> Dict[str, Any]:
+    """Append one lead to the capture log, assigning it a stable id."""
+    record = {"lead_id": lead.get("lead_id") or uuid.uuid4().hex, **lead}
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    # A single O_APPEND write keeps concurrent sessions from interleaving lines
+    fd = os.open(log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line.encode("utf-8"))
+    finally:
+        os.close(fd)
+    return record
+
+
+def _clean(value: Any) -> str:
+    if value is None:
+        return ""
+    text = " ".join(str(value).split())
+    return "" if text.lower() in ("not specified", "n/a", "none") else text
+
+
+def normalize_lead(record: Dict[str, Any]) -> Dict[str, str]:
+    """Map a raw lead onto the export schema: trimmed strings, lowercase email, ISO timestamps."""
+    lead = {field: _clean(record.get(field)) for field in EXPORT_FIELDS if field != "extra"}
+    lead["email"] = lead["email"].lower()
+    lead["name"] = lead["name"].title() if lead["name"].islower() else lead["name"]
+    lead["target_exam"] = lead["target_exam"].upper() if len(lead["target_exam"]) <= 5 else lead["target_exam"]
+
+    captured = record.get("captured_at") or record.get("timestamp")
+    try:
+        lead["captured_at"] = datetime.fromisoformat(str(captured)).isoformat(timespec="seconds")
+    except ValueError:
+        lead["captured_at"] = _clean(captured)
+
+    extra = {k: v for k, v in record.items() if k not in EXPORT_FIELDS and k != "timestamp"}
+    lead["extra"] = json.dumps(extra, ensure_ascii=False, sort_keys=True) if extra else ""
+    return lead
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _encode(rows: List[Dict[str, str]], fmt: str) -> bytes:
+    if fmt == "ndjson":
+        return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode("utf-8")
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+        return buf.getvalue().encode("utf-8")
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)") from e
+    table = pa.Table.from_pylist(rows, schema=pa.schema([(field, pa.string()) for field in EXPORT_FIELDS]))
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink)
+    return sink.getvalue().to_pybytes()
+
+
+class LeadExporter:
+    def __init__(
+        self,
+        log_path: Path = DEFAULT_LOG,
+        out_dir: Path = DEFAULT_OUT_DIR,
+        fmt: str = "ndjson",
+        batch_size: int = 1000,
+    ):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}', expected one of {FORMATS}")
+        self.log_path = Path(log_path)
+        self.out_dir = Path(out_dir)
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.checkpoint_path = self.out_dir / f"checkpoint.{fmt}.json"
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+
+    def load_checkpoint(self) -> Dict[str, int]:
+        try:
+            return json.loads(self.checkpoint_path.read_text())
+        except FileNotFoundError:
+            return {"offset": 0, "exported": 0, "segments": 0}
+
+    def _save_checkpoint(self, checkpoint: Dict[str, int]) -> None:
+        _write_atomic(self.checkpoint_path, json.dumps(checkpoint).encode("utf-8"))
+
+    def _batches(self, offset: int) -> Iterator[Tuple[List[Dict[str, Any]], int]]:
+        """Yield (records, end offset) for complete lines after `offset`; a half-written last line waits."""
+        if not self.log_path.exists():
+            return
+        with open(self.log_path, "rb") as f:
+            f.seek(offset)
+            batch: List[Dict[str, Any]] = []
+            end = offset
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                end += len(line)
+                if line.strip():
+                    try:
+                        batch.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping malformed lead record ending at byte {end}")
+                if len(batch) >= self.batch_size:
+                    yield batch, end
+                    batch = []
+            if batch or end != offset:
+                yield batch, end
+
+    def run(self) -> Dict[str, int]:
+        """Export everything captured since the last checkpoint; returns the new checkpoint."""
+        checkpoint = self.load_checkpoint()
+        for records, end in self._batches(checkpoint["offset"]):
+            if records:
+                start = checkpoint["offset"]
+                segment = self.out_dir / f"leads-{start:012d}-{end:012d}.{self.fmt}"
+                _write_atomic(segment, _encode([normalize_lead(r) for r in records], self.fmt))
+                checkpoint["exported"] += len(records)
+                checkpoint["segments"] += 1
+                logger.info(f"Exported {len(records)} leads to {segment.name}")
+            checkpoint["offset"] = end
+            self._save_checkpoint(checkpoint)
+        return checkpoint
+
+
+def backfill(json_path: Path = SHARED_DATA / "leads.json", log_path: Path = DEFAULT_LOG) -> int:
+    """Seed the capture log from the legacy leads.json array, once."""
+    if log_path.exists():
+        logger.info(f"{log_path.name} already exists, skipping backfill")
+        return 0
+    leads = json.loads(json_path.read_text()) if json_path.exists() else []
+    for lead in leads:
+        append_lead(log_path, lead)
+    return len(leads)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export newly captured leads incrementally")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--log", type=Path, default=DEFAULT_LOG)
+    parser.add_argument("--out-dir", type=Path, default=DEFAULT_OUT_DIR)
+    parser.add_argument("--backfill", action="store_true", help="Seed the log from leads.json first")
+    parser.add_argument("--watch", type=float, help="Keep running, checking for new leads every N seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.backfill:
+        logger.info(f"Backfilled {backfill(log_path=args.log)} leads")
+
+    exporter = LeadExporter(args.log, args.out_dir, args.format, args.batch_size)
+    while True:
+        print(json.dumps(exporter.run()))
+        if not args.watch:
+            break
+        time.sleep(args.watch)
@@ -0,0 +1,83 @@
+"""
+Lead details picked out of the caller's words, without an LLM call.
+
+The PW agent runs `extract_lead_fields` on every user turn so the details a
+caller gives during qualification are known before `save_lead`: they are
+pinned into the bounded context window and snapshotted for resume. Only the
+matched fields are kept, never the raw transcript.
+
+Extraction is deliberately conservative; anything it misses is still in the
+recent turns, and the agent confirms every field before saving the lead.
+
+    >>> extract_lead_fields("Hi, my name is Riya Sharma and I'm preparing for NEET")
+    {'name': 'Riya Sharma', 'target_exam': 'NEET'}
+"""
+import re
+from typing import Dict
+
+MAX_FIELD_CHARS = 80
+
+_NAME = re.compile(
+    r"\b(?i:my name is|this is|i am|i'm|call me)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,2})\b"
+)
+_EMAIL = re.compile(r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b")
+# STT spells emails out: "riya dot sharma at gmail dot com"
+_SPOKEN_EMAIL = re.compile(
+    r"\b([\w+-]+(?:\s+dot\s+[\w+-]+)*)\s+at\s+([\w-]+(?:\s+dot\s+[\w-]+)+)\b", re.IGNORECASE
+)
+_EXAMS = [
+    (re.compile(r"\bJEE\s+(?:Mains?\s+and\s+)?Advanced\b", re.IGNORECASE), "JEE Advanced"),
+    (re.compile(r"\bJEE(?:\s+Mains?)?\b", re.IGNORECASE), "JEE"),
+    (re.compile(r"\bNEET\b", re.IGNORECASE), "NEET"),
+    (re.compile(r"\bUPSC\b|\bcivil services\b", re.IGNORECASE), "UPSC"),
+    (re.compile(r"\bboards?(?:\s+exams?)?\b", re.IGNORECASE), "Boards"),
+]
+_GRADE = re.compile(r"\b(?:class|grade|standard)\s+(\d{1,2})(?:st|nd|rd|th)?\b|\b(\d{1,2})(?:st|nd|rd|th)\s+(?:class|grade|standard)\b", re.IGNORECASE)
+_DROPPER = re.compile(r"\bdropper\b|\bdrop(?:ping)?\s+a\s+year\b", re.IGNORECASE)
+_PARENT = re.compile(r"\b(?:i'm|i am)\s+(?:a|the)\s+(?:parent|father|mother)\b|\bmy\s+(?:son|daughter|child|kid)\b", re.IGNORECASE)
+_STUDENT = re.compile(r"\b(?:i'm|i am)\s+(?:a\s+)?student\b|\bi\s+study\s+in\b", re.IGNORECASE)
+_TIMELINE = re.compile(
+    r"\b(immediately|right away|right now|as soon as possible|this year|next year|next month|this month|"
+    r"in\s+(?:a|one|two|three|six|\d+)\s+(?:weeks?|months?))\b",
+    re.IGNORECASE,
+)
+
+
+def extract_lead_fields(text: str) -> Dict[str, str]:
+    """Return the lead fields stated in one caller utterance, keyed like `save_lead`'s arguments."""
+    fields: Dict[str, str] = {}
+
+    match = _NAME.search(text)
+    if match:
+        fields["name"] = match.group(1)
+
+    for pattern, exam in _EXAMS:
+        if pattern.search(text):
+            fields["target_exam"] = exam
+            break
+
+    match = _GRADE.search(text)
+    if match:
+        fields["grade"] = f"{match.group(1) or match.group(2)}th"
+    elif _DROPPER.search(text):
+        fields["grade"] = "Dropper"
+
+    if _PARENT.search(text):
+        fields["role"] = "Parent"
+    elif _STUDENT.search(text):
+        fields["role"] = "Student"
+
+    match = _EMAIL.search(text)
+    if match:
+        fields["email"] = match.group(0).lower()
+    else:
+        match = _SPOKEN_EMAIL.search(text)
+        if match:
+            local, domain = (re.sub(r"\s+dot\s+", ".", part, flags=re.IGNORECASE) for part in match.groups())
+            fields["email"] = f"{local}@{domain}".lower()
+
+    match = _TIMELINE.search(text)
+    if match:
+        fields["timeline"] = match.group(1).capitalize()
+
+    return {key: value[:MAX_FIELD_CHARS] for key, value in fields.items()}
@@ -0,0 +1,219 @@
+"""
+Stable prompt prefixes and Gemini context caching.
+
+Agents build their static instructions (persona, catalog, FAQ) once through
+`build_static_prefix`, which serializes everything deterministically so the
+prefix is byte-identical on every turn and every session. Gemini caches such
+prefixes implicitly; when `GEMINI_CONTEXT_CACHE=1` the prefix and tool schemas
+are also registered as an explicit CachedContent resource, shared by all
+sessions in the process. `PromptBuildCache` keeps rendered prefixes per
+process so new sessions skip the file read and prompt assembly.
+`LLMCacheStats` reports cache hits next to TTFT.
+"""
+import hashlib
+import json
+import logging
+import os
+import textwrap
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from livekit.agents import llm
+from livekit.agents.metrics import LLMMetrics
+from livekit.plugins import google
+
+logger = logging.getLogger("llm-cache")
+
+CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+
+
+@dataclass(frozen=True)
+class StaticPrefix:
+    text: str
+    digest: str
+
+
+def build_static_prefix(instructions: str, **sections: Any) -> StaticPrefix:
+    """Join instructions and data sections into a byte-stable prompt prefix.
+
+    Sections are emitted in name order and serialized as sorted, compact JSON so
+    the same inputs always produce the same bytes.
+    """
+    parts = [textwrap.dedent(instructions).strip()]
+    for name in sorted(sections):
+        data = json.dumps(sections[name], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        parts.append(f"**{name.upper()} (JSON):**\n{data}")
+
+    text = "\n\n".join(parts)
+    return StaticPrefix(text=text, digest=hashlib.sha256(text.encode("utf-8")).hexdigest()[:16])
+
+
+def _template_digest(render: Callable) -> str:
+    """Identify a render function by its code, so editing the template invalidates its entries."""
+    func = getattr(render, "__func__", render)
+    code = func.__code__
+    source = repr((func.__qualname__, code.co_code, code.co_consts)).encode("utf-8")
+    return hashlib.sha256(source).hexdigest()[:16]
+
+
+@dataclass
+class _PromptEntry:
+    stat: Tuple[int, int]
+    content_digest: str
+    content: Any
+    value: Any
+    checked_at: float
+
+
+class PromptBuildCache:
+    """Rendered static prefixes keyed by content file and template, shared by every session in the process.
+
+    `render` builds the prefix, or anything else derived from the content (e.g. a
+    retrieval index alongside it), from the parsed JSON file.
+
+    The content file is re-checked at most every `check_interval` seconds, and only
+    with a stat call; it is re-read and hashed only when its size or mtime changed,
+    and the prompt is re-rendered only when the content hash changed.
+    """
+
+    def __init__(self, check_interval: float = 2.0):
+        self.check_interval = check_interval
+        self._entries: Dict[Tuple[str, str], _PromptEntry] = {}
+        self._lock = threading.Lock()
+        self.renders = 0
+
+    @staticmethod
+    def _stat(path: Path) -> Tuple[int, int]:
+        try:
+            st = path.stat()
+        except OSError:
+            return (0, 0)
+        return (st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def _read(path: Path) -> Tuple[Any, str]:
+        try:
+            raw = path.read_bytes()
+            return json.loads(raw), hashlib.sha256(raw).hexdigest()
+        except Exception as e:
+            logger.error(f"Error loading prompt content {path}: {e}")
+            return {}, ""
+
+    def get(self, path: Path, render: Callable[[Any], Any]) -> Tuple[Any, Any]:
+        """Return (content, rendered value) for `path`, rebuilding only on change."""
+        key = (str(path), _template_digest(render))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.checked_at < self.check_interval:
+                return entry.content, entry.value
+
+            stat = self._stat(path)
+            if entry is not None and entry.stat == stat:
+                entry.checked_at = now
+                return entry.content, entry.value
+
+            content, content_digest = self._read(path)
+            if entry is not None and entry.content_digest == content_digest and content_digest:
+                entry.stat, entry.checked_at = stat, now
+                return entry.content, entry.value
+
+            value = render(content)
+            self.renders += 1
+            self._entries[key] = _PromptEntry(stat, content_digest, content, value, now)
+            if entry is not None:
+                logger.info(f"{path.name} changed, rebuilt its prompt")
+            return content, value
+
+
+# Shared by all agents in the process
+PROMPT_CACHE = PromptBuildCache()
+
+
+# (model, prefix digest) -> (cache resource name, expiry timestamp)
+_CONTEXT_CACHES: Dict[str, tuple] = {}
+
+
+def context_cache_enabled() -> bool:
+    return os.getenv("GEMINI_CONTEXT_CACHE", "0") == "1"
+
+
+async def get_context_cache(model: str, prefix: StaticPrefix, tools: List[llm.Tool]) -> Optional[str]:
+    """Return the name of an explicit Gemini cache holding `prefix` and `tools`, creating it once per process."""
+    key = f"{model}:{prefix.digest}"
+    cached = _CONTEXT_CACHES.get(key)
+    if cached and cached[1] > time.time():
+        return cached[0]
+
+    try:
+        from google.genai import Client, types
+        from livekit.plugins.google.utils import create_tools_config
+
+        tools_config, _ = create_tools_config(llm.ToolContext(tools))
+        client = Client(api_key=os.getenv("GOOGLE_API_KEY"))
+        cache = await client.aio.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                display_name=f"prefix-{prefix.digest}",
+                system_instruction=prefix.text,
+                tools=tools_config or None,
+                ttl=f"{CACHE_TTL_SECONDS}s",
+            ),
+        )
+    except Exception as e:
+        # Prefixes below the provider minimum, or older plugin versions, fall back to implicit caching
+        logger.warning(f"Context cache unavailable for {key}, using implicit caching: {e}")
+        return None
+
+    # Refresh a little before the provider expires it
+    _CONTEXT_CACHES[key] = (cache.name, time.time() + CACHE_TTL_SECONDS - 60)
+    logger.info(f"Created Gemini context cache {cache.name} for {key}")
+    return cache.name
+
+
+async def build_gemini_llm(model: str, prefix: StaticPrefix, tools: List[llm.Tool]) -> google.LLM:
+    """Create the session LLM, attached to an explicit context cache when enabled."""
+    if context_cache_enabled():
+        cache_name = await get_context_cache(model, prefix, tools)
+        if cache_name:
+            return google.LLM(model=model, cached_content=cache_name)
+    return google.LLM(model=model)
+
+
+@dataclass
+class LLMCacheStats:
+    """Per-session prompt cache hit/miss accounting alongside TTFT."""
+
+    turns: int = 0
+    hits: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    ttfts: List[float] = field(default_factory=list)
+
+    def collect(self, m: Any) -> None:
+        if not isinstance(m, LLMMetrics):
+            return
+        self.turns += 1
+        self.prompt_tokens += m.prompt_tokens
+        self.cached_tokens += m.prompt_cached_tokens
+        if m.prompt_cached_tokens > 0:
+            self.hits += 1
+        if m.ttft >= 0:
+            self.ttfts.append(m.ttft)
+        logger.info(
+            f"LLM turn ttft={m.ttft:.3f}s prompt={m.prompt_tokens} "
+            f"cached={m.prompt_cached_tokens} ({'hit' if m.prompt_cached_tokens else 'miss'})"
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        avg_ttft = sum(self.ttfts) / len(self.ttfts) if self.ttfts else 0.0
+        return {
+            "turns": self.turns,
+            "cache_hits": self.hits,
+            "cache_misses": self.turns - self.hits,
+            "cached_token_ratio": round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+            "avg_ttft": round(avg_ttft, 3),
+        }
@@ -0,0 +1,269 @@
+"""
+Hedged LLM requests.
+
+Gemini time-to-first-token has a long tail, and every slow turn is dead air
+for the caller. `HedgedLLM` sends each request to the primary model; if no
+token has arrived by the hedge deadline (the recent p95 TTFT of the primary,
+clamped to [min_deadline, max_deadline]), it sends the same request to a
+backup model and streams whichever responds first.
+
+Only the winner's chunks are forwarded, so tool calls from the losing request
+never reach the session and each tool runs at most once. A losing backup is
+closed at once. A losing primary is kept open only until its own first token
+(at most `probe_timeout`), which measures the latency the hedge saved and
+keeps the p95 honest, and is then closed.
+
+Set LLM_HEDGE_MODEL (e.g. "gemini-2.5-flash-lite") to enable it in `hedge_llm`.
+"""
+import asyncio
+import collections
+import logging
+import os
+import time
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from livekit.agents import llm
+from livekit.agents.types import (
+    DEFAULT_API_CONNECT_OPTIONS,
+    NOT_GIVEN,
+    APIConnectOptions,
+    NotGivenOr,
+)
+from livekit.agents.utils import aio
+
+logger = logging.getLogger("llm-hedge")
+
+# Recent primary TTFTs per model, shared by every session in the process
+_TTFT_HISTORY: Dict[str, Deque[float]] = collections.defaultdict(lambda: collections.deque(maxlen=200))
+
+
+def _has_response(chunk: llm.ChatChunk) -> bool:
+    return chunk.delta is not None and bool(chunk.delta.content or chunk.delta.tool_calls)
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+class HedgedLLM(llm.LLM):
+    def __init__(
+        self,
+        primary: llm.LLM,
+        backup: llm.LLM,
+        *,
+        initial_deadline: float = 1.5,
+        min_deadline: float = 0.4,
+        max_deadline: float = 4.0,
+        min_samples: int = 20,
+        probe_timeout: float = 5.0,
+    ):
+        super().__init__()
+        self.primary = primary
+        self.backup = backup
+        self.initial_deadline = initial_deadline
+        self.min_deadline = min_deadline
+        self.max_deadline = max_deadline
+        self.min_samples = min_samples
+        self.probe_timeout = probe_timeout
+
+        self.stats: Dict[str, int] = collections.Counter()
+        self.latency_saved: List[float] = []
+
+        for instance in (primary, backup):
+            instance.on("metrics_collected", self._on_metrics_collected)
+
+    @property
+    def model(self) -> str:
+        return self.primary.model
+
+    @property
+    def provider(self) -> str:
+        return self.primary.provider
+
+    @property
+    def ttft_history(self) -> Deque[float]:
+        return _TTFT_HISTORY[self.primary.model]
+
+    def deadline(self) -> float:
+        """p95 of recent primary TTFTs, or `initial_deadline` until enough have been seen."""
+        history = list(self.ttft_history)
+        if len(history) < self.min_samples:
+            return self.initial_deadline
+        return min(max(percentile(history, 95), self.min_deadline), self.max_deadline)
+
+    def _on_metrics_collected(self, *args: Any, **kwargs: Any) -> None:
+        self.emit("metrics_collected", *args, **kwargs)
+
+    def chat(
+        self,
+        *,
+        chat_ctx: llm.ChatContext,
+        tools: Optional[List[llm.Tool]] = None,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+        parallel_tool_calls: NotGivenOr[bool] = NOT_GIVEN,
+        tool_choice: NotGivenOr[llm.ToolChoice] = NOT_GIVEN,
+        extra_kwargs: NotGivenOr[Dict[str, Any]] = NOT_GIVEN,
+    ) -> "HedgedLLMStream":
+        return HedgedLLMStream(
+            self,
+            chat_ctx=chat_ctx,
+            tools=tools or [],
+            conn_options=conn_options,
+            chat_kwargs={
+                "parallel_tool_calls": parallel_tool_calls,
+                "tool_choice": tool_choice,
+                "extra_kwargs": extra_kwargs,
+            },
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        requests = self.stats["requests"]
+        hedged = self.stats["hedged"]
+        return {
+            "requests": requests,
+            "hedge_rate": round(hedged / requests, 3) if requests else 0.0,
+            "backup_wins": self.stats["backup_wins"],
+            "latency_saved_total_s": round(sum(self.latency_saved), 3),
+            "latency_saved_p50_s": round(percentile(self.latency_saved, 50), 3) if self.latency_saved else 0.0,
+            "deadline_s": round(self.deadline(), 3),
+        }
+
+    async def aclose(self) -> None:
+        for instance in (self.primary, self.backup):
+            instance.off("metrics_collected", self._on_metrics_collected)
+
+
+class _Attempt:
+    """One request to one model, buffered until its first token."""
+
+    def __init__(self, name: str, stream: llm.LLMStream):
+        self.name = name
+        self.stream = stream
+        self.started = time.perf_counter()
+        self.ttft: Optional[float] = None
+        self.buffered: List[llm.ChatChunk] = []
+        self._iter = stream.__aiter__()
+        self.first = asyncio.create_task(self._read_first())
+
+    async def _read_first(self) -> None:
+        async for chunk in self._iter:
+            self.buffered.append(chunk)
+            if _has_response(chunk):
+                break
+        self.ttft = time.perf_counter() - self.started
+
+    @property
+    def ok(self) -> bool:
+        return self.first.done() and not self.first.cancelled() and self.first.exception() is None
+
+    async def rest(self):
+        async for chunk in self._iter:
+            yield chunk
+
+    async def aclose(self) -> None:
+        await aio.cancel_and_wait(self.first)
+        await self.stream.aclose()
+
+
+class HedgedLLMStream(llm.LLMStream):
+    def __init__(self, llm: HedgedLLM, *, chat_ctx, tools, conn_options, chat_kwargs: Dict[str, Any]):
+        super().__init__(llm, chat_ctx=chat_ctx, tools=tools, conn_options=conn_options)
+        self._hedged = llm
+        self._chat_kwargs = chat_kwargs
+        self._attempts: List[_Attempt] = []
+
+    def _start(self, name: str) -> _Attempt:
+        instance = self._hedged.primary if name == "primary" else self._hedged.backup
+        stream = instance.chat(
+            chat_ctx=self._chat_ctx, tools=self._tools, conn_options=self._conn_options, **self._chat_kwargs
+        )
+        attempt = _Attempt(name, stream)
+        self._attempts.append(attempt)
+        return attempt
+
+    async def _race(self) -> _Attempt:
+        primary = self._start("primary")
+        deadline = self._hedged.deadline()
+        await asyncio.wait({primary.first}, timeout=deadline)
+        if primary.ok:
+            self._hedged.ttft_history.append(primary.ttft)
+            return primary
+
+        if primary.first.done():
+            logger.warning(f"Primary LLM failed, using backup: {primary.first.exception()}")
+            self._hedged.stats["primary_failures"] += 1
+        else:
+            logger.info(f"No LLM token after {deadline:.2f}s, sending hedge request")
+            self._hedged.stats["hedged"] += 1
+        backup = self._start("backup")
+
+        pending = {primary.first, backup.first}
+        while pending:
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if primary.ok:
+                self._hedged.stats["primary_wins"] += 1
+                self._hedged.ttft_history.append(primary.ttft)
+                return primary
+            if backup.ok:
+                if not primary.first.done():
+                    self._hedged.stats["backup_wins"] += 1
+                    won_at = backup.started - primary.started + backup.ttft
+                    self._attempts.remove(primary)
+                    _probe_task = asyncio.create_task(self._probe(primary, won_at))
+                    _PROBES.add(_probe_task)
+                    _probe_task.add_done_callback(_PROBES.discard)
+                return backup
+        # Both failed; surface the backup's error
+        raise backup.first.exception()
+
+    async def _probe(self, primary: _Attempt, won_at: float) -> None:
+        """Wait for the losing primary's first token to measure what the hedge saved, then close it."""
+        try:
+            await asyncio.wait_for(asyncio.shield(primary.first), max(self._hedged.probe_timeout - won_at, 0))
+        except Exception:
+            pass
+        finally:
+            await primary.aclose()
+
+        # A primary that never answered within the probe counts as answering at the timeout
+        ttft = primary.ttft if primary.ok else max(self._hedged.probe_timeout, won_at)
+        self._hedged.ttft_history.append(ttft)
+        self._hedged.latency_saved.append(max(ttft - won_at, 0.0))
+
+    async def _run(self) -> None:
+        self._hedged.stats["requests"] += 1
+        try:
+            winner = await self._race()
+            # The loser is closed before the winner's first chunk is forwarded
+            for attempt in self._attempts:
+                if attempt is not winner:
+                    await attempt.aclose()
+            for chunk in winner.buffered:
+                self._event_ch.send_nowait(chunk)
+            async for chunk in winner.rest():
+                self._event_ch.send_nowait(chunk)
+        finally:
+            for attempt in self._attempts:
+                await attempt.aclose()
+            self._attempts.clear()
+
+    async def _metrics_monitor_task(self, event_aiter) -> None:
+        # The wrapped LLMs report their own metrics
+        async for _ in event_aiter:
+            pass
+
+
+# Keeps references to background probes of losing primaries
+_PROBES: Set[asyncio.Task] = set()
+
+
+def hedge_llm(primary: llm.LLM) -> llm.LLM:
+    """Wrap the session LLM with a LLM_HEDGE_MODEL backup when one is configured."""
+    backup_model = os.getenv("LLM_HEDGE_MODEL")
+    if not backup_model:
+        return primary
+
+    from livekit.plugins import google
+
+    return HedgedLLM(primary, google.LLM(model=backup_model))
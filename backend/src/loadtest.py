@@ -0,0 +1,248 @@
+"""
+Offline load-test harness for the agents.
+
+Drives GroceryAgent and PhysicsWallahSDRAgent through real AgentSessions in
+text mode, with a scripted LLM stand-in, and ramps the number of concurrent
+sessions in one process. STT and TTS are not exercised in text mode; their
+latency is simulated before and after each turn so the session timing stays
+realistic.
+
+    python -m src.loadtest --agent grocery --levels 1,10,50,100 --llm-latency 0.3
+
+Reports per level: turn throughput, event-loop lag, tool latency percentiles
+and memory per session.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import psutil
+from livekit.agents import AgentSession, FunctionToolsExecutedEvent, llm, utils
+from livekit.agents.types import DEFAULT_API_CONNECT_OPTIONS
+
+logger = logging.getLogger("loadtest")
+
+
+@dataclass
+class Step:
+    user: str
+    reply: str
+    tool: Optional[Tuple[str, Dict[str, Any]]] = None
+
+
+GROCERY_SCRIPT = [
+    Step("I'd like a Whopper with no onions", "Added a Whopper with no onions. Make it a meal?",
+         ("add_to_cart", {"item_name": "Whopper", "quantity": 1, "notes": "no onions"})),
+    Step("Sure, add medium fries as well", "Done, medium fries added.",
+         ("add_to_cart", {"item_name": "Fries (Medium)", "quantity": 1})),
+    Step("Actually also two Pepsis", "Two Pepsis added.",
+         ("add_to_cart", {"item_name": "Pepsi (Medium)", "quantity": 2})),
+    Step("Can you read back my order", "Here is your order.", ("view_cart", {})),
+    Step("Great, go ahead and place it", "Your order is placed!", ("place_order", {})),
+]
+
+PW_SCRIPT = [
+    Step("Hi, I'm Riya, a class 12 student", "Hi Riya! Which exam are you preparing for?"),
+    Step("NEET, how much do the batches cost?", "Our NEET batches are very affordable. When do you plan to join?"),
+    Step("Right away. My email is riya@example.com", "Thanks Riya, I've noted everything.",
+         ("save_lead", {"name": "Riya", "role": "Student", "grade": "12th",
+                        "target_exam": "NEET", "email": "riya@example.com", "timeline": "Immediately"})),
+]
+
+
+class ScriptedLLM(llm.LLM):
+    """LLM stand-in that answers from a script after a fixed latency."""
+
+    def __init__(self, script: List[Step], latency: float = 0.3):
+        super().__init__()
+        self.steps = {step.user: step for step in script}
+        self.latency = latency
+
+    def chat(self, *, chat_ctx: llm.ChatContext, tools=None, conn_options=DEFAULT_API_CONNECT_OPTIONS, **kwargs):
+        return _ScriptedStream(self, chat_ctx=chat_ctx, tools=tools or [], conn_options=conn_options)
+
+
+class _ScriptedStream(llm.LLMStream):
+    async def _run(self) -> None:
+        await asyncio.sleep(self._llm.latency)
+
+        items = self._chat_ctx.items
+        user_text = next((i.text_content for i in reversed(items) if i.type == "message" and i.role == "user"), "")
+        step = self._llm.steps.get(user_text)
+        request_id = utils.shortuuid()
+
+        if step and step.tool and items[-1].type != "function_call_output":
+            name, args = step.tool
+            call = llm.FunctionToolCall(name=name, arguments=json.dumps(args), call_id=utils.shortuuid())
+            delta = llm.ChoiceDelta(role="assistant", tool_calls=[call])
+        else:
+            delta = llm.ChoiceDelta(role="assistant", content=step.reply if step else "Sorry, could you repeat that?")
+        self._event_ch.send_nowait(llm.ChatChunk(id=request_id, delta=delta))
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+class LoopLagMonitor:
+    """Samples event-loop lag and peak RSS while a level runs."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.lags: List[float] = []
+        self.peak_rss = 0
+        self._process = psutil.Process()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(time.perf_counter() - start - self.interval)
+            self.peak_rss = max(self.peak_rss, self._process.memory_info().rss)
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *args):
+        self._task.cancel()
+
+
+def _make_agent(kind: str, workdir: Path):
+    try:
+        from src.order_manager import OrderManager
+    except ImportError:
+        from order_manager import OrderManager
+
+    if kind == "grocery":
+        try:
+            from src.agent import GroceryAgent
+        except ImportError:
+            from agent import GroceryAgent
+
+        agent = GroceryAgent()
+        agent.order_manager = OrderManager(orders_dir=str(workdir / "orders"))
+        return agent, GROCERY_SCRIPT
+
+    try:
+        from src.agent_pw import PhysicsWallahSDRAgent
+    except ImportError:
+        from agent_pw import PhysicsWallahSDRAgent
+
+    agent = PhysicsWallahSDRAgent()
+    agent.leads_path = workdir / "leads.json"
+    return agent, PW_SCRIPT
+
+
+async def run_session(
+    kind: str,
+    workdir: Path,
+    args,
+    tool_latencies: List[float],
+    on_start: Optional[Callable[[Any, AgentSession], None]] = None,
+) -> int:
+    agent, script = _make_agent(kind, workdir)
+    turns = 0
+    async with ScriptedLLM(script, latency=args.llm_latency) as scripted_llm, AgentSession(llm=scripted_llm) as session:
+
+        @session.on("function_tools_executed")
+        def _on_tools(ev: FunctionToolsExecutedEvent):
+            for call, output in zip(ev.function_calls, ev.function_call_outputs):
+                if output is not None:
+                    tool_latencies.append(output.created_at - call.created_at)
+
+        await session.start(agent)
+        if on_start is not None:
+            on_start(agent, session)
+        for step in script:
+            await asyncio.sleep(args.stt_latency)
+            await session.run(user_input=step.user)
+            await asyncio.sleep(args.tts_latency)
+            turns += 1
+    return turns
+
+
+async def run_level(kind: str, sessions: int, args) -> Dict[str, Any]:
+    process = psutil.Process()
+    baseline_rss = process.memory_info().rss
+    tracemalloc.reset_peak()
+    baseline_traced, _ = tracemalloc.get_traced_memory()
+    tool_latencies: List[float] = []
+
+    with tempfile.TemporaryDirectory() as tmp, LoopLagMonitor() as monitor:
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(run_session(kind, Path(tmp), args, tool_latencies) for _ in range(sessions)),
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - start
+
+    errors = [r for r in results if isinstance(r, BaseException)]
+    for error in errors[:3]:
+        logger.error(f"Session failed: {error!r}")
+    turns = sum(r for r in results if isinstance(r, int))
+    _, peak_traced = tracemalloc.get_traced_memory()
+
+    return {
+        "agent": kind,
+        "sessions": sessions,
+        "errors": len(errors),
+        "turns": turns,
+        "elapsed_s": round(elapsed, 3),
+        "turns_per_s": round(turns / elapsed, 2) if elapsed else 0.0,
+        "loop_lag_p50_ms": round(percentile(monitor.lags, 50) * 1000, 2),
+        "loop_lag_p99_ms": round(percentile(monitor.lags, 99) * 1000, 2),
+        "loop_lag_max_ms": round(max(monitor.lags, default=0.0) * 1000, 2),
+        "tool_p50_ms": round(percentile(tool_latencies, 50) * 1000, 2),
+        "tool_p95_ms": round(percentile(tool_latencies, 95) * 1000, 2),
+        "tool_p99_ms": round(percentile(tool_latencies, 99) * 1000, 2),
+        "rss_per_session_kb": round(max(monitor.peak_rss - baseline_rss, 0) / sessions / 1024, 1),
+        "traced_per_session_kb": round((peak_traced - baseline_traced) / sessions / 1024, 1),
+    }
+
+
+async def main(args) -> List[Dict[str, Any]]:
+    tracemalloc.start()
+    reports = []
+    for kind in args.agent.split(","):
+        # One unmeasured session first, so imports and lazy initialization don't skew level 1
+        with tempfile.TemporaryDirectory() as tmp:
+            await run_session(kind, Path(tmp), args, [])
+
+        for sessions in (int(n) for n in args.levels.split(",")):
+            report = await run_level(kind, sessions, args)
+            reports.append(report)
+            print(json.dumps(report))
+    tracemalloc.stop()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2)
+    return reports
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ramp concurrent text-mode agent sessions in one process")
+    parser.add_argument("--agent", default="grocery,pw", help="Comma-separated: grocery, pw")
+    parser.add_argument("--levels", default="1,10,50,100", help="Comma-separated concurrent session counts")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Scripted LLM latency (s)")
+    parser.add_argument("--stt-latency", type=float, default=0.2, help="Simulated STT finalization delay (s)")
+    parser.add_argument("--tts-latency", type=float, default=0.1, help="Simulated TTS time to first byte (s)")
+    parser.add_argument("--output", help="Write the reports to this JSON file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,255 @@
+"""
+Non-blocking, sampled logging for the agent job processes.
+
+Without this, every record is formatted and written (or pickled for livekit's
+IPC log forwarder) on the thread that logged it, which is the audio event
+loop. `setup_log_pipeline()` replaces the root handlers with one
+`QueueHandler`:
+
+- the caller only runs the sampling filter and a `put_nowait`. Records are
+  formatted later, on the writer thread, and are dropped (and counted) if
+  the queue is full.
+- a `QueueListener` thread feeds the handlers that were installed before
+  (livekit's console / IPC handler).
+- each event type (one logging call site: logger name, file and line) can
+  be sampled with LOG_SAMPLING, e.g. "*metrics=0.2" keeps 1 in 5
+  STT/LLM/TTS/EOU metrics records. Rules are matched against the logger name
+  and message of the site's first record. Every type is also capped at
+  LOG_RATE_CAP records per second.
+  Warnings and errors are never sampled, only capped. The first record let
+  through after some were dropped carries a `suppressed` count.
+
+Because formatting is deferred, log arguments should not be mutated after
+the call. Use %-style arguments (logger.info("x=%s", x)) on hot paths so
+that dropped records are never formatted.
+
+Job processes forward their records to the main worker process over
+livekit's IPC, so only the main process writes the JSON-lines file
+(LOG_FILE). It rotates on size (LOG_MAX_BYTES) and age
+(LOG_ROTATE_INTERVAL_S). Several processes rotating one file would lose
+records.
+
+    setup_log_pipeline()              # in prewarm; LOG_PIPELINE=0 disables it
+    setup_log_file()                  # in __main__, before cli.run_app
+"""
+import asyncio
+import atexit
+import copy
+import fnmatch
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("log-pipeline")
+
+LOG_PIPELINE = os.getenv("LOG_PIPELINE", "1").lower() not in ("0", "false", "no")
+LOG_FILE = os.getenv("LOG_FILE", str(Path(__file__).parent.parent / "logs" / "agent.log"))
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+LOG_ROTATE_INTERVAL_S = float(os.getenv("LOG_ROTATE_INTERVAL_S", str(24 * 3600)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Comma-separated "<name>:<message> glob=keep ratio"; the first matching rule wins
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "*metrics=0.2")
+LOG_RATE_CAP = int(os.getenv("LOG_RATE_CAP", "50"))
+
+# Attributes every LogRecord has; anything else was passed as `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+_MAX_EVENT_TYPES = 4096
+
+
+def parse_sampling(spec: str) -> List[Tuple[str, float]]:
+    rules = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        pattern, _, rate = part.rpartition("=")
+        rules.append((pattern, float(rate)))
+    return rules
+
+
+class SamplingFilter(logging.Filter):
+    """Per event type: keep 1 in every 1/rate records below WARNING, and at most `rate_cap` per second."""
+
+    def __init__(self, rules: List[Tuple[str, float]], rate_cap: int = LOG_RATE_CAP):
+        super().__init__()
+        self.rules = rules
+        self.rate_cap = rate_cap
+        self.dropped: Counter = Counter()
+        # event type -> [keep every n (0 = sampling off), seen, window second, passed in window, suppressed]
+        self._state: Dict[str, list] = {}
+
+    def _new_state(self, event: str, record: logging.LogRecord) -> list:
+        if len(self._state) >= _MAX_EVENT_TYPES:
+            self._state.clear()
+        msg = record.msg if isinstance(record.msg, str) else type(record.msg).__name__
+        name = f"{record.name}:{msg}"
+        rate = next((r for pattern, r in self.rules if fnmatch.fnmatchcase(name, pattern)), 1.0)
+        every = 0 if rate >= 1.0 else (max(1, round(1 / rate)) if rate > 0 else -1)
+        state = self._state[event] = [every, 0, 0, 0, 0]
+        return state
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Keyed on the call site, not the message: f-string messages differ on every call
+        event = f"{record.name}:{record.pathname}:{record.lineno}"
+        state = self._state.get(event) or self._new_state(event, record)
+
+        if record.levelno < logging.WARNING and state[0]:
+            state[1] += 1
+            if state[0] < 0 or (state[1] - 1) % state[0]:
+                self.dropped[event] += 1
+                return False
+
+        now = int(time.monotonic())
+        if state[2] != now:
+            state[2], state[3] = now, 0
+        if self.rate_cap and state[3] >= self.rate_cap:
+            state[4] += 1
+            self.dropped[event] += 1
+            return False
+        state[3] += 1
+        if state[4]:
+            record.suppressed = state[4]
+            state[4] = 0
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread unformatted; never blocks when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.overflow = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock QueueHandler formats here, on the logging thread; the writer thread does it instead
+        return copy.copy(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.overflow += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: level, name, message, any `extra` fields and a UTC timestamp."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"level": record.levelname, "name": record.name, "message": record.getMessage()}
+        entry.update((k, v) for k, v in record.__dict__.items() if k not in _RECORD_ATTRS)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        entry["timestamp"] = datetime.fromtimestamp(record.created, timezone.utc).isoformat()
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler that also rolls over every `interval_s` seconds (numbered backups either way)."""
+
+    def __init__(self, filename: str, max_bytes: int, interval_s: float, backup_count: int):
+        Path(filename).parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.interval_s = interval_s
+        self.rollover_at = time.time() + interval_s
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:  # noqa: N802
+        if self.interval_s and time.time() >= self.rollover_at:
+            if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+                return True
+            self.rollover_at = time.time() + self.interval_s
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:  # noqa: N802
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval_s
+
+
+class LogPipeline:
+    def __init__(self, handlers: List[logging.Handler], sampling: SamplingFilter, queue_size: int = LOG_QUEUE_SIZE):
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self.handler.addFilter(sampling)
+        self.sampling = sampling
+        self.handlers = handlers
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+
+    def start(self) -> None:
+        self.listener.start()
+
+    def drain(self, timeout: float = 2.0) -> None:
+        """Wait (up to `timeout`) for queued records to reach the handlers."""
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        for handler in self.handlers:
+            handler.flush()
+
+    def stop(self) -> None:
+        """Drain the queue and close the file handler."""
+        if self.listener._thread is not None:
+            self.listener.stop()
+        for handler in self.handlers:
+            handler.flush()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "queued": self.queue.qsize(),
+            "overflow": self.handler.overflow,
+            "dropped": sum(self.sampling.dropped.values()),
+            "top_dropped": dict(self.sampling.dropped.most_common(5)),
+        }
+
+
+_pipeline: Optional[LogPipeline] = None
+
+
+def setup_log_pipeline(
+    log_file: Optional[str] = None,
+    sampling: str = LOG_SAMPLING,
+    rate_cap: int = LOG_RATE_CAP,
+    max_bytes: int = LOG_MAX_BYTES,
+    rotate_interval_s: float = LOG_ROTATE_INTERVAL_S,
+    backup_count: int = LOG_BACKUP_COUNT,
+) -> Optional[LogPipeline]:
+    """Move the root logger's handlers behind a queue (plus a rotating JSON file if given). Once per process."""
+    global _pipeline
+    if _pipeline is not None or not LOG_PIPELINE:
+        return _pipeline
+
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    for handler in handlers:
+        root.removeHandler(handler)
+    if log_file:
+        file_handler = SizeAndTimeRotatingFileHandler(log_file, max_bytes, rotate_interval_s, backup_count)
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    pipeline = LogPipeline(handlers, SamplingFilter(parse_sampling(sampling), rate_cap))
+    pipeline.start()
+    root.addHandler(pipeline.handler)
+    atexit.register(pipeline.stop)
+    _pipeline = pipeline
+    logger.info(f"Logging through a background writer ({len(handlers)} handlers, sampling '{sampling}', cap {rate_cap}/s)")
+    return pipeline
+
+
+def setup_log_file(log_file: str = LOG_FILE) -> Optional[LogPipeline]:
+    """The main worker process's pipeline: the log file, fed with its own and the job processes' records."""
+    # Jobs already sampled and capped their records before forwarding them
+    return setup_log_pipeline(log_file, sampling="", rate_cap=0)
+
+
+def log_pipeline_stats() -> Dict[str, object]:
+    return _pipeline.stats() if _pipeline is not None else {}
+
+
+async def drain_log_pipeline(timeout: float = 2.0) -> None:
+    """Write out what is queued before the job process exits (it may not run atexit hooks)."""
+    if _pipeline is not None:
+        await asyncio.to_thread(_pipeline.drain, timeout)
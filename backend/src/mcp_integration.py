@@ -11,6 +11,11 @@ import requests
 from notion_client import Client as NotionClient
 from todoist_api_python.api import TodoistAPI
 
+try:
+    from src.tool_tracing import traced_tool
+except ImportError:
+    from tool_tracing import traced_tool
+
 class MCPIntegration:
     """Handles MCP connections to Notion and Todoist with real API calls"""
     
@@ -94,6 +99,7 @@ class MCPIntegration:
             print(f"❌ Failed to create Notion database: {e}")
             return None
     
+    @traced_tool(name="mcp.notion.create_entry")
     async def create_notion_wellness_entry(
         self,
         date: str,
@@ -156,6 +162,7 @@ class MCPIntegration:
                 "message": f"Failed to create Notion entry: {str(e)}"
             }
     
+    @traced_tool(name="mcp.todoist.create_tasks")
     async def create_todoist_tasks(
         self,
         goals: List[str],
@@ -206,6 +213,7 @@ class MCPIntegration:
                 "message": f"Failed to create Todoist tasks: {str(e)}"
             }
     
+    @traced_tool(name="mcp.todoist.complete_task")
     async def mark_todoist_task_complete(
         self,
         task_id: str
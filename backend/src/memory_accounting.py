@@ -0,0 +1,377 @@
+"""
+Per-session memory accounting and leak detection.
+
+With MEMORY_ACCOUNTING=1 the worker traces allocations (tracemalloc) and, per
+session:
+
+- snapshots traced memory and RSS when the session starts and ends
+- charges the growth to a subsystem (cart, chat history, usage metrics, MCP
+  client, agent, livekit) by the innermost frame that belongs to one
+- holds weak references to the session's objects (agent, cart, AgentSession,
+  usage collector) and reports any still alive LEAK_GRACE_S after teardown
+- measures the process-wide singletons (MCP client, tool stats, phrase
+  cache) at each session end, so state that only ever grows shows up
+
+The soak mode runs thousands of scripted text-mode sessions (see loadtest)
+in waves of `--concurrency` and reports steady-state memory per concurrent
+call, plus the memory retained per finished session, which should be ~0.
+
+    MEMORY_ACCOUNTING=1 python src/agent.py dev
+    python -m src.memory_accounting soak --agent grocery --sessions 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+import weakref
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import psutil
+
+logger = logging.getLogger("memory-accounting")
+
+MEMORY_ACCOUNTING = os.getenv("MEMORY_ACCOUNTING", "").lower() in ("1", "true", "yes")
+MEMORY_TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "16"))
+# Session objects still alive this long after teardown are reported as leaks
+LEAK_GRACE_S = float(os.getenv("MEMORY_LEAK_GRACE_S", "30"))
+
+_SRC_DIR = str(Path(__file__).resolve().parent)
+_OWN_MODULES = {
+    "cart.py": "cart",
+    "cart_commands.py": "cart",
+    "context_window.py": "chat_history",
+    "mcp_integration.py": "mcp_client",
+    "llm_cache.py": "usage_metrics",
+    "tool_tracing.py": "usage_metrics",
+    "agent.py": "agent",
+    "agent_pw.py": "agent",
+    "intent_router.py": "agent",
+    "session_state.py": "agent",
+}
+_LIBRARY_PATHS = [
+    (os.path.join("livekit", "agents", "llm", "chat_context.py"), "chat_history"),
+    (os.path.join("livekit", "agents", "metrics", ""), "usage_metrics"),
+    (os.path.join("", "livekit", ""), "livekit"),
+]
+# Process-wide singletons measured after each session: (label, module, attribute)
+SINGLETONS = [
+    ("mcp_client", "mcp_integration", "mcp_client"),
+    ("tool_stats", "tool_tracing", "TOOL_STATS"),
+    ("phrase_cache", "agent", "PHRASE_CACHE"),
+]
+
+
+def subsystem_for(filename: str) -> Optional[str]:
+    if filename.startswith(_SRC_DIR):
+        return _OWN_MODULES.get(os.path.basename(filename))
+    for fragment, subsystem in _LIBRARY_PATHS:
+        if fragment in filename:
+            return subsystem
+    return None
+
+
+def attribute(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> Dict[str, int]:
+    """Net bytes allocated between two snapshots, per subsystem ("other" when no frame matches)."""
+    totals: Counter = Counter()
+    for stat in after.compare_to(before, "traceback"):
+        if not stat.size_diff:
+            continue
+        # Frames are oldest first; the innermost one we recognise decides
+        subsystem = next(
+            (s for s in (subsystem_for(frame.filename) for frame in reversed(stat.traceback)) if s), "other"
+        )
+        totals[subsystem] += stat.size_diff
+    return dict(totals.most_common())
+
+
+def deep_size(obj: Any, limit: int = 100_000) -> int:
+    """Approximate bytes reachable from `obj`. Skips modules, types, functions and loggers; stops after `limit` objects."""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack and len(seen) < limit:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, (type, types.ModuleType, types.FunctionType, logging.Logger)):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current, 0)
+        stack.extend(gc.get_referents(current))
+    return total
+
+
+def _singleton(module: str, attr: str) -> Any:
+    # Only ones already imported: measuring must not pull in optional dependencies
+    for name in (f"src.{module}", module):
+        if name in sys.modules:
+            return getattr(sys.modules[name], attr, None)
+    return None
+
+
+@dataclass
+class SessionMemory:
+    session_id: str
+    started_at: float
+    rss_start: int
+    traced_start: int
+    snapshot: Optional[tracemalloc.Snapshot] = None
+    watched: List[Tuple[str, weakref.ref]] = field(default_factory=list)
+    ended_at: Optional[float] = None
+    rss_delta: int = 0
+    traced_delta: int = 0
+    by_subsystem: Dict[str, int] = field(default_factory=dict)
+    leaked: List[str] = field(default_factory=list)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "session": self.session_id,
+            "duration_s": round((self.ended_at or time.time()) - self.started_at, 1),
+            "rss_delta_kb": round(self.rss_delta / 1024, 1),
+            "traced_delta_kb": round(self.traced_delta / 1024, 1),
+            "by_subsystem_kb": {k: round(v / 1024, 1) for k, v in self.by_subsystem.items()},
+            "leaked": self.leaked,
+        }
+
+
+class MemoryTracker:
+    """Tracks sessions in one worker process. `snapshots=False` skips per-session attribution (cheap mode)."""
+
+    def __init__(
+        self,
+        frames: int = MEMORY_TRACE_FRAMES,
+        leak_grace_s: float = LEAK_GRACE_S,
+        snapshots: bool = True,
+        check_after_end: bool = True,
+    ):
+        self.frames = frames
+        self.leak_grace_s = leak_grace_s
+        self.snapshots = snapshots
+        # Schedule a leak check `leak_grace_s` after each session ends (needs a running loop)
+        self.check_after_end = check_after_end
+        self.sessions: Dict[str, SessionMemory] = {}
+        self.ended: List[SessionMemory] = []
+        self.leaks: Counter = Counter()
+        self.singleton_sizes: Dict[str, List[int]] = {}
+        self._process = psutil.Process()
+
+    @property
+    def enabled(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            logger.info(f"Memory accounting enabled ({self.frames} frames per allocation)")
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+
+    def session_start(self, session_id: str, objects: Optional[Dict[str, Any]] = None) -> SessionMemory:
+        # Also catches sessions whose scheduled check never ran
+        self.check_leaks()
+        record = SessionMemory(
+            session_id=session_id,
+            started_at=time.time(),
+            rss_start=self._process.memory_info().rss,
+            traced_start=tracemalloc.get_traced_memory()[0] if self.enabled else 0,
+            snapshot=self._snapshot() if self.enabled and self.snapshots else None,
+        )
+        self.sessions[session_id] = record
+        for label, obj in (objects or {}).items():
+            self.watch(session_id, label, obj)
+        return record
+
+    def watch(self, session_id: str, label: str, obj: Any) -> None:
+        """Expect `obj` to be garbage once the session has ended."""
+        self.sessions[session_id].watched.append((label, weakref.ref(obj)))
+
+    def session_end(self, session_id: str) -> Optional[SessionMemory]:
+        record = self.sessions.pop(session_id, None)
+        if record is None:
+            return None
+        record.ended_at = time.time()
+        record.rss_delta = self._process.memory_info().rss - record.rss_start
+        if self.enabled:
+            record.traced_delta = tracemalloc.get_traced_memory()[0] - record.traced_start
+            if record.snapshot is not None:
+                # Concurrent sessions in the same process share the window, so their growth overlaps
+                record.by_subsystem = attribute(record.snapshot, self._snapshot())
+        record.snapshot = None
+
+        for label, module, attr in SINGLETONS:
+            obj = _singleton(module, attr)
+            if obj is not None:
+                self.singleton_sizes.setdefault(label, []).append(deep_size(obj))
+
+        self.ended.append(record)
+        logger.info(f"Session memory: {json.dumps(record.report())}")
+        if self.check_after_end:
+            with contextlib.suppress(RuntimeError):
+                asyncio.get_running_loop().call_later(self.leak_grace_s, self.check_leaks)
+        return record
+
+    def check_leaks(self, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """Objects of sessions that ended over `leak_grace_s` ago and are still alive; each reported once."""
+        now = time.time() if now is None else now
+        due = [r for r in self.ended if now - r.ended_at >= self.leak_grace_s]
+        if not due:
+            return []
+        gc.collect()
+        found = []
+        for record in due:
+            for label, ref in record.watched:
+                if ref() is not None:
+                    record.leaked.append(label)
+                    self.leaks[label] += 1
+                    found.append((record.session_id, label))
+                    logger.warning(f"{label} of session {record.session_id} survived teardown")
+            # Drop the references either way, so a leaked object is only reported once
+            record.watched = []
+        self.ended = [r for r in self.ended if now - r.ended_at < self.leak_grace_s]
+        return found
+
+    def singleton_growth(self) -> Dict[str, int]:
+        """Bytes each singleton grew by between the first and the last session end."""
+        return {label: sizes[-1] - sizes[0] for label, sizes in self.singleton_sizes.items() if len(sizes) > 1}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "live_sessions": len(self.sessions),
+            "leaked_objects": dict(self.leaks),
+            "singleton_growth_kb": {k: round(v / 1024, 1) for k, v in self.singleton_growth().items()},
+        }
+
+
+MEMORY_TRACKER = MemoryTracker()
+
+
+def setup_memory_accounting() -> bool:
+    """Start tracing if MEMORY_ACCOUNTING is set; call from prewarm."""
+    if MEMORY_ACCOUNTING:
+        MEMORY_TRACKER.start()
+    return MEMORY_TRACKER.enabled
+
+
+def _slope(xs: List[float], ys: List[float]) -> float:
+    n = len(xs)
+    mean_x, mean_y = sum(xs) / n, sum(ys) / n
+    var = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var if var else 0.0
+
+
+async def soak(
+    kind: str,
+    sessions: int,
+    concurrency: int,
+    llm_latency: float = 0.05,
+    warmup_waves: int = 2,
+) -> Dict[str, Any]:
+    """Run `sessions` scripted sessions, `concurrency` at a time, and measure what each leaves behind."""
+    try:
+        from src import loadtest
+    except ImportError:
+        import loadtest
+
+    args = loadtest.parse_args(["--llm-latency", str(llm_latency), "--stt-latency", "0", "--tts-latency", "0"])
+    tracker = MemoryTracker(snapshots=False, leak_grace_s=0.0, check_after_end=False)
+    owns_tracing = not tracemalloc.is_tracing()
+    if owns_tracing:
+        tracemalloc.start(1)
+
+    def settled() -> int:
+        gc.collect()
+        return tracemalloc.get_traced_memory()[0]
+
+    completed: List[float] = []
+    retained: List[float] = []
+    peaks: List[int] = []
+    errors = 0
+    session_ids = iter(range(sessions))
+    waves = -(-sessions // concurrency)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+
+            async def one(n: int) -> int:
+                def on_start(agent, session):
+                    objects = {"agent": agent, "session": session}
+                    if hasattr(agent, "cart"):
+                        objects["cart"] = agent.cart
+                    tracker.session_start(f"soak-{n}", objects)
+
+                try:
+                    return await loadtest.run_session(kind, Path(tmp), args, [], on_start=on_start)
+                finally:
+                    tracker.session_end(f"soak-{n}")
+                    # As the entrypoints' shutdown does; outside a job the calls are recorded under room ""
+                    tool_stats = _singleton("tool_tracing", "TOOL_STATS")
+                    if tool_stats is not None:
+                        tool_stats.drop("")
+
+            done = 0
+            for wave in range(waves):
+                batch = [n for _, n in zip(range(concurrency), session_ids)]
+                base = settled()
+                tracemalloc.reset_peak()
+                results = await asyncio.gather(*(one(n) for n in batch), return_exceptions=True)
+                errors += sum(isinstance(r, BaseException) for r in results)
+                peaks.append((tracemalloc.get_traced_memory()[1] - base) // len(batch))
+                done += len(batch)
+                tracker.check_leaks()
+                if wave >= warmup_waves:
+                    completed.append(done)
+                    retained.append(settled())
+    finally:
+        if owns_tracing:
+            tracemalloc.stop()
+
+    steady = sorted(peaks[warmup_waves:] or peaks)
+    per_session = _slope(completed, retained) if len(completed) > 1 else 0.0
+    return {
+        "agent": kind,
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "errors": errors,
+        "per_concurrent_call_kb": round(steady[len(steady) // 2] / 1024, 1),
+        "retained_per_session_bytes": round(per_session, 1),
+        "leaked_objects": dict(tracker.leaks),
+        "singleton_growth_kb": {k: round(v / 1024, 1) for k, v in tracker.singleton_growth().items()},
+        "rss_mb": round(psutil.Process().memory_info().rss / 2**20, 1),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Memory soak test for the agents")
+    sub = parser.add_subparsers(dest="command", required=True)
+    soak_parser = sub.add_parser("soak", help="Run many scripted sessions and report steady-state memory")
+    soak_parser.add_argument("--agent", default="grocery", choices=["grocery", "pw"])
+    soak_parser.add_argument("--sessions", type=int, default=2000)
+    soak_parser.add_argument("--concurrency", type=int, default=50)
+    soak_parser.add_argument("--llm-latency", type=float, default=0.05, help="Scripted LLM latency (s)")
+    soak_parser.add_argument(
+        "--max-retained-bytes", type=float, default=1024.0,
+        help="Exit 1 if each finished session leaves more than this behind",
+    )
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(soak(args.agent, args.sessions, args.concurrency, args.llm_latency))
+    print(json.dumps(report, indent=2))
+    leaking = report["leaked_objects"] or report["retained_per_session_bytes"] > args.max_retained_bytes
+    return 1 if leaking else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
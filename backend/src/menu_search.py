@@ -0,0 +1,120 @@
+"""
+Descriptive menu search.
+
+Callers ask for "something spicy with chicken under ₹200" rather than item
+names. `MenuIndex` precomputes a BM25 index over each item's name, category
+and description, plus NumPy arrays of prices and categories, so a query is
+ranked and filtered in well under a millisecond. Price limits are taken from
+explicit tool arguments or, failing that, parsed from the query itself.
+"""
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from src.text_index import BM25Index, tokenize, top_k
+except ImportError:
+    from text_index import BM25Index, tokenize, top_k
+
+logger = logging.getLogger("menu-search")
+
+# Query words that should also match the menu's own vocabulary
+SYNONYMS = {
+    "spicy": "spicy jalapeno habanero peri fiery hot masala",
+    "hot": "spicy",
+    "vegetarian": "veg paneer aloo",
+    "veggie": "veg paneer aloo",
+    "drink": "beverage",
+    "sweet": "dessert sundae chocolate",
+    "snack": "side",
+}
+# A related word is weaker evidence than the word the caller actually used
+SYNONYM_WEIGHT = 0.5
+
+_NUMBER = r"(?:rs\.?|inr|₹)?\s*(\d+(?:\.\d+)?)\s*(?:rs|rupees|inr|₹)?"
+_MAX_PRICE = re.compile(rf"(?:under|below|less than|cheaper than|upto|up to|max(?:imum)?|within)\s*{_NUMBER}")
+_MIN_PRICE = re.compile(rf"(?:over|above|more than|at least)\s*{_NUMBER}")
+_BETWEEN = re.compile(rf"between\s*{_NUMBER}\s*(?:and|to|-)\s*{_NUMBER}")
+
+
+def parse_price_range(query: str) -> Tuple[Optional[float], Optional[float], str]:
+    """Pull "under ₹200" style limits out of a query; returns (min, max, remaining text)."""
+    text = query.lower()
+    low = high = None
+    match = _BETWEEN.search(text)
+    if match:
+        low, high = sorted((float(match.group(1)), float(match.group(2))))
+        text = text.replace(match.group(0), " ")
+    match = _MAX_PRICE.search(text)
+    if match:
+        high = float(match.group(1))
+        text = text.replace(match.group(0), " ")
+    match = _MIN_PRICE.search(text)
+    if match:
+        low = float(match.group(1))
+        text = text.replace(match.group(0), " ")
+    return low, high, text
+
+
+@dataclass
+class MenuHit:
+    item: Dict[str, Any]
+    score: float
+
+    def render(self) -> str:
+        item = self.item
+        return f"{item['name']} (₹{item['price']}, {item['category']}): {item['description']}"
+
+
+class MenuIndex:
+    def __init__(self, catalog: List[Dict[str, Any]]):
+        self.catalog = catalog
+        self.prices = np.array([item["price"] for item in catalog], dtype=np.float32)
+        self.categories = np.array([item["category"].lower() for item in catalog])
+        # Name twice so an item's own name outweighs words in other items' descriptions
+        self.index = BM25Index(
+            [f"{item['name']} {item['name']} {item['category']} {item['description']}" for item in catalog]
+        )
+
+    def _scores(self, text: str) -> np.ndarray:
+        scores = np.zeros(len(self.catalog), dtype=np.float32)
+        for token in set(tokenize(text)):
+            direct = self.index.scores(token)
+            related = [self.index.scores(word) for word in tokenize(SYNONYMS.get(token, ""))]
+            scores += np.maximum(direct, SYNONYM_WEIGHT * np.max(related, axis=0)) if related else direct
+        return scores
+
+    def _category_mask(self, category: Optional[str]) -> np.ndarray:
+        if not category:
+            return np.ones(len(self.catalog), dtype=bool)
+        wanted = tokenize(category)
+        return np.array([any(token in tokenize(c) for token in wanted) for c in self.categories])
+
+    def search(
+        self,
+        query: str,
+        max_price: Optional[float] = None,
+        min_price: Optional[float] = None,
+        category: Optional[str] = None,
+        k: int = 5,
+    ) -> List[MenuHit]:
+        parsed_min, parsed_max, text = parse_price_range(query)
+        max_price = max_price if max_price is not None else parsed_max
+        min_price = min_price if min_price is not None else parsed_min
+
+        mask = self._category_mask(category)
+        if max_price is not None:
+            mask &= self.prices <= max_price
+        if min_price is not None:
+            mask &= self.prices >= min_price
+
+        scores = self._scores(text)
+        hits = top_k(scores, k=k, mask=mask)
+        if not hits and not scores.any():
+            # Nothing to rank on (e.g. "anything under 100"): list what the filters allow, cheapest first
+            allowed = np.flatnonzero(mask)
+            hits = [(int(i), 0.0) for i in allowed[np.argsort(self.prices[allowed], kind="stable")][:k]]
+        return [MenuHit(self.catalog[i], score) for i, score in hits]
@@ -0,0 +1,361 @@
+"""
+Real-time order events for kitchen and expo displays.
+
+`OrderEventBus` is an in-process publish/subscribe bus. Publishing never
+blocks or awaits: each subscriber has its own bounded queue, and a subscriber
+that falls a full queue behind is marked lagged and dropped instead of
+slowing the publisher. A dropped or reconnecting display resumes by passing
+the last event ID it saw ("<bus epoch>-<seq>"); the bus replays what came
+after it from a bounded history. An ID it cannot place (evicted, or from
+before a hub restart) gets a reset instead: the subscription is flagged and
+its backlog is the full retained history, to be shown from scratch.
+
+`OrderEventServer` exposes a bus over HTTP (aiohttp):
+
+- GET  /orders/stream   Server-Sent Events; resumes from Last-Event-ID or ?after=EVENT_ID
+- GET  /orders/ws       WebSocket, one JSON event per message; resumes from ?after=EVENT_ID
+- GET  /orders/recent   retained history as JSON
+- POST /orders/events   publish an event (or a list) from another process
+
+Agent jobs usually run in separate processes, so one process hosts the hub
+and the agents forward their events to it (ORDER_EVENTS_URL) from a
+background thread:
+
+    python -m src.order_events serve --port 8765
+    ORDER_EVENTS_URL=http://127.0.0.1:8765 python -m src.worker dev
+    curl -N http://127.0.0.1:8765/orders/stream
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.request
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger("order-events")
+
+ORDER_EVENTS_URL = os.getenv("ORDER_EVENTS_URL", "")
+HISTORY_SIZE = int(os.getenv("ORDER_EVENTS_HISTORY", "1000"))
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("ORDER_EVENTS_QUEUE_SIZE", "256"))
+HEARTBEAT_SECONDS = 15.0
+
+
+@dataclass
+class OrderEvent:
+    order_id: str
+    type: str = "order.placed"
+    order: Dict[str, Any] = field(default_factory=dict)
+    published_at: float = 0.0
+    seq: int = 0
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+
+class Subscription:
+    """One consumer's view of the bus: replayed backlog first, then live events."""
+
+    def __init__(self, bus: "OrderEventBus", backlog: List[OrderEvent], maxsize: int, reset: bool = False):
+        self.bus = bus
+        self.loop = asyncio.get_running_loop()
+        self.backlog: Deque[OrderEvent] = deque(backlog)
+        # The resume ID was unknown: the backlog is a snapshot and the consumer should start over
+        self.reset = reset
+        self.queue: "asyncio.Queue[Optional[OrderEvent]]" = asyncio.Queue(maxsize)
+        self.lagged = False
+        self.closed = False
+
+    def _offer(self, event: OrderEvent) -> None:
+        # Runs on the subscriber's own loop
+        if self.closed:
+            return
+        if self.queue.full():
+            # Never block the publisher: cut the slow consumer loose, it can resume by event ID
+            self.lagged = True
+            self.close()
+            return
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[OrderEvent]:
+        """Next event; None once the subscription is closed, or on timeout."""
+        if self.backlog:
+            return self.backlog.popleft()
+        if self.closed and self.queue.empty():
+            return None
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self.bus._unsubscribe(self)
+        if self.lagged:
+            # Drop what is queued so the wake-up below always fits
+            while not self.queue.empty():
+                self.queue.get_nowait()
+        if not self.queue.full():
+            self.queue.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> OrderEvent:
+        event = await self.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+
+def _events_after(events: List[OrderEvent], seq: int) -> Optional[List[OrderEvent]]:
+    """Events after `seq`, or None if `seq` is not within the retained history."""
+    first = events[0].seq - 1 if events else seq
+    last = events[-1].seq if events else seq
+    if not first <= seq <= last:
+        return None
+    return events[seq - first:]
+
+
+class OrderEventBus:
+    def __init__(self, history_size: int = HISTORY_SIZE, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.history: Deque[OrderEvent] = deque(maxlen=history_size)
+        self.queue_size = queue_size
+        self._subscribers: List[Subscription] = []
+        self._seq = 0
+        # Tells event IDs from an earlier run of the hub apart from this one's
+        self.epoch = format(time.time_ns() // 1000, "x")
+        # Jobs may publish from other threads (thread executor) than the one serving subscribers
+        self._lock = threading.Lock()
+
+    def publish(self, event: OrderEvent) -> OrderEvent:
+        with self._lock:
+            self._seq += 1
+            event.seq = self._seq
+            event.published_at = event.published_at or time.time()
+            self.history.append(event)
+            subscribers = list(self._subscribers)
+
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        for sub in subscribers:
+            if sub.loop is current:
+                sub._offer(event)
+            else:
+                try:
+                    sub.loop.call_soon_threadsafe(sub._offer, event)
+                except RuntimeError:
+                    # Subscriber's loop is gone
+                    self._unsubscribe(sub)
+        return event
+
+    def event_id(self, event: OrderEvent) -> str:
+        return f"{self.epoch}-{event.seq}"
+
+    def subscribe(self, after: Optional[str] = None) -> Subscription:
+        """Live events, preceded by those after event ID `after`. Must be called from the consuming loop."""
+        with self._lock:
+            # Backlog and registration under one lock so no event falls between them
+            history = list(self.history)
+            backlog: Optional[List[OrderEvent]] = []
+            if after:
+                epoch, _, seq = after.rpartition("-")
+                backlog = _events_after(history, int(seq)) if epoch == self.epoch and seq.isdigit() else None
+            reset = backlog is None
+            if reset:
+                logger.info(f"Unknown resume ID {after!r}, sending a reset and {len(history)} retained events")
+            sub = Subscription(self, history if reset else backlog, self.queue_size, reset=reset)
+            self._subscribers.append(sub)
+        return sub
+
+    def _unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+class _Forwarder:
+    """Ships events to a remote hub from a daemon thread so tool calls never wait on the network."""
+
+    def __init__(self, url: str, max_pending: int = 1000, timeout: float = 2.0):
+        self.url = url.rstrip("/") + "/orders/events"
+        self.timeout = timeout
+        self.pending: "queue.Queue[OrderEvent]" = queue.Queue(max_pending)
+        self.dropped = 0
+        threading.Thread(target=self._run, name="order-events-forwarder", daemon=True).start()
+
+    def send(self, event: OrderEvent) -> None:
+        try:
+            self.pending.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Order event queue full, dropped {event.order_id}")
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.pending.get()]
+            while len(batch) < 100:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            body = json.dumps([asdict(e) for e in batch], ensure_ascii=False).encode("utf-8")
+            request = urllib.request.Request(
+                self.url, data=body, headers={"Content-Type": "application/json"}, method="POST"
+            )
+            try:
+                urllib.request.urlopen(request, timeout=self.timeout).close()
+            except Exception as e:
+                self.dropped += len(batch)
+                logger.warning(f"Failed to forward {len(batch)} order events to {self.url}: {e}")
+
+
+_BUS: Optional[OrderEventBus] = None
+_FORWARDER: Optional[_Forwarder] = None
+
+
+def get_order_bus() -> OrderEventBus:
+    global _BUS
+    if _BUS is None:
+        _BUS = OrderEventBus()
+    return _BUS
+
+
+def publish_order(order: Dict[str, Any], event_type: str = "order.placed") -> OrderEvent:
+    """Publish a placed order locally and, if ORDER_EVENTS_URL is set, to the hub."""
+    global _FORWARDER
+    event = get_order_bus().publish(OrderEvent(order_id=order["order_id"], type=event_type, order=order))
+    if ORDER_EVENTS_URL:
+        if _FORWARDER is None:
+            _FORWARDER = _Forwarder(ORDER_EVENTS_URL)
+        _FORWARDER.send(event)
+    return event
+
+
+class OrderEventServer:
+    def __init__(self, bus: OrderEventBus, host: str = "127.0.0.1", port: int = 8765):
+        self.bus = bus
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def _stream(self, request):
+        from aiohttp import web
+
+        after = request.headers.get("Last-Event-ID") or request.query.get("after")
+        sub = self.bus.subscribe(after)
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache", "Connection": "keep-alive"}
+        )
+        await response.prepare(request)
+        try:
+            if sub.reset:
+                # The display should clear its board; the retained events follow as a snapshot
+                reset = json.dumps({"snapshot": len(sub.backlog)})
+                await response.write(f"event: reset\ndata: {reset}\n\n".encode("utf-8"))
+            while True:
+                event = await sub.get(timeout=HEARTBEAT_SECONDS)
+                if event is None:
+                    if sub.closed:
+                        break
+                    await response.write(b": keepalive\n\n")
+                    continue
+                await response.write(
+                    f"id: {self.bus.event_id(event)}\nevent: {event.type}\ndata: {event.to_json()}\n\n".encode("utf-8")
+                )
+            if sub.lagged:
+                logger.warning("Closing lagging SSE subscriber; it will resume from its last event ID")
+        except ConnectionError:
+            pass
+        finally:
+            sub.close()
+        return response
+
+    async def _websocket(self, request):
+        from aiohttp import web
+
+        ws = web.WebSocketResponse(heartbeat=HEARTBEAT_SECONDS)
+        await ws.prepare(request)
+        sub = self.bus.subscribe(request.query.get("after"))
+        try:
+            if sub.reset:
+                await ws.send_json({"type": "reset", "snapshot": len(sub.backlog)})
+            async for event in sub:
+                await ws.send_str(json.dumps(dict(asdict(event), id=self.bus.event_id(event)), ensure_ascii=False))
+            if sub.lagged:
+                await ws.close(code=1013, message=b"lagging, resume with ?after=<last event id>")
+        except ConnectionError:
+            pass
+        finally:
+            sub.close()
+        return ws
+
+    async def _recent(self, request):
+        from aiohttp import web
+
+        return web.json_response([asdict(e) for e in self.bus.history])
+
+    async def _ingest(self, request):
+        from aiohttp import web
+
+        payload = await request.json()
+        events = payload if isinstance(payload, list) else [payload]
+        for item in events:
+            self.bus.publish(
+                OrderEvent(
+                    order_id=item["order_id"],
+                    type=item.get("type", "order.placed"),
+                    order=item.get("order", {}),
+                    published_at=item.get("published_at", 0.0),
+                )
+            )
+        return web.json_response({"published": len(events)})
+
+    async def start(self) -> None:
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/orders/stream", self._stream)
+        app.router.add_get("/orders/ws", self._websocket)
+        app.router.add_get("/orders/recent", self._recent)
+        app.router.add_post("/orders/events", self._ingest)
+        self._runner = web.AppRunner(app, shutdown_timeout=1.0)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def aclose(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+async def _serve(host: str, port: int) -> None:
+    server = OrderEventServer(get_order_bus(), host, port)
+    await server.start()
+    logger.info(f"Order events on http://{host}:{server.port}/orders/stream (SSE) and /orders/ws")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Order event hub for kitchen and expo displays")
+    parser.add_argument("command", choices=["serve"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_serve(args.host, args.port))
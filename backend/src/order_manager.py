@@ -1,12 +1,30 @@
 import json
+import logging
 import os
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any
+from typing import Any, Callable, Dict, Optional
 from .cart import Cart
 
+logger = logging.getLogger("order-manager")
+
 class OrderManager:
-    def __init__(self, orders_dir: str = "orders"):
+    def __init__(
+        self,
+        orders_dir: str = "orders",
+        analytics=None,
+        on_placed: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    ):
         self.orders_dir = orders_dir
+        # Optional SalesAnalytics; orders are folded into its rollups as they are placed, on one
+        # background thread so the SQLite write stays off the event loop and orders stay in sequence
+        self.analytics = analytics
+        self._analytics_pool = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="sales-analytics") if analytics is not None else None
+        )
+        # Optional notifier (e.g. order_events.publish_order); must not block
+        self.on_placed = on_placed
         os.makedirs(self.orders_dir, exist_ok=True)
 
     def place_order(self, cart: Cart, customer_info: Dict[str, Any] = None) -> str:
@@ -14,7 +32,9 @@ class OrderManager:
             raise ValueError("Cart is empty")
 
         order_data = {
-            "order_id": f"ORD-{int(datetime.now().timestamp())}",
+            # Assigned by _write_order, which makes it unique
+            "order_id": None,
+            "uid": uuid.uuid4().hex,
             "timestamp": datetime.now().isoformat(),
             "customer_info": customer_info or {},
             "items": cart.to_dict()["items"],
@@ -22,12 +42,52 @@ class OrderManager:
             "status": "placed"
         }
 
-        filename = f"{self.orders_dir}/{order_data['order_id']}.json"
-        with open(filename, "w") as f:
-            json.dump(order_data, f, indent=2)
-        
+        self._write_order(order_data)
+
+        if self._analytics_pool is not None:
+            self._analytics_pool.submit(self._record_analytics, order_data)
+
+        if self.on_placed is not None:
+            try:
+                self.on_placed(order_data)
+            except Exception as e:
+                logger.error(f"Failed to publish order {order_data['order_id']}: {e}")
+
         return order_data["order_id"]
 
+    def _write_order(self, order_data: Dict[str, Any]) -> None:
+        """Claim an unused order ID and write the order under it.
+
+        IDs stay short enough to read out to callers (ORD-<unix seconds>); a second order in the same
+        second gets a -2, -3, ... suffix. The file is created exclusively, so concurrent sessions or
+        processes can never overwrite each other's order.
+        """
+        base = f"ORD-{int(datetime.now().timestamp())}"
+        suffix = 1
+        while True:
+            order_id = base if suffix == 1 else f"{base}-{suffix}"
+            order_data["order_id"] = order_id
+            try:
+                with open(f"{self.orders_dir}/{order_id}.json", "x") as f:
+                    json.dump(order_data, f, indent=2)
+            except FileExistsError:
+                suffix += 1
+                continue
+            return
+
+    def _record_analytics(self, order_data: Dict[str, Any]) -> None:
+        try:
+            self.analytics.record_order(order_data)
+        except Exception as e:
+            # The order is already on disk; `sales_analytics backfill` can catch the rollups up
+            logger.error(f"Failed to record order {order_data['order_id']} in analytics: {e}")
+
+    def drain_analytics(self) -> None:
+        """Wait until every order placed so far is in the analytics rollups."""
+        if self._analytics_pool is not None:
+            future: Future = self._analytics_pool.submit(lambda: None)
+            future.result()
+
     def get_order(self, order_id: str) -> Dict[str, Any]:
         filename = f"{self.orders_dir}/{order_id}.json"
         if os.path.exists(filename):
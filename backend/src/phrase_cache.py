@@ -0,0 +1,229 @@
+"""
+Pre-rendered audio cache for fixed agent phrases.
+
+Phrases like the greeting are synthesized once per voice, stored on disk as raw
+PCM and memory-mapped on later calls, so they start playing without a TTS
+round trip. Templated phrases cache their static pieces and only synthesize
+the values that change.
+
+Agent-authored replies go through `say_phrase`, which plays known phrases and
+templates from the cache and anything else through the TTS as usual:
+
+    say_phrase(session, cache, reply, phrases=[EMPTY_CART], templates=[REMOVED_REPLY])
+"""
+import functools
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import shutil
+import string
+import struct
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence
+
+from livekit import rtc
+from livekit.agents import tts as agents_tts
+
+logger = logging.getLogger("phrase-cache")
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / "phrase_cache"
+
+# 4-byte magic, sample rate, channel count
+_HEADER = struct.Struct("<4sII")
+_MAGIC = b"PCM1"
+_FRAME_MS = 20
+
+
+def voice_key(tts: agents_tts.TTS) -> str:
+    """Identify the voice a TTS instance produces; cached audio is only valid per voice."""
+    provider = getattr(tts, "provider", type(tts).__module__)
+    model = getattr(tts, "model", "unknown")
+    return f"{provider}:{model}:{tts.sample_rate}:{tts.num_channels}"
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha1(value.encode("utf-8")).hexdigest()[:16]
+
+
+def template_pieces(template: str) -> List[str]:
+    """The static pieces of a template, as `stream_template` caches them."""
+    return [literal.strip() for literal, _, _, _ in string.Formatter().parse(template) if literal and literal.strip()]
+
+
+@functools.lru_cache(maxsize=64)
+def _template_pattern(template: str) -> "re.Pattern[str]":
+    parts = []
+    for literal, field, _, _ in string.Formatter().parse(template):
+        parts.append(re.escape(literal))
+        if field:
+            parts.append(f"(?P<{field}>.+?)")
+    return re.compile("".join(parts), re.DOTALL)
+
+
+def template_values(template: str, text: str) -> Optional[Dict[str, str]]:
+    """The field values that format `template` into `text`, or None if it was not made from it."""
+    match = _template_pattern(template).fullmatch(text)
+    return match.groupdict() if match else None
+
+
+class PhraseCache:
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR, namespace: str = "default"):
+        self.cache_dir = Path(cache_dir) / namespace
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._checked_voices: set = set()
+
+    def _voice_dir(self, key: str) -> Path:
+        return self.cache_dir / _digest(key)
+
+    def _path(self, key: str, text: str) -> Path:
+        return self._voice_dir(key) / f"{_digest(text)}.pcm"
+
+    def _check_voice(self, key: str) -> None:
+        """Drop audio rendered with a previous voice the first time a new voice is seen."""
+        if key in self._checked_voices:
+            return
+        self._checked_voices.add(key)
+
+        manifest = self.cache_dir / "voice.json"
+        previous = None
+        if manifest.exists():
+            try:
+                with open(manifest, "r") as f:
+                    previous = json.load(f).get("voice")
+            except (OSError, json.JSONDecodeError):
+                previous = None
+
+        if previous and previous != key:
+            logger.info(f"Voice changed from {previous} to {key}, invalidating phrase cache")
+            shutil.rmtree(self._voice_dir(previous), ignore_errors=True)
+
+        self._voice_dir(key).mkdir(parents=True, exist_ok=True)
+        with open(manifest, "w") as f:
+            json.dump({"voice": key}, f)
+
+    def has(self, tts: agents_tts.TTS, text: str) -> bool:
+        return self._path(voice_key(tts), text).exists()
+
+    def _write(self, path: Path, sample_rate: int, num_channels: int, chunks: List[bytes]) -> None:
+        # A temp file of its own per write, so concurrent misses for one phrase cannot interleave
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.stem, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_HEADER.pack(_MAGIC, sample_rate, num_channels))
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    async def _read(self, path: Path) -> AsyncIterator[rtc.AudioFrame]:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, sample_rate, num_channels = _HEADER.unpack_from(mm, 0)
+            if magic != _MAGIC:
+                raise ValueError(f"Corrupt phrase cache entry: {path}")
+
+            samples_per_frame = sample_rate * _FRAME_MS // 1000
+            frame_bytes = samples_per_frame * num_channels * 2
+            offset = _HEADER.size
+            while offset < len(mm):
+                chunk = mm[offset : offset + frame_bytes]
+                offset += frame_bytes
+                yield rtc.AudioFrame(
+                    data=chunk,
+                    sample_rate=sample_rate,
+                    num_channels=num_channels,
+                    samples_per_channel=len(chunk) // (2 * num_channels),
+                )
+
+    async def _synthesize(
+        self, tts: agents_tts.TTS, text: str, store_at: Optional[Path]
+    ) -> AsyncIterator[rtc.AudioFrame]:
+        chunks: List[bytes] = []
+        async with tts.synthesize(text) as stream:
+            async for audio in stream:
+                if store_at is not None:
+                    chunks.append(bytes(audio.frame.data))
+                yield audio.frame
+
+        if store_at is not None and chunks:
+            self._write(store_at, tts.sample_rate, tts.num_channels, chunks)
+
+    async def stream(self, tts: agents_tts.TTS, text: str) -> AsyncIterator[rtc.AudioFrame]:
+        """Yield audio for `text`, from disk on a hit or from the TTS (and stored) on a miss."""
+        key = voice_key(tts)
+        self._check_voice(key)
+        path = self._path(key, text)
+
+        if path.exists():
+            self.hits += 1
+            async for frame in self._read(path):
+                yield frame
+            return
+
+        self.misses += 1
+        async for frame in self._synthesize(tts, text, store_at=path):
+            yield frame
+
+    async def warm(self, tts: agents_tts.TTS, phrases: Iterable[str], templates: Iterable[str] = ()) -> None:
+        """Render any phrases, and static pieces of templates, that are not cached yet."""
+        for text in [*phrases, *(piece for template in templates for piece in template_pieces(template))]:
+            if self.has(tts, text):
+                continue
+            try:
+                async for _ in self.stream(tts, text):
+                    pass
+            except Exception as e:
+                logger.error(f"Failed to pre-render phrase '{text}': {e}")
+
+    async def stream_template(
+        self, tts: agents_tts.TTS, template: str, **values
+    ) -> AsyncIterator[rtc.AudioFrame]:
+        """Stream a templated phrase, caching its static pieces and synthesizing the fields."""
+        key = voice_key(tts)
+        self._check_voice(key)
+
+        for literal, field, _, _ in string.Formatter().parse(template):
+            if literal and literal.strip():
+                async for frame in self.stream(tts, literal.strip()):
+                    yield frame
+            if field:
+                async for frame in self._synthesize(tts, str(values[field]), store_at=None):
+                    yield frame
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def say_cached(session, cache: PhraseCache, text: str, **kwargs):
+    """`session.say` that plays `text` from the phrase cache."""
+    return session.say(text, audio=cache.stream(session.tts, text), **kwargs)
+
+
+def say_template(session, cache: PhraseCache, template: str, values: Dict[str, object], **kwargs):
+    """`session.say` for a templated phrase with partial caching."""
+    return session.say(
+        template.format(**values),
+        audio=cache.stream_template(session.tts, template, **values),
+        **kwargs,
+    )
+
+
+def say_phrase(
+    session, cache: PhraseCache, text: str, phrases: Sequence[str] = (), templates: Sequence[str] = (), **kwargs
+):
+    """`session.say` for agent-authored text: cached when it is one of `phrases` or made from one of
+    `templates`, synthesized as usual otherwise (so one-off text never lands on disk)."""
+    if text in phrases:
+        return say_cached(session, cache, text, **kwargs)
+    for template in templates:
+        values = template_values(template, text)
+        if values is not None:
+            return say_template(session, cache, template, values, **kwargs)
+    return session.say(text, **kwargs)
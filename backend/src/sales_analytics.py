@@ -0,0 +1,259 @@
+"""
+Incremental sales analytics over placed orders.
+
+`OrderManager` writes one JSON file per order, which is fine for fulfilment but
+means every analytics question rereads every order. `SalesAnalytics` instead
+folds each order into hourly rollup tables in SQLite as it is placed:
+
+- sales_hourly_items: quantity and revenue per hour and item (with category)
+- sales_hourly: orders, revenue, item count and orders containing a deal per hour
+
+Reports aggregate the hourly rows, so a day is at most 24 rows per item and a
+week 168, whatever the order volume. Orders are recorded once by their uid
+(order files written before IDs were made unique can share an ID), so
+replaying the orders directory (`--backfill`) is safe.
+
+    python -m src.sales_analytics report --day 2025-11-26
+    python -m src.sales_analytics report --week 2025-11-24
+    python -m src.sales_analytics backfill
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("sales-analytics")
+
+DB_PATH = Path(os.getenv("SALES_ANALYTICS_DB", str(Path(__file__).parent.parent / "sales_analytics.db")))
+ORDERS_DIR = Path(__file__).parent.parent / "orders"
+CATALOG_PATH = Path(__file__).parent.parent.parent / "shared-data" / "burgerking_content.json"
+
+DEAL_CATEGORY = "Deals"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sales_orders_recorded (
+    order_key TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS sales_hourly (
+    hour TEXT PRIMARY KEY,
+    orders INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    items INTEGER NOT NULL DEFAULT 0,
+    deal_orders INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS sales_hourly_items (
+    hour TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    item_name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    orders INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, item_id)
+);
+"""
+
+
+def load_categories(catalog_path: Path = CATALOG_PATH) -> Dict[str, str]:
+    try:
+        with open(catalog_path, "r") as f:
+            return {item["id"]: item["category"] for item in json.load(f)}
+    except Exception as e:
+        logger.error(f"Failed to load catalog categories: {e}")
+        return {}
+
+
+def order_key(order: Dict[str, Any]) -> str:
+    """Unique key of a placed order; files from before orders had a uid fall back to ID and timestamp."""
+    return order.get("uid") or f"{order['order_id']}@{order['timestamp']}"
+
+
+class SalesAnalytics:
+    def __init__(self, db_path: Path = DB_PATH, categories: Optional[Dict[str, str]] = None):
+        self.db_path = db_path
+        self.categories = categories if categories is not None else load_categories()
+        # Shared by every session in the process, so guard it rather than bind it to one thread
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=5.0, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        # Several worker processes may write; WAL lets reports read while they do
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def record_order(self, order: Dict[str, Any]) -> bool:
+        """Fold one placed order into the rollups. Returns False if it was already recorded."""
+        hour = str(order["timestamp"])[:13]
+        items = order.get("items", [])
+        has_deal = any(self.categories.get(item["id"]) == DEAL_CATEGORY for item in items)
+
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO sales_orders_recorded (order_key) VALUES (?)", (order_key(order),)
+            )
+            if cursor.rowcount == 0:
+                return False
+
+            self.conn.execute(
+                """
+                INSERT INTO sales_hourly (hour, orders, revenue, items, deal_orders) VALUES (?, 1, ?, ?, ?)
+                ON CONFLICT(hour) DO UPDATE SET
+                    orders = orders + 1,
+                    revenue = revenue + excluded.revenue,
+                    items = items + excluded.items,
+                    deal_orders = deal_orders + excluded.deal_orders
+                """,
+                (hour, order.get("total", 0.0), sum(item["quantity"] for item in items), int(has_deal)),
+            )
+            self.conn.executemany(
+                """
+                INSERT INTO sales_hourly_items (hour, item_id, item_name, category, quantity, revenue, orders)
+                VALUES (?, ?, ?, ?, ?, ?, 1)
+                ON CONFLICT(hour, item_id) DO UPDATE SET
+                    quantity = quantity + excluded.quantity,
+                    revenue = revenue + excluded.revenue,
+                    orders = orders + 1
+                """,
+                [
+                    (
+                        hour,
+                        item["id"],
+                        item["name"],
+                        self.categories.get(item["id"], "Unknown"),
+                        item["quantity"],
+                        item["price"] * item["quantity"],
+                    )
+                    for item in items
+                ],
+            )
+        return True
+
+    def backfill(self, orders_dir: Path = ORDERS_DIR) -> int:
+        """Record every order file not yet in the rollups."""
+        recorded = 0
+        for path in sorted(Path(orders_dir).glob("ORD-*.json")):
+            try:
+                with open(path, "r") as f:
+                    recorded += self.record_order(json.load(f))
+            except Exception as e:
+                logger.warning(f"Skipping {path.name}: {e}")
+        return recorded
+
+    def report(self, start: date, end: date, top: int = 5) -> Dict[str, Any]:
+        """Totals, category and deal breakdowns, and top items for [start, end)."""
+        bounds = (start.isoformat(), end.isoformat())
+        where = "hour >= ? AND hour < ?"
+
+        totals = self.conn.execute(
+            f"SELECT COALESCE(SUM(orders), 0) AS orders, COALESCE(SUM(revenue), 0) AS revenue, "
+            f"COALESCE(SUM(items), 0) AS items, COALESCE(SUM(deal_orders), 0) AS deal_orders "
+            f"FROM sales_hourly WHERE {where}",
+            bounds,
+        ).fetchone()
+        by_category = self.conn.execute(
+            f"SELECT category, SUM(quantity) AS quantity, ROUND(SUM(revenue), 2) AS revenue "
+            f"FROM sales_hourly_items WHERE {where} GROUP BY category ORDER BY revenue DESC",
+            bounds,
+        ).fetchall()
+        top_items = self.conn.execute(
+            f"SELECT item_name, SUM(quantity) AS quantity, ROUND(SUM(revenue), 2) AS revenue "
+            f"FROM sales_hourly_items WHERE {where} GROUP BY item_id ORDER BY quantity DESC, revenue DESC LIMIT ?",
+            (*bounds, top),
+        ).fetchall()
+        by_hour = self.conn.execute(
+            f"SELECT hour, orders, ROUND(revenue, 2) AS revenue FROM sales_hourly WHERE {where} ORDER BY hour",
+            bounds,
+        ).fetchall()
+
+        orders = totals["orders"]
+        return {
+            "from": bounds[0],
+            "to": bounds[1],
+            "orders": orders,
+            "revenue": round(totals["revenue"], 2),
+            "avg_order_value": round(totals["revenue"] / orders, 2) if orders else 0.0,
+            "items_per_order": round(totals["items"] / orders, 2) if orders else 0.0,
+            "deal_attach_rate": round(totals["deal_orders"] / orders, 3) if orders else 0.0,
+            "by_category": [dict(row) for row in by_category],
+            "top_items": [dict(row) for row in top_items],
+            "by_hour": [dict(row) for row in by_hour],
+        }
+
+    def top_items_per_hour(self, start: date, end: date, top: int = 3) -> Dict[str, List[Dict[str, Any]]]:
+        rows = self.conn.execute(
+            """
+            SELECT hour, item_name, quantity, revenue FROM (
+                SELECT hour, item_name, quantity, ROUND(revenue, 2) AS revenue,
+                       ROW_NUMBER() OVER (PARTITION BY hour ORDER BY quantity DESC, revenue DESC) AS rank
+                FROM sales_hourly_items WHERE hour >= ? AND hour < ?
+            ) WHERE rank <= ? ORDER BY hour, rank
+            """,
+            (start.isoformat(), end.isoformat(), top),
+        ).fetchall()
+        result: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            result.setdefault(row["hour"], []).append(
+                {"item": row["item_name"], "quantity": row["quantity"], "revenue": row["revenue"]}
+            )
+        return result
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+_SHARED: Optional[SalesAnalytics] = None
+
+
+def get_sales_analytics() -> Optional[SalesAnalytics]:
+    """Process-wide SalesAnalytics, or None if the summary database can't be opened."""
+    global _SHARED
+    if _SHARED is None:
+        try:
+            _SHARED = SalesAnalytics()
+        except sqlite3.Error as e:
+            logger.error(f"Sales analytics disabled: {e}")
+            return None
+    return _SHARED
+
+
+def _period(args) -> tuple:
+    if args.week:
+        start = datetime.strptime(args.week, "%Y-%m-%d").date()
+        start -= timedelta(days=start.weekday())
+        return start, start + timedelta(days=7)
+    day = datetime.strptime(args.day, "%Y-%m-%d").date() if args.day else date.today()
+    return day, day + timedelta(days=1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sales rollups over placed orders")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report_parser = sub.add_parser("report", help="Report a day (default today) or the week containing a date")
+    report_parser.add_argument("--day", help="YYYY-MM-DD")
+    report_parser.add_argument("--week", help="Any YYYY-MM-DD in the week (weeks start on Monday)")
+    report_parser.add_argument("--hourly", action="store_true", help="Top items per hour instead of totals")
+    report_parser.add_argument("--top", type=int, default=5)
+    sub.add_parser("backfill", help="Fold existing order files into the rollups")
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    analytics = SalesAnalytics(args.db)
+    if args.command == "backfill":
+        print(json.dumps({"recorded": analytics.backfill()}))
+    else:
+        start, end = _period(args)
+        started = time.perf_counter()
+        if args.hourly:
+            result: Any = analytics.top_items_per_hour(start, end, args.top)
+        else:
+            result = analytics.report(start, end, args.top)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        logger.info(f"Report took {(time.perf_counter() - started) * 1000:.1f} ms")
+    analytics.close()
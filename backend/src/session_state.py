@@ -0,0 +1,421 @@
+"""
+Persistent, resumable session state.
+
+A caller who reconnects after a dropped call or a crashed job process should
+find their cart (or the lead details they already gave) where they left it.
+Agents snapshot their state after every mutation through `SessionStateSync`;
+the entrypoint restores it when the same participant identity connects again.
+Sessions are keyed by identity alone: the frontend opens a fresh room for
+every connection but keeps the caller's identity across reconnects. Once the
+call's goal is done (order placed, lead saved) the agent clears its entry, so
+the next call from that browser starts fresh.
+
+Snapshots are a compact struct-packed binary encoding (a cart of a few items
+is ~100 bytes). They live in a `StateStore`:
+
+- `FileStateStore` (default): one file per session under backend/session_state
+- `RespStateStore`: any Redis-compatible server, via SESSION_STATE_URL=redis://host:port/db,
+  so a session can resume on another node after scale-down
+
+For local multi-node testing without Redis, run the bundled stand-in:
+
+    python -m src.session_state serve --port 6390
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import struct
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+try:
+    from src.cart import Cart, CartItem
+except ImportError:
+    from cart import Cart, CartItem
+
+logger = logging.getLogger("session-state")
+
+DEFAULT_STATE_DIR = Path(__file__).parent.parent / "session_state"
+STATE_TTL_SECONDS = int(os.getenv("SESSION_STATE_TTL", "1800"))
+
+# magic, version, flags, updated_at
+_HEADER = struct.Struct("<2sBBd")
+_MAGIC = b"SS"
+_VERSION = 1
+_FLAG_LEAD_SAVED = 0x01
+_U16 = struct.Struct("<H")
+_ITEM = struct.Struct("<dI")
+
+
+@dataclass
+class SessionState:
+    cart: List[CartItem] = field(default_factory=list)
+    lead: Dict[str, str] = field(default_factory=dict)
+    lead_saved: bool = False
+    updated_at: float = 0.0
+
+    @classmethod
+    def from_cart(cls, cart: Cart) -> "SessionState":
+        return cls(cart=list(cart.items.values()))
+
+    def restore_cart(self, cart: Cart) -> None:
+        cart.clear()
+        for item in self.cart:
+            cart.add_item(item.id, item.name, item.price, item.quantity, item.notes)
+
+    @property
+    def empty(self) -> bool:
+        return not self.cart and not self.lead
+
+
+def _pack_str(value: str) -> bytes:
+    data = value.encode("utf-8")[:0xFFFF]
+    return _U16.pack(len(data)) + data
+
+
+def _unpack_str(data: bytes, offset: int) -> Tuple[str, int]:
+    (length,) = _U16.unpack_from(data, offset)
+    offset += _U16.size
+    return data[offset : offset + length].decode("utf-8"), offset + length
+
+
+def encode_state(state: SessionState) -> bytes:
+    flags = _FLAG_LEAD_SAVED if state.lead_saved else 0
+    parts = [_HEADER.pack(_MAGIC, _VERSION, flags, state.updated_at or time.time())]
+
+    parts.append(_U16.pack(len(state.cart)))
+    for item in state.cart:
+        parts += [_pack_str(item.id), _pack_str(item.name), _ITEM.pack(item.price, item.quantity), _pack_str(item.notes)]
+
+    parts.append(_U16.pack(len(state.lead)))
+    for key, value in sorted(state.lead.items()):
+        parts += [_pack_str(key), _pack_str(str(value))]
+    return b"".join(parts)
+
+
+def decode_state(data: bytes) -> SessionState:
+    magic, version, flags, updated_at = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"Unknown session state format {magic!r} v{version}")
+    offset = _HEADER.size
+
+    (count,) = _U16.unpack_from(data, offset)
+    offset += _U16.size
+    cart = []
+    for _ in range(count):
+        item_id, offset = _unpack_str(data, offset)
+        name, offset = _unpack_str(data, offset)
+        price, quantity = _ITEM.unpack_from(data, offset)
+        offset += _ITEM.size
+        notes, offset = _unpack_str(data, offset)
+        cart.append(CartItem(id=item_id, name=name, price=price, quantity=quantity, notes=notes))
+
+    (count,) = _U16.unpack_from(data, offset)
+    offset += _U16.size
+    lead = {}
+    for _ in range(count):
+        key, offset = _unpack_str(data, offset)
+        lead[key], offset = _unpack_str(data, offset)
+
+    return SessionState(cart=cart, lead=lead, lead_saved=bool(flags & _FLAG_LEAD_SAVED), updated_at=updated_at)
+
+
+def session_key(agent_type: str, participant: str) -> str:
+    return f"session:{agent_type}:{participant}"
+
+
+class StateStore:
+    async def load(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def save(self, key: str, data: bytes, ttl: int = STATE_TTL_SECONDS) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        pass
+
+
+class FileStateStore(StateStore):
+    """One file per session; expiry is checked against the file's mtime."""
+
+    def __init__(self, state_dir: Path = DEFAULT_STATE_DIR):
+        self.state_dir = Path(state_dir)
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.state_dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.bin"
+
+    def _load(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            expires_at = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        if expires_at < time.time():
+            path.unlink(missing_ok=True)
+            return None
+        return data
+
+    def _save(self, key: str, data: bytes, ttl: int) -> None:
+        path = self._path(key)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        # The mtime doubles as the expiry time
+        os.utime(tmp, (time.time(), time.time() + ttl))
+        os.replace(tmp, path)
+
+    async def load(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._load, key)
+
+    async def save(self, key: str, data: bytes, ttl: int = STATE_TTL_SECONDS) -> None:
+        await asyncio.to_thread(self._save, key, data, ttl)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._path(key).unlink, missing_ok=True)
+
+
+def _encode_command(*args: bytes) -> bytes:
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(out)
+
+
+async def _read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        raise RuntimeError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        return [await _read_reply(reader) for _ in range(int(body))]
+    raise ValueError(f"Unexpected reply {line!r}")
+
+
+class RespStateStore(StateStore):
+    """Minimal Redis protocol client: GET, SET EX and DEL over one connection."""
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0, password: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self._conn: Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = None
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_url(cls, url: str) -> "RespStateStore":
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip("/") or 0)
+        return cls(host=parsed.hostname or "localhost", port=parsed.port or 6379, db=db, password=parsed.password)
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        self._conn = (reader, writer)
+        if self.password:
+            await self._send(b"AUTH", self.password.encode())
+        if self.db:
+            await self._send(b"SELECT", str(self.db).encode())
+
+    async def _send(self, *args: bytes):
+        reader, writer = self._conn
+        writer.write(_encode_command(*args))
+        await writer.drain()
+        return await _read_reply(reader)
+
+    async def execute(self, *args: bytes):
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._conn is None:
+                        await self._connect()
+                    return await self._send(*args)
+                except (ConnectionError, OSError, asyncio.IncompleteReadError):
+                    # Reconnect once, e.g. after the server restarted
+                    await self._drop()
+                    if attempt:
+                        raise
+
+    async def _drop(self) -> None:
+        if self._conn is not None:
+            self._conn[1].close()
+            self._conn = None
+
+    async def load(self, key: str) -> Optional[bytes]:
+        return await self.execute(b"GET", key.encode())
+
+    async def save(self, key: str, data: bytes, ttl: int = STATE_TTL_SECONDS) -> None:
+        await self.execute(b"SET", key.encode(), data, b"EX", str(ttl).encode())
+
+    async def delete(self, key: str) -> None:
+        await self.execute(b"DEL", key.encode())
+
+    async def aclose(self) -> None:
+        async with self._lock:
+            await self._drop()
+
+
+_STORE: Optional[StateStore] = None
+
+
+def get_state_store() -> StateStore:
+    """Process-wide store: SESSION_STATE_URL=redis://... for a shared server, else local files."""
+    global _STORE
+    if _STORE is None:
+        url = os.getenv("SESSION_STATE_URL", "")
+        if url.startswith("redis://"):
+            _STORE = RespStateStore.from_url(url)
+        else:
+            _STORE = FileStateStore(Path(url[len("file://"):]) if url.startswith("file://") else DEFAULT_STATE_DIR)
+    return _STORE
+
+
+# Queued in place of a snapshot to delete the session's entry
+_CLEAR = object()
+
+
+class SessionStateSync:
+    """Writes an agent's snapshots to the store in the background, coalescing bursts of mutations."""
+
+    def __init__(self, store: StateStore, key: str, ttl: int = STATE_TTL_SECONDS):
+        self.store = store
+        self.key = key
+        self.ttl = ttl
+        self._latest: Optional[Union[bytes, object]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def restore(self) -> Optional[SessionState]:
+        try:
+            data = await self.store.load(self.key)
+            return decode_state(data) if data else None
+        except Exception as e:
+            logger.warning(f"Could not restore session state {self.key}: {e}")
+            return None
+
+    def snapshot(self, state: SessionState) -> None:
+        self._latest = encode_state(state)
+        self._schedule()
+
+    def clear(self) -> None:
+        """Delete the stored state once the call's goal is done; ordered after any pending snapshot."""
+        self._latest = _CLEAR
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self) -> None:
+        while self._latest is not None:
+            data, self._latest = self._latest, None
+            try:
+                if data is _CLEAR:
+                    await self.store.delete(self.key)
+                else:
+                    await self.store.save(self.key, data, self.ttl)
+            except Exception as e:
+                logger.warning(f"Could not write session state {self.key}: {e}")
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            await self._task
+
+
+class LocalRespServer:
+    """In-memory Redis stand-in speaking enough RESP for `RespStateStore` and redis-cli."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6390):
+        self.host = host
+        self.port = port
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.time():
+            del self.data[key]
+            return None
+        return value
+
+    def _handle(self, args: List[bytes]) -> bytes:
+        command = args[0].upper()
+        if command == b"PING":
+            return b"+PONG\r\n"
+        if command in (b"SELECT", b"AUTH"):
+            return b"+OK\r\n"
+        if command == b"GET":
+            value = self._get(args[1])
+            return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+        if command == b"SET":
+            expires_at = None
+            if len(args) >= 5 and args[3].upper() == b"EX":
+                expires_at = time.time() + int(args[4])
+            self.data[args[1]] = (args[2], expires_at)
+            return b"+OK\r\n"
+        if command == b"DEL":
+            return b":%d\r\n" % sum(self.data.pop(key, None) is not None for key in args[1:])
+        if command == b"FLUSHALL":
+            self.data.clear()
+            return b"+OK\r\n"
+        return b"-ERR unknown command '%s'\r\n" % command
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await _read_reply(reader)
+                writer.write(self._handle(request))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def aclose(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+async def _serve(host: str, port: int) -> None:
+    server = LocalRespServer(host, port)
+    await server.start()
+    logger.info(f"Session state stand-in listening on redis://{host}:{server.port}/0")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Redis-compatible session state server")
+    parser.add_argument("command", choices=["serve"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_serve(args.host, args.port))
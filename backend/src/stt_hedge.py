@@ -0,0 +1,323 @@
+"""
+Hedged speech-to-text.
+
+A stalled or slow primary STT adds its delay straight to turn latency.
+`HedgedSTT` streams audio to the primary provider and watches each utterance:
+if no transcript (interim or final) arrives within `deadline` seconds of the
+first voiced audio, it opens a stream to a secondary provider, replays the
+utterance audio buffered so far, and feeds both. Whichever provider sends the
+first final for an utterance wins it: its finals (Deepgram finals long speech
+in several segments) reach the session until its END_OF_SPEECH, the other's
+are dropped, and the secondary stream is closed again. Win rates are kept in
+`HedgedSTT.stats`.
+
+Utterances are numbered at END_OF_SPEECH, and each provider's events are
+counted against the utterance it is transcribing: a final from a provider still
+on an utterance the other one already delivered is that late transcript, not
+the next one, and the provider catches up at its own END_OF_SPEECH.
+
+Set STT_HEDGE_SECONDARY (e.g. "assemblyai") to enable it in `build_stt`.
+"""
+import asyncio
+import collections
+import contextlib
+import logging
+import os
+import time
+from typing import Any, Deque, Dict, Optional, Set
+
+import numpy as np
+from livekit import rtc
+from livekit.agents import stt
+from livekit.agents.types import (
+    DEFAULT_API_CONNECT_OPTIONS,
+    NOT_GIVEN,
+    APIConnectOptions,
+    NotGivenOr,
+)
+from livekit.agents.utils import AudioBuffer, aio
+
+logger = logging.getLogger("stt-hedge")
+
+DEFAULT_DEADLINE = float(os.getenv("STT_HEDGE_DEADLINE", "0.8"))
+
+# int16 RMS above which a frame counts as speech for starting the deadline clock
+VOICED_RMS = 500
+# Seconds of utterance audio kept for replay into the secondary stream
+MAX_BUFFER_SECONDS = 15.0
+
+
+class HedgedSTT(stt.STT):
+    def __init__(self, primary: stt.STT, secondary: stt.STT, *, deadline: float = DEFAULT_DEADLINE):
+        super().__init__(
+            capabilities=stt.STTCapabilities(
+                streaming=True,
+                interim_results=primary.capabilities.interim_results,
+            )
+        )
+        self.primary = primary
+        self.secondary = secondary
+        self.deadline = deadline
+        self.stats: Dict[str, int] = collections.Counter()
+
+        for instance in (primary, secondary):
+            instance.on("metrics_collected", self._on_metrics_collected)
+
+    @property
+    def model(self) -> str:
+        return self.primary.model
+
+    @property
+    def provider(self) -> str:
+        return self.primary.provider
+
+    def _on_metrics_collected(self, *args: Any, **kwargs: Any) -> None:
+        self.emit("metrics_collected", *args, **kwargs)
+
+    def win_rates(self) -> Dict[str, float]:
+        hedged = self.stats["hedged"]
+        return {
+            "utterances": self.stats["utterances"],
+            "hedge_rate": round(hedged / self.stats["utterances"], 3) if self.stats["utterances"] else 0.0,
+            "primary_win_rate": round(self.stats["primary_wins"] / hedged, 3) if hedged else 0.0,
+            "secondary_win_rate": round(self.stats["secondary_wins"] / hedged, 3) if hedged else 0.0,
+        }
+
+    async def _recognize_impl(
+        self,
+        buffer: AudioBuffer,
+        *,
+        language: NotGivenOr[str] = NOT_GIVEN,
+        conn_options: APIConnectOptions,
+    ) -> stt.SpeechEvent:
+        self.stats["utterances"] += 1
+        primary = asyncio.create_task(self.primary.recognize(buffer, language=language, conn_options=conn_options))
+        done, _ = await asyncio.wait({primary}, timeout=self.deadline)
+        if done:
+            return primary.result()
+
+        self.stats["hedged"] += 1
+        secondary = asyncio.create_task(self.secondary.recognize(buffer, language=language, conn_options=conn_options))
+        done, pending = await asyncio.wait({primary, secondary}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        winner = done.pop()
+        self.stats["primary_wins" if winner is primary else "secondary_wins"] += 1
+        return winner.result()
+
+    def stream(
+        self,
+        *,
+        language: NotGivenOr[str] = NOT_GIVEN,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+    ) -> "HedgedRecognizeStream":
+        return HedgedRecognizeStream(stt=self, language=language, conn_options=conn_options)
+
+    async def aclose(self) -> None:
+        for instance in (self.primary, self.secondary):
+            instance.off("metrics_collected", self._on_metrics_collected)
+        logger.info(f"STT hedging: {self.win_rates()}")
+
+
+class _Utterance:
+    def __init__(self) -> None:
+        self.frames: Deque[rtc.AudioFrame] = collections.deque()
+        self.buffered = 0.0
+        self.voiced_at: Optional[float] = None
+        self.got_result = False
+        self.leader: Optional[str] = None
+        # Provider whose finals are delivered, and providers that reached END_OF_SPEECH
+        self.winner: Optional[str] = None
+        self.ended: Set[str] = set()
+
+    def add(self, frame: rtc.AudioFrame) -> None:
+        self.frames.append(frame)
+        self.buffered += frame.duration
+        while self.buffered > MAX_BUFFER_SECONDS and self.frames:
+            self.buffered -= self.frames.popleft().duration
+
+        if self.voiced_at is None:
+            samples = np.frombuffer(frame.data, dtype=np.int16).astype(np.float32)
+            if samples.size and np.sqrt(np.mean(samples**2)) > VOICED_RMS:
+                self.voiced_at = time.monotonic()
+
+
+class HedgedRecognizeStream(stt.RecognizeStream):
+    def __init__(self, *, stt: HedgedSTT, language: NotGivenOr[str], conn_options: APIConnectOptions):
+        super().__init__(stt=stt, conn_options=conn_options, sample_rate=NOT_GIVEN)
+        self._hedged = stt
+        self._language = language
+        self._streams: Dict[str, stt.RecognizeStream] = {}
+        self._consumers: Dict[str, asyncio.Task] = {}
+        self._utterance = _Utterance()
+        self._primary_failed = False
+        # Number of the utterance being transcribed, and the one each provider is on
+        self._seq = 0
+        self._provider_seq: Dict[str, int] = {}
+
+    def _open(self, name: str) -> None:
+        instance = self._hedged.primary if name == "primary" else self._hedged.secondary
+        stream = instance.stream(language=self._language, conn_options=self._conn_options)
+        self._streams[name] = stream
+        self._provider_seq[name] = self._seq
+        if name == "secondary":
+            # Catch the secondary up on the utterance so far
+            for frame in self._utterance.frames:
+                stream.push_frame(frame)
+        self._consumers[name] = asyncio.create_task(self._consume(name, stream))
+
+    async def _close(self, name: str) -> None:
+        stream = self._streams.pop(name, None)
+        task = self._consumers.pop(name, None)
+        if task is not None and task is not asyncio.current_task():
+            await aio.cancel_and_wait(task)
+        if stream is not None:
+            await stream.aclose()
+
+    async def _consume(self, name: str, stream: stt.RecognizeStream) -> None:
+        try:
+            async for ev in stream:
+                await self._on_event(name, ev)
+        except Exception as e:
+            if name != "primary":
+                logger.warning(f"Secondary STT stream failed: {e}")
+                return
+            logger.warning(f"Primary STT stream failed, continuing on secondary: {e}")
+            self._primary_failed = True
+            self._hedged.stats["primary_failures"] += 1
+            self._streams.pop(name, None)
+            if "secondary" not in self._streams:
+                self._open("secondary")
+
+    def _lead(self, name: str) -> bool:
+        """Only one provider's start/end/interim events reach the session."""
+        if self._primary_failed:
+            return name == "secondary"
+        if self._utterance.leader is None:
+            return name == "primary"
+        return self._utterance.leader == name
+
+    async def _on_event(self, name: str, ev: stt.SpeechEvent) -> None:
+        if ev.type == stt.SpeechEventType.RECOGNITION_USAGE:
+            self._event_ch.send_nowait(ev)
+            return
+
+        if self._provider_seq.get(name, self._seq) < self._seq:
+            # Still on an utterance the other provider already delivered
+            if ev.type == stt.SpeechEventType.FINAL_TRANSCRIPT:
+                self._hedged.stats["late_finals_dropped"] += 1
+            elif ev.type == stt.SpeechEventType.END_OF_SPEECH:
+                self._provider_seq[name] += 1
+            return
+
+        utterance = self._utterance
+        if ev.type == stt.SpeechEventType.START_OF_SPEECH and utterance.winner == name:
+            # A provider that does not send END_OF_SPEECH: its next utterance closes the last one
+            await self._finish_utterance()
+            utterance = self._utterance
+
+        if ev.type == stt.SpeechEventType.INTERIM_TRANSCRIPT:
+            utterance.got_result = True
+            if utterance.leader is None:
+                utterance.leader = name
+            if self._lead(name):
+                self._event_ch.send_nowait(ev)
+            return
+
+        if ev.type == stt.SpeechEventType.FINAL_TRANSCRIPT:
+            utterance.got_result = True
+            if utterance.winner is None:
+                utterance.winner = name
+            if utterance.winner == name:
+                self._event_ch.send_nowait(ev)
+            return
+
+        if ev.type == stt.SpeechEventType.END_OF_SPEECH:
+            utterance.ended.add(name)
+            if utterance.winner == name:
+                self._event_ch.send_nowait(ev)
+                await self._finish_utterance()
+            elif utterance.winner is None and self._lead(name):
+                self._event_ch.send_nowait(ev)
+            return
+
+        if self._lead(name):
+            self._event_ch.send_nowait(ev)
+
+    async def _finish_utterance(self) -> None:
+        """Close the utterance its winner delivered; providers that did not end it yet are now behind."""
+        utterance = self._utterance
+        self._hedged.stats["utterances"] += 1
+        self._seq += 1
+        for name in utterance.ended | {utterance.winner}:
+            self._provider_seq[name] = self._seq
+
+        if "secondary" in self._streams and not self._primary_failed:
+            self._hedged.stats["hedged"] += 1
+            self._hedged.stats[f"{utterance.winner}_wins"] += 1
+            await self._close("secondary")
+
+        self._utterance = _Utterance()
+
+    async def _watch_deadline(self) -> None:
+        while True:
+            await asyncio.sleep(0.05)
+            utterance = self._utterance
+            if (
+                utterance.voiced_at is not None
+                and not utterance.got_result
+                and "secondary" not in self._streams
+                and time.monotonic() - utterance.voiced_at > self._hedged.deadline
+            ):
+                logger.info(f"No transcript after {self._hedged.deadline}s, hedging to secondary STT")
+                if self._provider_seq.get("primary", self._seq) < self._seq:
+                    # The primary never finalized the utterance it lost; stop waiting for it
+                    self._provider_seq["primary"] = self._seq
+                self._open("secondary")
+
+    async def _run(self) -> None:
+        self._open("primary")
+        watcher = asyncio.create_task(self._watch_deadline())
+        try:
+            async for data in self._input_ch:
+                if isinstance(data, rtc.AudioFrame):
+                    self._utterance.add(data)
+                for stream in list(self._streams.values()):
+                    with contextlib.suppress(RuntimeError):
+                        if isinstance(data, rtc.AudioFrame):
+                            stream.push_frame(data)
+                        else:
+                            stream.flush()
+
+            for stream in list(self._streams.values()):
+                with contextlib.suppress(RuntimeError):
+                    stream.end_input()
+            await asyncio.gather(*list(self._consumers.values()), return_exceptions=True)
+        finally:
+            await aio.cancel_and_wait(watcher)
+            for name in list(self._streams):
+                await self._close(name)
+
+    async def _metrics_monitor_task(self, event_aiter) -> None:
+        # The wrapped STTs report their own metrics
+        async for _ in event_aiter:
+            pass
+
+
+def build_stt() -> stt.STT:
+    """Deepgram nova-3, hedged to STT_HEDGE_SECONDARY when one is configured."""
+    from livekit.plugins import deepgram
+
+    primary = deepgram.STT(model="nova-3")
+    secondary_name = os.getenv("STT_HEDGE_SECONDARY", "").lower()
+    if secondary_name == "assemblyai":
+        from livekit.plugins import assemblyai
+
+        return HedgedSTT(primary, assemblyai.STT())
+    if secondary_name == "google":
+        from livekit.plugins import google
+
+        return HedgedSTT(primary, google.STT())
+    if secondary_name:
+        logger.warning(f"Unknown STT_HEDGE_SECONDARY '{secondary_name}', hedging disabled")
+    return primary
@@ -0,0 +1,136 @@
+"""
+Small in-process BM25 text search, vectorized with NumPy.
+
+Knowledge bases and menus are searched locally instead of being pasted into
+the prompt. Postings are stored CSR-style (term -> doc ids and precomputed
+BM25 weights), so a query is one `np.bincount` over the postings of its terms
+and scoring stays in the sub-millisecond range for thousands of documents.
+"""
+import logging
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("text-index")
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from have how i in is it me my of on or our "
+    "the to we what when where which who will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    # Fold accents so "jalapeños" and "jalapenos" match
+    text = unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode("ascii")
+    tokens = []
+    for token in _TOKEN.findall(text):
+        if token in STOPWORDS:
+            continue
+        # Cheap plural folding so "batches" matches "batch"
+        if len(token) > 4 and token.endswith(("ches", "shes", "sses", "xes", "zes")):
+            token = token[:-2]
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, documents: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.size = len(documents)
+        doc_tokens = [tokenize(doc) for doc in documents]
+        lengths = np.array([len(tokens) for tokens in doc_tokens], dtype=np.float32)
+        avg_length = float(lengths.mean()) if self.size and lengths.sum() else 1.0
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_id, tokens in enumerate(doc_tokens):
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((doc_id, tf))
+
+        self.vocab: Dict[str, int] = {}
+        offsets = [0]
+        doc_ids: List[int] = []
+        weights: List[float] = []
+        for term_id, (token, entries) in enumerate(postings.items()):
+            self.vocab[token] = term_id
+            idf = np.log(1 + (self.size - len(entries) + 0.5) / (len(entries) + 0.5))
+            ids = np.array([doc_id for doc_id, _ in entries])
+            tf = np.array([tf for _, tf in entries], dtype=np.float32)
+            norm = k1 * (1 - b + b * lengths[ids] / avg_length)
+            doc_ids.extend(ids.tolist())
+            weights.extend((idf * tf * (k1 + 1) / (tf + norm)).tolist())
+            offsets.append(len(doc_ids))
+
+        self._offsets = np.array(offsets, dtype=np.int64)
+        self._doc_ids = np.array(doc_ids, dtype=np.int32)
+        self._weights = np.array(weights, dtype=np.float32)
+
+    def scores(self, query: str) -> np.ndarray:
+        term_ids = [self.vocab[token] for token in set(tokenize(query)) if token in self.vocab]
+        if not term_ids:
+            return np.zeros(self.size, dtype=np.float32)
+        spans = [np.arange(self._offsets[t], self._offsets[t + 1]) for t in term_ids]
+        postings = np.concatenate(spans)
+        return np.bincount(
+            self._doc_ids[postings], weights=self._weights[postings], minlength=self.size
+        ).astype(np.float32)
+
+    def search(
+        self, query: str, k: int = 3, mask: Optional[np.ndarray] = None, min_score: float = 0.0
+    ) -> List[Tuple[int, float]]:
+        """Top-k (doc id, score) pairs, optionally restricted to docs where `mask` is True."""
+        return top_k(self.scores(query), k=k, mask=mask, min_score=min_score)
+
+
+def top_k(
+    scores: np.ndarray, k: int = 3, mask: Optional[np.ndarray] = None, min_score: float = 0.0
+) -> List[Tuple[int, float]]:
+    if mask is not None:
+        scores = np.where(mask, scores, 0.0)
+    candidates = np.flatnonzero(scores > min_score)
+    if candidates.size > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return [(int(i), float(scores[i])) for i in ranked]
+
+
+@dataclass
+class Passage:
+    title: str
+    text: str
+
+    def render(self) -> str:
+        return f"Q: {self.title}\nA: {self.text}"
+
+
+class FAQIndex:
+    """BM25 over a knowledge base's `faqs` (question + answer) and `verticals` (name + description)."""
+
+    def __init__(self, passages: List[Passage]):
+        self.passages = passages
+        # Titles are repeated so a question's own words weigh more than its answer's
+        self.index = BM25Index([f"{p.title} {p.title} {p.text}" for p in passages])
+
+    @classmethod
+    def from_content(cls, content: Dict[str, Any]) -> "FAQIndex":
+        passages = [Passage(f["question"], f["answer"]) for f in content.get("faqs", [])]
+        passages += [Passage(f"What is {v['name']}?", v["description"]) for v in content.get("verticals", [])]
+        return cls(passages)
+
+    def lookup(self, query: str, k: int = 3, min_score: float = 0.0) -> List[Passage]:
+        return [self.passages[i] for i, _ in self.index.search(query, k=k, min_score=min_score)]
+
+    def context_for(self, query: str, k: int = 3, min_score: float = 1.0) -> Optional[str]:
+        """Reference text for the top-k relevant passages, or None if nothing relevant."""
+        passages = self.lookup(query, k=k, min_score=min_score)
+        if not passages:
+            return None
+        return "\n\n".join(p.render() for p in passages)
@@ -0,0 +1,259 @@
+"""
+OpenTelemetry tracing for function tools.
+
+Stack `@traced_tool` under `@function_tool` and every call gets a span with
+its duration, argument and result size, any exception, and the session (room)
+and turn (speech handle) it ran in. Spans nest under livekit's own turn
+spans when both are exported through the same provider, which
+`setup_tool_tracing()` arranges.
+
+Exporters are chosen with TOOL_TRACE_EXPORTER:
+
+- "otlp": OTLP/HTTP to a collector (OTEL_EXPORTER_OTLP_ENDPOINT, default http://localhost:4318)
+- "file": one OTel JSON span per line in TOOL_TRACE_FILE
+- unset: spans are not exported; the in-process `TOOL_STATS` still count every call
+
+Tool spans are sampled when they end, so sampling can favour the spans worth
+seeing: errors and calls slower than TOOL_TRACE_SLOW_MS are always exported,
+the rest at TOOL_TRACE_SAMPLE_RATE. A tool that reports failure in its result
+instead of raising ({"status": "error", ...} or {"success": False, ...}, as
+the MCP integrations do) counts as an error too.
+
+Per-session stats are dropped with `TOOL_STATS.drop(room)` once the session's
+summary has been logged, so a long-lived worker does not accumulate them.
+
+    @function_tool
+    @traced_tool
+    async def add_to_cart(self, ctx: RunContext, item_name: str): ...
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from opentelemetry import trace
+from opentelemetry.trace import Status, StatusCode
+
+logger = logging.getLogger("tool-tracing")
+
+TOOL_TRACE_EXPORTER = os.getenv("TOOL_TRACE_EXPORTER", "").lower()
+TOOL_TRACE_FILE = Path(os.getenv("TOOL_TRACE_FILE", str(Path(__file__).parent.parent / "traces" / "tool_spans.jsonl")))
+TOOL_TRACE_SAMPLE_RATE = float(os.getenv("TOOL_TRACE_SAMPLE_RATE", "0.1"))
+TOOL_TRACE_SLOW_MS = float(os.getenv("TOOL_TRACE_SLOW_MS", "500"))
+
+# Resolves to the real provider once setup_tool_tracing() has run, a no-op before that
+_tracer = trace.get_tracer("tool-tracing")
+_provider = None
+
+_JSON_TYPES = (str, int, float, bool, list, dict, type(None))
+
+
+def _size(value: Any) -> int:
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str))
+    except (TypeError, ValueError):
+        return len(str(value))
+
+
+def _failure_message(result: Any) -> Optional[str]:
+    """The error a tool reported in its result without raising, if any."""
+    if isinstance(result, dict) and (result.get("status") == "error" or result.get("success") is False):
+        return str(result.get("message") or result.get("error") or "tool reported failure")
+    return None
+
+
+def _current_room() -> str:
+    try:
+        from livekit.agents import get_job_context
+
+        return get_job_context().room.name
+    except Exception:
+        return ""
+
+
+class ToolStats:
+    """Every call's duration and outcome, per session and tool, independent of span sampling."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self.calls: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.errors: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.durations: Dict[Tuple[str, str], Deque[float]] = defaultdict(lambda: deque(maxlen=self.window))
+
+    def record(self, session_id: str, tool: str, duration_ms: float, error: bool) -> None:
+        key = (session_id, tool)
+        self.calls[key] += 1
+        self.errors[key] += error
+        self.durations[key].append(duration_ms)
+
+    def summary(self, session_id: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        """Per-tool calls, error rate and latency percentiles; all sessions unless one is given."""
+        merged: Dict[str, Dict[str, Any]] = {}
+        for (session, tool), calls in self.calls.items():
+            if session_id is not None and session != session_id:
+                continue
+            entry = merged.setdefault(tool, {"calls": 0, "errors": 0, "durations": []})
+            entry["calls"] += calls
+            entry["errors"] += self.errors[(session, tool)]
+            entry["durations"].extend(self.durations[(session, tool)])
+
+        result = {}
+        for tool, entry in sorted(merged.items()):
+            durations = sorted(entry["durations"])
+            result[tool] = {
+                "calls": entry["calls"],
+                "error_rate": round(entry["errors"] / entry["calls"], 3),
+                "p50_ms": round(durations[len(durations) // 2], 2),
+                "p95_ms": round(durations[min(int(len(durations) * 0.95), len(durations) - 1)], 2),
+                "max_ms": round(durations[-1], 2),
+            }
+        return result
+
+    def drop(self, session_id: str) -> None:
+        """Forget a finished session's calls."""
+        for key in [key for key in self.calls if key[0] == session_id]:
+            self.calls.pop(key, None)
+            self.errors.pop(key, None)
+            self.durations.pop(key, None)
+
+
+TOOL_STATS = ToolStats()
+
+
+def traced_tool(func: Optional[Callable] = None, *, name: Optional[str] = None):
+    """Trace an async tool (or any async method). Use bare or as @traced_tool(name="...")."""
+
+    def decorate(func: Callable) -> Callable:
+        tool_name = name or func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            # The RunContext (if any) identifies the turn; self and ctx are not arguments worth sizing
+            ctx = next((a for a in args if hasattr(a, "speech_handle")), None)
+            payload = [a for a in args if isinstance(a, _JSON_TYPES)] + [
+                v for v in kwargs.values() if isinstance(v, _JSON_TYPES)
+            ]
+            session_id = _current_room()
+            attributes = {
+                "tool.name": tool_name,
+                "tool.args_bytes": _size(payload),
+                "session.id": session_id,
+            }
+            if ctx is not None:
+                attributes["turn.id"] = ctx.speech_handle.id
+
+            start = time.perf_counter()
+            with _tracer.start_as_current_span(
+                f"tool {tool_name}", attributes=attributes, record_exception=False, set_status_on_exception=False
+            ) as span:
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    duration_ms = (time.perf_counter() - start) * 1000
+                    TOOL_STATS.record(session_id, tool_name, duration_ms, error=True)
+                    span.record_exception(e)
+                    span.set_status(Status(StatusCode.ERROR, str(e)))
+                    span.set_attribute("tool.duration_ms", duration_ms)
+                    raise
+
+                duration_ms = (time.perf_counter() - start) * 1000
+                failure = _failure_message(result)
+                TOOL_STATS.record(session_id, tool_name, duration_ms, error=failure is not None)
+                if failure is not None:
+                    span.set_status(Status(StatusCode.ERROR, failure))
+                span.set_attribute("tool.duration_ms", duration_ms)
+                span.set_attribute("tool.result_bytes", _size(result))
+                if duration_ms > TOOL_TRACE_SLOW_MS:
+                    logger.warning(f"Slow tool {tool_name}: {duration_ms:.0f} ms (session {session_id or '-'})")
+                return result
+
+        return wrapper
+
+    return decorate(func) if func is not None else decorate
+
+
+def _tail_sampling_processor(exporter, sample_rate: float, slow_ms: float):
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    class TailSamplingProcessor(BatchSpanProcessor):
+        """Exports every error and slow tool span, and a `sample_rate` share of the rest."""
+
+        def on_end(self, span) -> None:
+            duration_ms = (span.end_time - span.start_time) / 1e6
+            if (
+                # livekit's own session and turn spans are kept whole so tool spans have parents
+                not span.name.startswith("tool ")
+                or span.status.status_code == StatusCode.ERROR
+                or duration_ms > slow_ms
+                or random.random() < sample_rate
+            ):
+                super().on_end(span)
+
+    return TailSamplingProcessor(exporter)
+
+
+def _build_exporter(kind: str):
+    if kind == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        return OTLPSpanExporter()
+    if kind == "file":
+        from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+        class JsonLinesSpanExporter(SpanExporter):
+            """Appends each exported batch to TOOL_TRACE_FILE, one JSON span per line."""
+
+            def export(self, spans) -> SpanExportResult:
+                # Batches are infrequent, so the file is only held open while one is written
+                with open(TOOL_TRACE_FILE, "a", encoding="utf-8") as out:
+                    out.writelines(span.to_json(indent=None) + "\n" for span in spans)
+                return SpanExportResult.SUCCESS
+
+        TOOL_TRACE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        return JsonLinesSpanExporter()
+    raise ValueError(f"Unknown TOOL_TRACE_EXPORTER '{kind}', expected 'otlp' or 'file'")
+
+
+def setup_tool_tracing(
+    exporter=None,
+    sample_rate: float = TOOL_TRACE_SAMPLE_RATE,
+    slow_ms: float = TOOL_TRACE_SLOW_MS,
+    service_name: str = "voice-agents",
+):
+    """Install a tracer provider for tool spans (and livekit's own). Safe to call once per process."""
+    global _provider
+    if _provider is not None:
+        return _provider
+    if exporter is None:
+        if not TOOL_TRACE_EXPORTER:
+            return None
+        exporter = _build_exporter(TOOL_TRACE_EXPORTER)
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(_tail_sampling_processor(exporter, sample_rate, slow_ms))
+    trace.set_tracer_provider(provider)
+    try:
+        from livekit.agents.telemetry import set_tracer_provider
+
+        set_tracer_provider(provider)
+    except ImportError:
+        pass
+    _provider = provider
+    logger.info(f"Tool tracing enabled ({type(exporter).__name__}, sample rate {sample_rate}, slow > {slow_ms} ms)")
+    return provider
+
+
+async def flush_tool_traces() -> None:
+    if _provider is not None:
+        await asyncio.to_thread(_provider.force_flush)
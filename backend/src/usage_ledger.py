@@ -0,0 +1,386 @@
+"""
+Persistent usage and cost ledger.
+
+`metrics.UsageCollector` only lives as long as the session, and `log_usage`
+prints its summary once at shutdown. `UsageLedger` keeps that usage. Every
+LLM/STT/TTS metrics event a session emits (tokens, audio seconds,
+characters) is priced and buffered in memory. A background thread then
+folds the buffer into SQLite rollups per minute, hour and day, keyed by
+agent, model, room and kind. Sessions (with their user turns) and their
+outcomes (placed orders, saved leads) are recorded too, so "what does an
+order cost us" is a single indexed query. Outcomes are buffered like usage,
+keyed by session, since order IDs repeat across calls.
+
+When a session ends, its cost is compared with the agent's recent history.
+If the last LEDGER_DRIFT_RECENT calls cost more than LEDGER_DRIFT_THRESHOLD
+above the calls before them (or that much below), a warning is logged.
+
+Prices are USD list prices, overridable with USAGE_PRICES (JSON, merged over
+DEFAULT_PRICES). The "<kind>:*" entries apply to models without their own.
+
+    python -m src.usage_ledger report --day 2025-11-26 --by hour
+    python -m src.usage_ledger cost-per order --days 7
+    python -m src.usage_ledger drift --agent grocery
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from livekit.agents.metrics import EOUMetrics, LLMMetrics, STTMetrics, TTSMetrics
+
+logger = logging.getLogger("usage-ledger")
+
+DB_PATH = Path(os.getenv("USAGE_LEDGER_DB", str(Path(__file__).parent.parent / "usage_ledger.db")))
+LEDGER_FLUSH_S = float(os.getenv("LEDGER_FLUSH_S", "5"))
+# Minute rows are only kept this long; hour and day rows are kept
+LEDGER_MINUTE_RETENTION_DAYS = int(os.getenv("LEDGER_MINUTE_RETENTION_DAYS", "7"))
+LEDGER_DRIFT_RECENT = int(os.getenv("LEDGER_DRIFT_RECENT", "20"))
+LEDGER_DRIFT_BASELINE = int(os.getenv("LEDGER_DRIFT_BASELINE", "200"))
+LEDGER_DRIFT_THRESHOLD = float(os.getenv("LEDGER_DRIFT_THRESHOLD", "0.25"))
+
+DEFAULT_PRICES: Dict[str, Dict[str, float]] = {
+    "llm:gemini-2.5-flash": {"prompt_per_mtok": 0.30, "cached_per_mtok": 0.075, "completion_per_mtok": 2.50},
+    "llm:*": {"prompt_per_mtok": 0.30, "cached_per_mtok": 0.075, "completion_per_mtok": 2.50},
+    "stt:*": {"per_audio_minute": 0.0077},
+    "tts:*": {"per_1k_chars": 0.030},
+}
+PRICES = {**DEFAULT_PRICES, **json.loads(os.getenv("USAGE_PRICES", "{}"))}
+
+GRANULARITIES = {"minute": 16, "hour": 13, "day": 10}  # ISO timestamp prefix length per bucket
+_COUNTERS = ["events", "prompt_tokens", "cached_tokens", "completion_tokens", "audio_seconds", "characters", "cost"]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS usage_rollups (
+    granularity TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    model TEXT NOT NULL,
+    room TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    {", ".join(f"{c} REAL NOT NULL DEFAULT 0" for c in _COUNTERS)},
+    PRIMARY KEY (granularity, bucket, agent, model, room, kind)
+);
+CREATE TABLE IF NOT EXISTS usage_sessions (
+    session_id TEXT PRIMARY KEY,
+    agent TEXT NOT NULL,
+    room TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    ended_at TEXT,
+    turns INTEGER NOT NULL DEFAULT 0,
+    cost REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_usage_sessions_agent ON usage_sessions (agent, ended_at);
+CREATE TABLE IF NOT EXISTS usage_outcomes (
+    kind TEXT NOT NULL,
+    ref TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    value REAL NOT NULL DEFAULT 0,
+    at TEXT NOT NULL,
+    PRIMARY KEY (kind, session_id, ref)
+);
+CREATE INDEX IF NOT EXISTS idx_usage_outcomes_at ON usage_outcomes (kind, at);
+"""
+
+
+def _price(kind: str, model: str) -> Dict[str, float]:
+    return PRICES.get(f"{kind}:{model}") or PRICES.get(f"{kind}:*", {})
+
+
+def usage_from_metrics(m: Any) -> Optional[Tuple[str, str, Dict[str, float]]]:
+    """(kind, model, counters incl. cost) for a billable metrics event, None for the rest (VAD, EOU, ...)."""
+    metadata = getattr(m, "metadata", None)
+    model = (getattr(metadata, "model_name", None) if metadata else None) or getattr(m, "label", "") or "unknown"
+    if isinstance(m, LLMMetrics):
+        price = _price("llm", model)
+        uncached = max(m.prompt_tokens - m.prompt_cached_tokens, 0)
+        cost = (
+            uncached * price.get("prompt_per_mtok", 0)
+            + m.prompt_cached_tokens * price.get("cached_per_mtok", 0)
+            + m.completion_tokens * price.get("completion_per_mtok", 0)
+        ) / 1e6
+        counts = {"prompt_tokens": m.prompt_tokens, "cached_tokens": m.prompt_cached_tokens,
+                  "completion_tokens": m.completion_tokens}
+        return "llm", model, dict(counts, events=1, cost=cost)
+    if isinstance(m, STTMetrics):
+        cost = m.audio_duration / 60 * _price("stt", model).get("per_audio_minute", 0)
+        return "stt", model, {"events": 1, "audio_seconds": m.audio_duration, "cost": cost}
+    if isinstance(m, TTSMetrics):
+        cost = m.characters_count / 1000 * _price("tts", model).get("per_1k_chars", 0)
+        return "tts", model, {"events": 1, "characters": m.characters_count, "audio_seconds": m.audio_duration, "cost": cost}
+    return None
+
+
+class SessionUsage:
+    """One call's view of the ledger; `collect` is cheap enough for the metrics event handler."""
+
+    def __init__(self, ledger: "UsageLedger", agent: str, room: str):
+        self.ledger = ledger
+        self.agent = agent
+        self.room = room
+        self.session_id = uuid.uuid4().hex
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        # User turns; one turn may take several LLM requests (tool calls)
+        self.turns = 0
+        self.cost = 0.0
+
+    def collect(self, m: Any) -> None:
+        if isinstance(m, EOUMetrics):
+            self.turns += 1
+            return
+        usage = usage_from_metrics(m)
+        if usage is None:
+            return
+        kind, model, counts = usage
+        self.cost += counts["cost"]
+        self.ledger.record(self.agent, self.room, kind, model, counts)
+
+    def outcome(self, kind: str, ref: str, value: float = 0.0) -> None:
+        """Attribute this call's cost to e.g. a placed order or a saved lead. Buffered, never blocks on SQLite."""
+        self.ledger.record_outcome(self, kind, ref, value)
+
+    def close(self) -> Optional[Dict[str, Any]]:
+        """Record the call, flush its usage and return a drift alert if one fired."""
+        self.ledger.end_session(self)
+        return self.ledger.check_drift(self.agent)
+
+
+class UsageLedger:
+    def __init__(self, db_path: Path = DB_PATH, flush_interval: float = LEDGER_FLUSH_S):
+        self.db_path = db_path
+        # The buffer lock is all the metrics handler ever waits on; SQLite work holds `_lock`
+        self._buffer_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[str, str, str, str, str, Dict[str, float]]] = []
+        self._pending_outcomes: List[Tuple[str, str, str, str, float, str]] = []
+        self.conn = sqlite3.connect(db_path, timeout=5.0, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._pruned_on: Optional[date] = None
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if flush_interval > 0:
+            self._flusher = threading.Thread(target=self._run, args=(flush_interval,), name="usage-ledger", daemon=True)
+            self._flusher.start()
+
+    def session(self, agent: str, room: str) -> SessionUsage:
+        return SessionUsage(self, agent, room)
+
+    def record(self, agent: str, room: str, kind: str, model: str, counts: Dict[str, float], at: Optional[datetime] = None) -> None:
+        stamp = (at or datetime.now()).isoformat(timespec="seconds")
+        with self._buffer_lock:
+            self._pending.append((stamp, agent, model, room, kind, counts))
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush usage ledger: {e}")
+
+    def flush(self) -> int:
+        """Fold buffered events into the minute/hour/day rollups. Returns events written."""
+        with self._buffer_lock:
+            pending, self._pending = self._pending, []
+            outcomes, self._pending_outcomes = self._pending_outcomes, []
+        if outcomes:
+            with self._lock, self.conn:
+                self.conn.executemany("INSERT OR IGNORE INTO usage_outcomes VALUES (?, ?, ?, ?, ?, ?)", outcomes)
+        if not pending:
+            return 0
+
+        # Sum in memory first: a busy minute becomes one upsert per rollup row, not one per event
+        rows: Dict[Tuple[str, ...], Dict[str, float]] = defaultdict(lambda: dict.fromkeys(_COUNTERS, 0.0))
+        for stamp, agent, model, room, kind, counts in pending:
+            for granularity, length in GRANULARITIES.items():
+                row = rows[(granularity, stamp[:length], agent, model, room, kind)]
+                for name, value in counts.items():
+                    row[name] += value
+
+        columns = ", ".join(_COUNTERS)
+        updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in _COUNTERS)
+        with self._lock, self.conn:
+            self.conn.executemany(
+                f"""
+                INSERT INTO usage_rollups (granularity, bucket, agent, model, room, kind, {columns})
+                VALUES (?, ?, ?, ?, ?, ?, {", ".join("?" * len(_COUNTERS))})
+                ON CONFLICT(granularity, bucket, agent, model, room, kind) DO UPDATE SET {updates}
+                """,
+                [key + tuple(row[c] for c in _COUNTERS) for key, row in rows.items()],
+            )
+            if self._pruned_on != date.today():
+                cutoff = (datetime.now() - timedelta(days=LEDGER_MINUTE_RETENTION_DAYS)).isoformat()[:16]
+                self.conn.execute("DELETE FROM usage_rollups WHERE granularity = 'minute' AND bucket < ?", (cutoff,))
+                self._pruned_on = date.today()
+        return len(pending)
+
+    def end_session(self, usage: SessionUsage) -> None:
+        self.flush()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO usage_sessions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (usage.session_id, usage.agent, usage.room, usage.started_at,
+                 datetime.now().isoformat(timespec="seconds"), usage.turns, usage.cost),
+            )
+
+    def record_outcome(self, usage: SessionUsage, kind: str, ref: str, value: float = 0.0) -> None:
+        stamp = datetime.now().isoformat(timespec="seconds")
+        with self._buffer_lock:
+            self._pending_outcomes.append((kind, ref, usage.session_id, usage.agent, value, stamp))
+
+    # -- queries --------------------------------------------------------------
+
+    def report(self, start: str, end: str, by: str = "hour", agent: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Usage and cost per bucket, agent, model and kind with start <= bucket < end (rooms summed)."""
+        sql = f"""
+            SELECT bucket, agent, model, kind, {", ".join(f"SUM({c}) AS {c}" for c in _COUNTERS)}
+            FROM usage_rollups WHERE granularity = ? AND bucket >= ? AND bucket < ?
+        """
+        params: List[Any] = [by, start, end]
+        if agent:
+            sql += " AND agent = ?"
+            params.append(agent)
+        sql += " GROUP BY bucket, agent, model, kind ORDER BY bucket, agent, kind"
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def room_usage(self, room: str) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT kind, {', '.join(f'SUM({c}) AS {c}' for c in _COUNTERS)} FROM usage_rollups "
+                "WHERE granularity = 'day' AND room = ? GROUP BY kind",
+                (room,),
+            ).fetchall()
+        return {row["kind"]: {c: row[c] for c in _COUNTERS} for row in rows}
+
+    def cost_per_outcome(self, kind: str, start: str, end: str, agent: Optional[str] = None) -> Dict[str, Any]:
+        """Total cost of the calls that produced a `kind` outcome in [start, end), per outcome."""
+        sql = """
+            SELECT COUNT(*) AS outcomes, SUM(value) AS value, SUM(s.cost) AS cost
+            FROM usage_outcomes o JOIN usage_sessions s ON s.session_id = o.session_id
+            WHERE o.kind = ? AND o.at >= ? AND o.at < ?
+        """
+        params: List[Any] = [kind, start, end]
+        if agent:
+            sql += " AND o.agent = ?"
+            params.append(agent)
+        with self._lock:
+            row = self.conn.execute(sql, params).fetchone()
+            calls = self.conn.execute(
+                "SELECT COUNT(*), SUM(cost) FROM usage_sessions WHERE ended_at >= ? AND ended_at < ?"
+                + (" AND agent = ?" if agent else ""),
+                params[1:],
+            ).fetchone()
+        outcomes = row["outcomes"] or 0
+        # Calls that didn't convert cost money too; `all_calls_cost_per_outcome` charges them to the ones that did
+        return {
+            "kind": kind,
+            "outcomes": outcomes,
+            "cost_per_outcome": round((row["cost"] or 0) / outcomes, 6) if outcomes else None,
+            "all_calls_cost_per_outcome": round((calls[1] or 0) / outcomes, 6) if outcomes else None,
+            "cost_share_of_value": round((row["cost"] or 0) / row["value"], 6) if row["value"] else None,
+            "calls": calls[0],
+        }
+
+    def check_drift(
+        self,
+        agent: str,
+        recent: int = LEDGER_DRIFT_RECENT,
+        baseline: int = LEDGER_DRIFT_BASELINE,
+        threshold: float = LEDGER_DRIFT_THRESHOLD,
+    ) -> Optional[Dict[str, Any]]:
+        """Alert if the mean cost of the last `recent` calls moved more than `threshold` from the `baseline` before."""
+        with self._lock:
+            costs = [
+                row[0]
+                for row in self.conn.execute(
+                    "SELECT cost FROM usage_sessions WHERE agent = ? AND ended_at IS NOT NULL "
+                    "ORDER BY ended_at DESC, rowid DESC LIMIT ?",
+                    (agent, recent + baseline),
+                )
+            ]
+        # Need a full recent window and at least as much history behind it
+        if len(costs) < 2 * recent:
+            return None
+        recent_avg = sum(costs[:recent]) / recent
+        baseline_avg = sum(costs[recent:]) / (len(costs) - recent)
+        if baseline_avg <= 0:
+            return None
+        ratio = recent_avg / baseline_avg
+        if abs(ratio - 1) <= threshold:
+            return None
+        alert = {
+            "agent": agent,
+            "recent_avg_cost": round(recent_avg, 6),
+            "baseline_avg_cost": round(baseline_avg, 6),
+            "ratio": round(ratio, 3),
+        }
+        logger.warning(f"Cost per call drifted for {agent}: {json.dumps(alert)}")
+        return alert
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=1)
+        self.flush()
+        self.conn.close()
+
+
+_ledger: Optional[UsageLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_usage_ledger() -> UsageLedger:
+    """Process-wide ledger, opened on first use."""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = UsageLedger()
+        return _ledger
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Usage and cost ledger queries")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report_parser = sub.add_parser("report", help="Usage and cost per bucket, agent, model and kind")
+    report_parser.add_argument("--day", default=date.today().isoformat(), help="YYYY-MM-DD (default today)")
+    report_parser.add_argument("--days", type=int, default=1, help="Number of days from --day")
+    report_parser.add_argument("--by", choices=list(GRANULARITIES), default="hour")
+    report_parser.add_argument("--agent")
+    cost_parser = sub.add_parser("cost-per", help="Cost per placed order or saved lead")
+    cost_parser.add_argument("kind", choices=["order", "lead"])
+    cost_parser.add_argument("--days", type=int, default=7, help="Up to and including today")
+    cost_parser.add_argument("--agent")
+    drift_parser = sub.add_parser("drift", help="Compare recent cost per call with the baseline")
+    drift_parser.add_argument("--agent", required=True)
+    args = parser.parse_args(argv)
+
+    ledger = UsageLedger(flush_interval=0)
+    if args.command == "report":
+        start = date.fromisoformat(args.day)
+        rows = ledger.report(start.isoformat(), (start + timedelta(days=args.days)).isoformat(), args.by, args.agent)
+        for row in rows:
+            print(json.dumps(row))
+    elif args.command == "cost-per":
+        end = date.today() + timedelta(days=1)
+        print(json.dumps(ledger.cost_per_outcome(args.kind, (end - timedelta(days=args.days)).isoformat(), end.isoformat(), args.agent), indent=2))
+    else:
+        print(json.dumps(ledger.check_drift(args.agent) or {"agent": args.agent, "drift": None}, indent=2))
+    ledger.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Cross-session batched Silero VAD inference.
+
+Every VAD stream normally runs its own ONNX call per 32 ms window, so N calls
+in one process mean N tiny inferences. `BatchedVAD` streams hand their
+windows to a process-wide `VADBatcher` thread, which stacks them (the Silero
+model takes a batch dimension for both audio and RNN state), runs one
+inference and hands each stream its probability and new state back.
+
+The batcher only waits for other streams that have been active recently, and
+never longer than `max_wait`, so a lone call adds no latency. Batching helps
+when several sessions share a process, e.g. with AGENT_JOB_EXECUTOR=thread;
+set VAD_BATCHING=1 to have `load_vad` return a BatchedVAD.
+
+    python -m src.vad_batcher --sessions 1,10,50
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from livekit.plugins import silero
+from livekit.plugins.silero import onnx_model
+from livekit.plugins.silero.vad import VADStream
+
+logger = logging.getLogger("vad-batcher")
+
+# A stream counts as active if it submitted a window this recently
+ACTIVE_WINDOW = 0.1
+
+
+@dataclass
+class _Request:
+    stream_id: int
+    input: np.ndarray
+    state: np.ndarray
+    submitted: float = field(default_factory=time.perf_counter)
+    done: threading.Event = field(default_factory=threading.Event)
+    prob: float = 0.0
+    new_state: Optional[np.ndarray] = None
+
+
+class VADBatcher:
+    def __init__(self, session, sample_rate: int = 16000, max_batch: int = 64, max_wait: float = 0.004):
+        self._sess = session
+        self._sr = np.array(sample_rate, dtype=np.int64)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+
+        self._cond = threading.Condition()
+        self._pending: List[_Request] = []
+        self._last_seen: Dict[int, float] = {}
+        self._thread = threading.Thread(target=self._run, daemon=True, name="vad_batcher")
+        self._thread.start()
+
+        self.batches = 0
+        self.windows = 0
+        self.inference_time = 0.0
+        self.wait_times: List[float] = []
+
+    def infer(self, stream_id: int, input_buffer: np.ndarray, state: np.ndarray) -> Tuple[float, np.ndarray]:
+        """Blocking: queue one (1, context + window) input and wait for its batch to run."""
+        request = _Request(stream_id=stream_id, input=input_buffer, state=state)
+        with self._cond:
+            self._pending.append(request)
+            self._last_seen[stream_id] = request.submitted
+            self._cond.notify()
+        request.done.wait()
+        return request.prob, request.new_state
+
+    def _active_streams(self, now: float) -> int:
+        for stream_id, seen in list(self._last_seen.items()):
+            if now - seen > ACTIVE_WINDOW:
+                del self._last_seen[stream_id]
+        return max(len(self._last_seen), 1)
+
+    def _collect(self) -> List[_Request]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.perf_counter() + self.max_wait
+            while len(self._pending) < min(self._active_streams(time.perf_counter()), self.max_batch):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, self._pending = self._pending[: self.max_batch], self._pending[self.max_batch :]
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            start = time.perf_counter()
+            try:
+                out, state = self._sess.run(
+                    None,
+                    {
+                        "input": np.concatenate([r.input for r in batch], axis=0),
+                        "state": np.concatenate([r.state for r in batch], axis=1),
+                        "sr": self._sr,
+                    },
+                )
+                for i, request in enumerate(batch):
+                    request.prob = float(out[i, 0])
+                    request.new_state = state[:, i : i + 1, :].copy()
+            except Exception as e:
+                logger.error(f"Batched VAD inference failed: {e}")
+                for request in batch:
+                    request.prob, request.new_state = 0.0, request.state
+            finally:
+                elapsed = time.perf_counter() - start
+                self.batches += 1
+                self.windows += len(batch)
+                self.inference_time += elapsed
+                self.wait_times.extend(start - r.submitted for r in batch)
+                del self.wait_times[:-10000]
+                for request in batch:
+                    request.done.set()
+
+    def stats(self) -> Dict[str, float]:
+        waits = sorted(self.wait_times)
+        return {
+            "batches": self.batches,
+            "avg_batch": round(self.windows / self.batches, 2) if self.batches else 0.0,
+            "p99_added_ms": round(waits[int(0.99 * (len(waits) - 1))] * 1000, 2) if waits else 0.0,
+        }
+
+
+_BATCHERS: Dict[int, VADBatcher] = {}
+_BATCHERS_LOCK = threading.Lock()
+
+
+def get_batcher(session, sample_rate: int) -> VADBatcher:
+    """One batcher per sample rate, shared by every stream in the process."""
+    with _BATCHERS_LOCK:
+        if sample_rate not in _BATCHERS:
+            _BATCHERS[sample_rate] = VADBatcher(session, sample_rate=sample_rate)
+        return _BATCHERS[sample_rate]
+
+
+class BatchedOnnxModel(onnx_model.OnnxModel):
+    """Per-stream Silero model whose inference goes through the shared batcher."""
+
+    def __init__(self, *, batcher: VADBatcher, onnx_session, sample_rate: int) -> None:
+        super().__init__(onnx_session=onnx_session, sample_rate=sample_rate)
+        self._batcher = batcher
+
+    def __call__(self, x: np.ndarray) -> float:
+        self._input_buffer[:, : self._context_size] = self._context
+        self._input_buffer[:, self._context_size :] = x
+
+        prob, self._rnn_state = self._batcher.infer(id(self), self._input_buffer.copy(), self._rnn_state)
+        self._context = self._input_buffer[:, -self._context_size :].copy()
+        return prob
+
+
+class BatchedVAD(silero.VAD):
+    """Drop-in `silero.VAD` whose streams share one batched inference per tick."""
+
+    def stream(self) -> VADStream:
+        sample_rate = self._opts.sample_rate
+        model = BatchedOnnxModel(
+            batcher=get_batcher(self._onnx_session, sample_rate),
+            onnx_session=self._onnx_session,
+            sample_rate=sample_rate,
+        )
+        stream = VADStream(self, self._opts, model)
+        self._streams.add(stream)
+        return stream
+
+
+def load_vad() -> silero.VAD:
+    """VAD for `prewarm`: batched across sessions when VAD_BATCHING=1."""
+    if os.getenv("VAD_BATCHING", "0") == "1":
+        return BatchedVAD.load()
+    return silero.VAD.load()
+
+
+def benchmark(sessions: int, batched: bool, seconds: float = 3.0) -> Dict[str, float]:
+    """Feed `sessions` real-time streams of noise for `seconds` and measure CPU per session."""
+    session = onnx_model.new_inference_session(force_cpu=True)
+    batcher = VADBatcher(session) if batched else None
+    window = 512
+    tick = window / 16000
+
+    def make_model():
+        if batched:
+            return BatchedOnnxModel(batcher=batcher, onnx_session=session, sample_rate=16000)
+        return onnx_model.OnnxModel(onnx_session=session, sample_rate=16000)
+
+    lock = threading.Lock()
+
+    def feed(model, stop_at: float):
+        audio = np.random.uniform(-0.1, 0.1, window).astype(np.float32)
+        next_tick = time.perf_counter()
+        while next_tick < stop_at:
+            if batched:
+                model(audio)
+            else:
+                # One shared ONNX session, as with the stock VAD
+                with lock:
+                    model(audio)
+            next_tick += tick
+            time.sleep(max(0.0, next_tick - time.perf_counter()))
+
+    stop_at = time.perf_counter() + seconds
+    cpu_start = time.process_time()
+    threads = [threading.Thread(target=feed, args=(make_model(), stop_at)) for _ in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cpu = time.process_time() - cpu_start
+
+    result = {
+        "sessions": sessions,
+        "mode": "batched" if batched else "per-stream",
+        "cpu_ms_per_session_s": round(cpu / sessions / seconds * 1000, 2),
+    }
+    if batcher:
+        result.update(batcher.stats())
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-stream vs batched Silero VAD CPU cost")
+    parser.add_argument("--sessions", default="1,10,50")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    for n in (int(s) for s in args.sessions.split(",")):
+        for batched in (False, True):
+            print(benchmark(n, batched, args.seconds))
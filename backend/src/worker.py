@@ -0,0 +1,91 @@
+"""
+Unified worker serving every agent vertical from one process fleet.
+
+Each job picks its agent type from the dispatch metadata or, failing that,
+the room metadata: either a plain registry key ("pw") or JSON such as
+{"agent": "pw"}. All agent types share the models loaded once in `prewarm`.
+
+    python -m src.worker dev
+"""
+import json
+import logging
+import os
+from typing import Awaitable, Callable, Dict, Optional
+
+from livekit.agents import JobContext, JobExecutorType, JobProcess, WorkerOptions, cli
+
+try:
+    from src import agent as burgerking_agent
+    from src import agent_pw as pw_agent
+    from src.admission import REJECT_ABOVE, AdmissionController
+    from src.log_pipeline import setup_log_file
+except ImportError:
+    import agent as burgerking_agent
+    import agent_pw as pw_agent
+    from admission import REJECT_ABOVE, AdmissionController
+    from log_pipeline import setup_log_file
+
+logger = logging.getLogger("agent-worker")
+
+# Agent type -> entrypoint building that agent's session
+AGENT_TYPES: Dict[str, Callable[[JobContext], Awaitable[None]]] = {
+    "burgerking": burgerking_agent.entrypoint,
+    "pw": pw_agent.entrypoint,
+}
+
+DEFAULT_AGENT_TYPE = os.getenv("DEFAULT_AGENT_TYPE", "burgerking")
+
+# "thread" runs several sessions per process, which lets VAD_BATCHING=1 batch across them
+JOB_EXECUTOR = JobExecutorType(os.getenv("AGENT_JOB_EXECUTOR", "process"))
+
+
+def _agent_from_metadata(metadata: Optional[str]) -> Optional[str]:
+    if not metadata:
+        return None
+    metadata = metadata.strip()
+    if metadata in AGENT_TYPES:
+        return metadata
+    try:
+        value = json.loads(metadata)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(value, dict) and value.get("agent") in AGENT_TYPES:
+        return value["agent"]
+    return None
+
+
+def resolve_agent_type(job_metadata: Optional[str], room_metadata: Optional[str]) -> str:
+    """Dispatch metadata wins over room metadata; unknown or missing values use the default."""
+    return (
+        _agent_from_metadata(job_metadata)
+        or _agent_from_metadata(room_metadata)
+        or DEFAULT_AGENT_TYPE
+    )
+
+
+def prewarm(proc: JobProcess):
+    """Load VAD and STT once per process for whichever agent the job turns out to need."""
+    burgerking_agent.prewarm(proc)
+
+
+async def entrypoint(ctx: JobContext):
+    agent_type = resolve_agent_type(ctx.job.metadata, ctx.job.room.metadata)
+    logger.info(f"Dispatching job {ctx.job.id} to '{agent_type}' agent")
+    await AGENT_TYPES[agent_type](ctx)
+
+
+if __name__ == "__main__":
+    setup_log_file()
+    cli.run_app(
+        WorkerOptions(
+            entrypoint_fnc=entrypoint,
+            prewarm_fnc=prewarm,
+            job_executor_type=JOB_EXECUTOR,
+            agent_name=os.getenv("LIVEKIT_AGENT_NAME", "freshmarket-agent"),
+            load_fnc=AdmissionController(),
+            load_threshold=REJECT_ABOVE,
+            ws_url=os.getenv("LIVEKIT_URL"),
+            api_key=os.getenv("LIVEKIT_API_KEY"),
+            api_secret=os.getenv("LIVEKIT_API_SECRET"),
+        )
+    )
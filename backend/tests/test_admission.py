@@ -0,0 +1,95 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from admission import AdmissionController, LoopLagProbe, read_loop_lag
+
+
+class FixedLoad(AdmissionController):
+    """Controller whose signals are set by the test instead of measured."""
+
+    def __init__(self, **kwargs):
+        super().__init__(reject_above=0.8, accept_below=0.5, **kwargs)
+        self.values = {"cpu": 0.0}
+
+    def components(self, active_sessions):
+        return dict(self.values, sessions=active_sessions / self.max_sessions)
+
+
+def test_hysteresis_keeps_rejecting_until_load_drops():
+    controller = FixedLoad(max_sessions=10)
+
+    assert controller.score(2) == 0.2
+    controller.values["cpu"] = 0.9
+    assert controller.score(2) == 0.9
+    assert controller.rejecting
+
+    # Below the reject threshold but above accept_below: still reported as full
+    controller.values["cpu"] = 0.6
+    assert controller.score(2) == 0.8
+
+    controller.values["cpu"] = 0.4
+    assert controller.score(2) == 0.4
+    assert not controller.rejecting
+
+
+def test_session_count_alone_can_saturate():
+    controller = FixedLoad(max_sessions=10)
+    assert controller.score(9) == 0.9
+    assert controller.rejecting
+
+
+def test_drain_file_reports_full(tmp_path):
+    drain_file = tmp_path / "drain"
+    controller = FixedLoad(max_sessions=10, drain_file=str(drain_file))
+    assert controller.score(0) == 0.0
+
+    drain_file.touch()
+    assert controller.score(0) == 1.0
+
+
+class LagOnly(AdmissionController):
+    """Real loop-lag reading; host CPU and RSS zeroed so the test machine does not matter."""
+
+    def components(self, active_sessions):
+        return dict(super().components(active_sessions), cpu=0.0, rss=0.0)
+
+
+def test_off_cadence_polls_do_not_look_like_lag(tmp_path):
+    # LiveKit also calls load_fnc when answering availability requests, so calls arrive irregularly
+    controller = LagOnly(max_sessions=10, lag_dir=tmp_path)
+    loads = []
+    for gap in (0.0, 0.0, 0.3, 0.0, 0.6, 0.01):
+        time.sleep(gap)
+        loads.append(controller())
+    assert max(loads) == 0.0
+    assert not controller.rejecting
+
+
+@pytest.mark.asyncio
+async def test_probe_reports_blocked_job_loop(tmp_path):
+    controller = LagOnly(max_sessions=10, max_loop_lag=0.2, lag_dir=tmp_path)
+    probe = LoopLagProbe(interval=0.02, lag_dir=tmp_path)
+    probe.start()
+    await asyncio.sleep(0.05)
+
+    time.sleep(0.3)  # a blocking call on the job's event loop
+    await asyncio.sleep(0.05)
+    assert probe.lag >= 0.25
+    assert controller() >= 0.8
+    assert controller.rejecting
+
+    probe.stop()
+    await asyncio.sleep(0.01)
+    assert read_loop_lag(tmp_path) == 0.0
+
+
+def test_stale_probe_files_are_ignored(tmp_path):
+    (tmp_path / "123-1").write_text("0.5")
+    assert read_loop_lag(tmp_path) == 0.5
+    assert read_loop_lag(tmp_path, stale_after=-1) == 0.0
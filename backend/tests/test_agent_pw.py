@@ -0,0 +1,89 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from livekit.agents import llm
+
+from agent_pw import PhysicsWallahSDRAgent
+from session_state import FileStateStore, SessionStateSync, session_key
+
+
+async def test_faq_notes_are_system_context_for_this_turn_only():
+    agent = PhysicsWallahSDRAgent()
+    turn_ctx = agent.chat_ctx.copy()
+    question = llm.ChatMessage(role="user", content=["What is the fee structure?"])
+
+    await agent.on_user_turn_completed(turn_ctx, question)
+
+    notes = [item for item in turn_ctx.items if "Reference notes" in (item.text_content or "")]
+    assert [item.role for item in notes] == ["system"]
+    assert not any("Reference notes" in (item.text_content or "") for item in agent.chat_ctx.items)
+
+
+async def test_weak_faq_matches_leave_the_turn_context_untouched():
+    # Any edit to turn_ctx discards the preemptively generated reply
+    agent = PhysicsWallahSDRAgent()
+    for text in ("Hi, my name is Riya Sharma", "I am a student in class 12", "can I get a refund"):
+        turn_ctx = agent.chat_ctx.copy()
+        before = [item.id for item in turn_ctx.items]
+        await agent.on_user_turn_completed(turn_ctx, llm.ChatMessage(role="user", content=[text]))
+        assert [item.id for item in turn_ctx.items] == before
+
+
+async def _caller_says(agent: PhysicsWallahSDRAgent, text: str) -> llm.ChatContext:
+    """Run one real user turn: the framework appends the message, then calls the hook on a copy."""
+    message = llm.ChatMessage(role="user", content=[text])
+    chat_ctx = agent.chat_ctx.copy()
+    chat_ctx.items.append(message)
+    await agent.update_chat_ctx(chat_ctx)
+    turn_ctx = agent.chat_ctx.copy()
+    await agent.on_user_turn_completed(turn_ctx, message)
+
+    chat_ctx = agent.chat_ctx.copy()
+    chat_ctx.add_message(role="assistant", content="Great, tell me more.")
+    await agent.update_chat_ctx(chat_ctx)
+    return turn_ctx
+
+
+async def test_lead_details_given_mid_call_survive_truncation_and_a_drop(tmp_path):
+    store = FileStateStore(tmp_path)
+    agent = PhysicsWallahSDRAgent()
+    agent.state_sync = SessionStateSync(store, session_key("pw", "caller-1"))
+    agent.context_window.max_turns = 2
+
+    for text in (
+        "Hi, my name is Riya Sharma",
+        "I am a student in class 12",
+        "I'm preparing for NEET",
+        "Do you have weekend batches?",
+        "How long are the lectures?",
+        "Are the notes in Hindi too?",
+    ):
+        turn_ctx = await _caller_says(agent, text)
+
+    # The turns that held the details were dropped, but the details are pinned into this reply's context
+    texts = [item.text_content or "" for item in turn_ctx.items if item.type == "message"]
+    assert "Hi, my name is Riya Sharma" not in texts
+    pinned = next(text for text in texts if "Details captured so far" in text)
+    assert "name: Riya Sharma" in pinned and "grade: 12th" in pinned and "target_exam: NEET" in pinned
+    await agent.state_sync.aclose()
+
+    # A new connection for the same identity lands in a different room; only the fields were stored
+    resumed = PhysicsWallahSDRAgent()
+    assert await resumed.resume_state(SessionStateSync(store, session_key("pw", "caller-1")))
+    assert resumed.lead == {"name": "Riya Sharma", "role": "Student", "grade": "12th", "target_exam": "NEET"}
+    assert "record_lead_details" not in {tool.id for tool in resumed.tools}
+
+
+async def test_saving_the_lead_clears_the_resumable_state(tmp_path):
+    store = FileStateStore(tmp_path)
+    agent = PhysicsWallahSDRAgent()
+    agent.leads_path = tmp_path / "leads.json"
+    agent.state_sync = SessionStateSync(store, session_key("pw", "caller-1"))
+    await _caller_says(agent, "Hi, my name is Riya Sharma")
+
+    await agent.save_lead(None, "Riya Sharma", "Student", "12th", "NEET", "riya@example.com")
+    await agent.state_sync.aclose()
+
+    assert await SessionStateSync(store, session_key("pw", "caller-1")).restore() is None
@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from livekit.agents import StopResponse, llm
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from agent import CartLine, GroceryAgent
+
+
+async def test_batch_add_resolves_merges_and_reports_in_one_command():
+    agent = GroceryAgent()
+    lines = [
+        CartLine(item_name="Whopper", quantity=2, notes="no onions"),
+        CartLine(item_name="large fries"),
+        CartLine(item_name="pepsis", quantity=3),
+        CartLine(item_name="unicorn shake"),
+        CartLine(item_name="whopper", quantity=1),
+    ]
+
+    ctx = SimpleNamespace(function_call=SimpleNamespace(call_id="call-1"))
+    summary = await agent.add_items_to_cart(ctx, lines)
+
+    quantities = {item.name: item.quantity for item in agent.cart.items.values()}
+    assert quantities == {"Whopper": 3, "Fries (Large)": 1, "Pepsi (Medium)": 3}
+    assert agent.cart.items[next(iter(agent.cart.items))].notes == "no onions"
+    assert "'unicorn shake'" in summary and summary.startswith("Added 3x Whopper")
+    assert agent.cart_commands.stats["applied"] == 1
+
+    # The same call replayed by a regenerated reply is not applied twice
+    assert await agent.add_items_to_cart(ctx, lines) == summary
+    assert agent.cart.items[next(iter(agent.cart.items))].quantity == 3
+
+
+async def test_fast_path_remove_targets_the_routed_item():
+    agent = GroceryAgent()
+    await agent.add_items_to_cart(None, [CartLine(item_name="Chicken Whopper"), CartLine(item_name="Whopper")])
+
+    intent = agent.intent_router.parse("remove the whopper", in_cart=set(agent.cart.items))
+    assert await agent._run_intent(intent) == "Removed Whopper from your cart."
+    assert [item.name for item in agent.cart.items.values()] == ["Chicken Whopper"]
+
+
+async def test_fast_path_keeps_the_user_turn_before_its_reply(monkeypatch):
+    agent = GroceryAgent()
+    said = []
+
+    def say(text, audio=None, add_to_chat_ctx=False):
+        said.append((text, [item.text_content for item in agent.chat_ctx.items if item.type == "message"]))
+
+    monkeypatch.setattr(GroceryAgent, "session", property(lambda self: SimpleNamespace(say=say, tts=None)))
+    message = llm.ChatMessage(role="user", content=["add 2 whoppers"])
+    with pytest.raises(StopResponse):
+        await agent.on_user_turn_completed(agent.chat_ctx.copy(), message)
+
+    [(reply, history)] = said
+    assert reply.startswith("Added 2x Whopper")
+    assert history[-1] == "add 2 whoppers"
@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src import benchmarks
+
+
+def test_cases_run_and_compare_against_saved_baseline(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    assert benchmarks.main(["--only", "cart,database", "--sizes", "10", "--min-time", "0.001", "--baseline", str(baseline), "--save"]) == 0
+    assert baseline.exists()
+
+    results = benchmarks.run([10], only=["Cart.get_total"], min_time=0.001)
+    assert list(results) == ["Cart.get_total[10]"]
+    assert results["Cart.get_total[10]"]["median_us"] > 0
+
+
+def test_compare_reports_speedups_and_regressions():
+    baseline = {"a[10]": {"median_us": 100.0}, "b[10]": {"median_us": 100.0}}
+    results = {"a[10]": {"median_us": 50.0}, "b[10]": {"median_us": 200.0}, "c[10]": {"median_us": 1.0}}
+    rows = {row["case"]: row for row in benchmarks.compare(results, baseline)}
+
+    assert rows["a[10]"]["speedup"] == 2.0 and not rows["a[10]"]["regression"]
+    assert rows["b[10]"]["speedup"] == 0.5 and rows["b[10]"]["regression"]
+    assert rows["c[10]"]["speedup"] is None
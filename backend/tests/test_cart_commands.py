@@ -0,0 +1,73 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from cart import Cart
+from cart_commands import CartCommandQueue
+
+
+class FakeCall:
+    def __init__(self, call_id: str):
+        self.call_id = call_id
+
+
+class FakeCtx:
+    def __init__(self, call_id: str):
+        self.function_call = FakeCall(call_id)
+
+
+def _remove(item_id: str):
+    def mutate(cart: Cart) -> str:
+        cart.remove_item(item_id)
+        return f"Removed {item_id}"
+
+    return mutate
+
+
+def _add(item_id: str, quantity: int = 1):
+    def mutate(cart: Cart) -> str:
+        cart.add_item(item_id, item_id.title(), 100.0, quantity)
+        return f"Added {quantity}x {item_id}"
+
+    return mutate
+
+
+async def test_replayed_call_applies_once():
+    cart = Cart()
+    changes = []
+    queue = CartCommandQueue(cart, on_change=lambda: changes.append(1))
+
+    results = await asyncio.gather(
+        *(queue.submit("add", {"item": "whopper", "quantity": 1}, _add("whopper"), FakeCtx("call-1")) for _ in range(3))
+    )
+    assert cart.items["whopper"].quantity == 1
+    assert results == ["Added 1x whopper"] * 3
+    assert queue.stats["deduplicated"] == 2 and len(changes) == 1
+
+
+async def test_parallel_calls_with_the_same_arguments_all_apply():
+    cart = Cart()
+    queue = CartCommandQueue(cart)
+
+    # "Two Whoppers" arriving as two tool calls in one turn
+    await asyncio.gather(
+        *(queue.submit("add", {"item": "whopper", "quantity": 1}, _add("whopper"), FakeCtx(f"call-{i}")) for i in range(2))
+    )
+    await queue.submit("remove", {"item": "whopper"}, _remove("whopper"), FakeCtx("call-2"))
+    await queue.submit("add", {"item": "whopper", "quantity": 1}, _add("whopper"))
+
+    assert cart.items["whopper"].quantity == 1
+    assert queue.stats["applied"] == 4 and queue.stats["deduplicated"] == 0
+
+
+async def test_same_call_id_applies_once_even_after_other_changes():
+    cart = Cart()
+    queue = CartCommandQueue(cart)
+    await queue.submit("add", {"item": "whopper"}, _add("whopper"), FakeCtx("call-1"))
+    await queue.submit("add", {"item": "fries"}, _add("fries"), FakeCtx("call-2"))
+    await queue.submit("add", {"item": "whopper"}, _add("whopper"), FakeCtx("call-1"))
+
+    assert cart.items["whopper"].quantity == 1
+    assert queue.stats["deduplicated"] == 1
@@ -0,0 +1,62 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from livekit.agents import llm
+
+from context_window import EXCERPT_ID, ContextWindow
+
+
+def _conversation(turns: int):
+    items = [llm.ChatMessage(role="system", content=["You are a Burger King assistant."])]
+    for i in range(turns):
+        items.append(llm.ChatMessage(role="user", content=[f"I want item {i}"]))
+        items.append(llm.FunctionCall(call_id=f"c{i}", name="add_to_cart", arguments='{"item_name": "x"}'))
+        items.append(llm.FunctionCallOutput(call_id=f"c{i}", name="add_to_cart", output="Added", is_error=False))
+        items.append(llm.ChatMessage(role="assistant", content=[f"Added item {i}"]))
+    return items
+
+
+def test_short_context_is_untouched():
+    assert ContextWindow(max_turns=6).compact(_conversation(3)) is None
+
+
+def test_old_turns_are_truncated_to_an_excerpt():
+    window = ContextWindow(max_turns=2, state_hint="Call view_cart.")
+    items = window.compact(_conversation(5))
+
+    assert items[0].role == "system"
+    assert items[1].id == EXCERPT_ID and items[1].role == "system"
+    excerpt = items[1].text_content
+    assert "User: I want item 0" in excerpt
+    assert "Call view_cart." in excerpt
+    assert "add_to_cart" not in excerpt
+    assert [i.text_content for i in items if i.type == "message" and i.role == "user"] == [
+        "I want item 3",
+        "I want item 4",
+    ]
+
+
+def test_excerpt_is_rebuilt_not_duplicated():
+    window = ContextWindow(max_turns=2)
+    items = window.compact(_conversation(4))
+    items += _conversation(1)[1:]
+    items = window.compact(items)
+
+    assert sum(1 for i in items if i.id == EXCERPT_ID) == 1
+    assert "Assistant: Added item 2" in items[1].text_content
+
+
+def test_assistant_lines_are_evicted_before_the_callers():
+    window = ContextWindow(max_turns=1, excerpt_chars=40)
+    excerpt = window.compact(_conversation(6))[1].text_content
+
+    assert "Assistant:" not in excerpt and "User: I want item 4" in excerpt
+
+
+def test_token_budget_drops_more_turns():
+    window = ContextWindow(max_turns=10, max_tokens=40)
+    items = window.compact(_conversation(5))
+
+    assert sum(1 for i in items if i.type == "message" and i.role == "user") < 5
@@ -0,0 +1,121 @@
+import sys
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+import database
+import fraud_store
+from fraud_store import BUCKETS, FraudStore
+
+
+def _cases(n: int, status: str = "pending_review"):
+    return [
+        {"username": f"user_{i:05d}", "status": status, "transaction_time": f"2025-11-{1 + i % 28:02d} 10:00:00",
+         "transaction_name": "Purchase", "outcome_note": ""}
+        for i in range(n)
+    ]
+
+
+def test_routing_fuzzy_lookup_and_tenant_isolation(tmp_path):
+    store = FraudStore(tmp_path, default_partitions=4)
+    store.upsert_cases("hdfc", _cases(200))
+    store.upsert_case("icici", {"username": "john_doe", "status": "pending_review"})
+
+    assert store.get_case("hdfc", "user_00042")["status"] == "pending_review"
+    assert store.find_user_fuzzy("icici", "John Doe")["username"] == "john_doe"
+    assert store.find_user_fuzzy("hdfc", "John Doe") is None
+
+    assert store.update_case_status("hdfc", "user_00042", "confirmed_fraud", "card blocked")
+    assert store.get_case("hdfc", "user_00042")["outcome_note"] == "card blocked"
+    assert store.status_counts("hdfc") == {"pending_review": 199, "confirmed_fraud": 1}
+    # Every partition file holds a share of the tenant
+    assert all(p.query("SELECT COUNT(*) FROM fraud_cases")[0][0] > 0 for p in store._all_partitions("hdfc"))
+    store.close()
+
+
+def test_parallel_triage_merges_all_partitions_and_tenants(tmp_path):
+    store = FraudStore(tmp_path, default_partitions=3)
+    store.upsert_cases("hdfc", _cases(60))
+    store.upsert_cases("sbi", _cases(30))
+
+    triage = store.triage(limit=10)
+    assert len(triage) == 10
+    assert triage == sorted(triage, key=lambda c: c["transaction_time"], reverse=True)
+    assert {c["tenant"] for c in store.triage(limit=100)} == {"hdfc", "sbi"}
+    store.close()
+
+
+def test_online_rebalance_keeps_every_case_reachable(tmp_path):
+    store = FraudStore(tmp_path, default_partitions=2)
+    store.upsert_cases("hdfc", _cases(500))
+
+    errors = []
+
+    def reader():
+        for i in range(0, 500, 7):
+            if store.get_case("hdfc", f"user_{i:05d}") is None:
+                errors.append(i)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    report = store.rebalance("hdfc", 5)
+    thread.join()
+
+    assert not errors
+    assert report["moved_buckets"] > 0 and report["moved_buckets"] < BUCKETS
+    assert sum(store.status_counts("hdfc").values()) == 500
+    store.close()
+
+    # The new layout is persisted
+    reopened = FraudStore(tmp_path)
+    assert reopened.manifest["hdfc"]["partitions"] == 5
+    assert sorted(set(reopened.manifest["hdfc"]["buckets"])) == [0, 1, 2, 3, 4]
+    assert reopened.get_case("hdfc", "user_00499") is not None
+    assert reopened.rebalance("hdfc", 2)["moved_cases"] > 0
+    assert sum(reopened.status_counts("hdfc").values()) == 500
+    reopened.close()
+
+
+def test_views_ignore_copies_left_by_an_interrupted_move(tmp_path):
+    store = FraudStore(tmp_path, default_partitions=2)
+    store.upsert_cases("hdfc", _cases(300))
+    layout = store.manifest["hdfc"]["buckets"]
+    bucket = next(b for b in range(BUCKETS) if layout[b] == 0)
+    src, dst = store._partition("hdfc", 0), store._partition("hdfc", 1)
+    columns = ", ".join(fraud_store._COLUMNS)
+    copied = [tuple(row) for row in src.query(f"SELECT {columns} FROM fraud_cases WHERE bucket = ?", (bucket,))]
+    assert copied
+
+    # Crashed after the copy, before the manifest flip: the copy is not counted
+    dst.write(lambda conn: conn.executemany(fraud_store._UPSERT, copied))
+    assert sum(store.status_counts("hdfc").values()) == 300
+    assert len(store.triage(tenant="hdfc", limit=1000)) == 300
+
+    # Crashed after the flip, before the delete: the old rows are not counted, and a rebalance sweeps them
+    layout[bucket] = 1
+    assert sum(store.status_counts("hdfc").values()) == 300
+    assert store.rebalance("hdfc", 2)["stale_removed"] == len(copied)
+    assert src.query("SELECT COUNT(*) FROM fraud_cases WHERE bucket = ?", (bucket,))[0][0] == 0
+    store.close()
+
+
+def test_shrinking_removes_retired_partition_files(tmp_path):
+    store = FraudStore(tmp_path, default_partitions=4)
+    store.upsert_cases("hdfc", _cases(200))
+    store.rebalance("hdfc", 2)
+
+    assert sorted(p.name for p in (tmp_path / "hdfc").glob("part-*.db")) == ["part-000.db", "part-001.db"]
+    assert sum(store.status_counts("hdfc").values()) == 200
+    store.close()
+
+
+def test_migrates_the_legacy_single_file_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "fraud_cases.db")
+    database.init_db()
+    database.seed_db()
+
+    store = FraudStore(tmp_path / "store")
+    assert store.migrate_legacy("default", database.DB_PATH) == 7
+    assert store.find_user_fuzzy("default", "Reet Singh")["card_ending"] == "7777"
+    store.close()
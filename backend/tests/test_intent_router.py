@@ -0,0 +1,65 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from intent_router import IntentRouter
+
+CATALOG_PATH = Path(__file__).resolve().parent.parent.parent / "shared-data" / "burgerking_content.json"
+
+
+@pytest.fixture
+def router():
+    with open(CATALOG_PATH, "r") as f:
+        return IntentRouter(json.load(f))
+
+
+@pytest.mark.parametrize(
+    "text,action,name,quantity",
+    [
+        ("add two whoppers", "add", "Whopper", 2),
+        ("Can I get a Chicken Whopper please", "add", "Chicken Whopper", 1),
+        ("I'd like 3 Pepsis", "add", "Pepsi (Medium)", 3),
+        ("give me large fries", "add", "Fries (Large)", 1),
+        ("remove the onion rings", "remove", "Onion Rings", 1),
+    ],
+)
+def test_simple_commands_are_routed(router, text, action, name, quantity):
+    intent = router.parse(text)
+    assert intent.action == action
+    assert intent.item["name"] == name
+    assert intent.quantity == quantity
+
+
+def test_view_cart(router):
+    assert router.parse("What's in my cart?").action == "view"
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "add fries",  # medium or large?
+        "add two whoppers and a pepsi",
+        "add a whopper with no onions",
+        "I don't want a whopper",
+        "what is a whopper?",
+        "remove one whopper",
+        "add a big mac",
+        "show me the menu",
+        "add 0 whoppers",
+        "add zero whoppers",
+        # Checkout needs a confirmation turn, so the LLM handles it
+        "place my order",
+        "yes place the order",
+    ],
+)
+def test_uncertain_commands_fall_through(router, text):
+    assert router.parse(text) is None
+
+
+def test_cart_disambiguates_removal(router):
+    assert router.parse("remove the fries") is None
+    assert router.parse("remove the fries", in_cart={"bk-007"}).item["name"] == "Fries (Large)"
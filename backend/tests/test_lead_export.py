@@ -0,0 +1,87 @@
+import csv
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from lead_export import LeadExporter, append_lead, backfill, normalize_lead
+
+
+def _lead(i: int):
+    return {"timestamp": "2025-11-26T16:42:41.756320", "name": f"student {i}", "email": f" S{i}@Example.com ",
+            "role": "Student", "target_exam": "neet", "timeline": "Not specified"}
+
+
+def _exported(out_dir: Path):
+    rows = []
+    for segment in sorted(out_dir.glob("leads-*.ndjson")):
+        rows += [json.loads(line) for line in segment.read_text().splitlines()]
+    return rows
+
+
+def test_normalize_lead():
+    lead = normalize_lead({**_lead(1), "interest": "Jio"})
+    assert lead["name"] == "Student 1"
+    assert lead["email"] == "s1@example.com"
+    assert lead["target_exam"] == "NEET"
+    assert lead["timeline"] == ""
+    assert lead["captured_at"] == "2025-11-26T16:42:41"
+    assert json.loads(lead["extra"]) == {"interest": "Jio"}
+
+
+def test_each_run_exports_only_new_leads(tmp_path):
+    log, out = tmp_path / "leads.ndjson", tmp_path / "exports"
+    exporter = LeadExporter(log, out, batch_size=2)
+    for i in range(3):
+        append_lead(log, _lead(i))
+
+    assert exporter.run()["exported"] == 3
+    assert len(list(out.glob("leads-*"))) == 2
+
+    assert exporter.run()["exported"] == 3
+
+    append_lead(log, _lead(3))
+    assert exporter.run()["exported"] == 4
+    assert [row["name"] for row in _exported(out)] == [f"Student {i}" for i in range(4)]
+
+
+def test_partial_line_waits_for_the_next_run(tmp_path):
+    log, out = tmp_path / "leads.ndjson", tmp_path / "exports"
+    append_lead(log, _lead(0))
+    with open(log, "a") as f:
+        f.write('{"name": "half writ')
+
+    assert LeadExporter(log, out).run()["exported"] == 1
+    with open(log, "a") as f:
+        f.write('ten"}\n')
+    assert LeadExporter(log, out).run()["exported"] == 2
+
+
+def test_crash_before_checkpoint_does_not_duplicate(tmp_path):
+    log, out = tmp_path / "leads.ndjson", tmp_path / "exports"
+    for i in range(2):
+        append_lead(log, _lead(i))
+    exporter = LeadExporter(log, out)
+    exporter.run()
+
+    # Simulate dying after the segment was written but before the checkpoint moved
+    exporter.checkpoint_path.unlink()
+    exporter.run()
+
+    assert len(_exported(out)) == 2
+
+
+def test_csv_segments_and_backfill(tmp_path):
+    legacy = tmp_path / "leads.json"
+    legacy.write_text(json.dumps([_lead(0), _lead(1)]))
+    log, out = tmp_path / "leads.ndjson", tmp_path / "exports"
+
+    assert backfill(legacy, log) == 2
+    assert backfill(legacy, log) == 0
+    LeadExporter(log, out, fmt="csv").run()
+
+    (segment,) = out.glob("leads-*.csv")
+    rows = list(csv.DictReader(segment.open()))
+    assert [row["email"] for row in rows] == ["s0@example.com", "s1@example.com"]
+    assert all(row["lead_id"] for row in rows)
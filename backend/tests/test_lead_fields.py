@@ -0,0 +1,21 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from lead_fields import extract_lead_fields
+
+
+def test_fields_are_picked_out_of_spoken_turns():
+    assert extract_lead_fields("my daughter is in 11th grade and wants JEE Advanced") == {
+        "target_exam": "JEE Advanced",
+        "grade": "11th",
+        "role": "Parent",
+    }
+    assert extract_lead_fields("it's riya dot sharma at gmail dot com") == {"email": "riya.sharma@gmail.com"}
+    assert extract_lead_fields("I'm a dropper, want to join next year") == {"grade": "Dropper", "timeline": "Next year"}
+
+
+def test_small_talk_yields_nothing():
+    for text in ("This is an amazing course", "I'm preparing hard", "What is the fee?", ""):
+        assert extract_lead_fields(text) == {}
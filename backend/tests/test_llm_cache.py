@@ -0,0 +1,75 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from livekit.agents.metrics import LLMMetrics
+
+from llm_cache import LLMCacheStats, PromptBuildCache, build_static_prefix
+
+
+def test_prefix_is_byte_stable():
+    a = build_static_prefix("  Be helpful.\n", catalog=[{"name": "Whopper", "price": 199}], faqs=[])
+    b = build_static_prefix("Be helpful.", faqs=[], catalog=[{"price": 199, "name": "Whopper"}])
+
+    assert a.text == b.text
+    assert a.digest == b.digest
+    assert a.text.index("CATALOG") < a.text.index("FAQS")
+
+
+def _metrics(cached: int, ttft: float) -> LLMMetrics:
+    return LLMMetrics(
+        label="test", request_id="r", timestamp=0.0, duration=1.0, ttft=ttft, cancelled=False,
+        completion_tokens=10, prompt_tokens=1000, prompt_cached_tokens=cached,
+        total_tokens=1010, tokens_per_second=10.0,
+    )
+
+
+def test_cache_stats_counts_hits_and_ttft():
+    stats = LLMCacheStats()
+    stats.collect(_metrics(0, 0.8))
+    stats.collect(_metrics(900, 0.4))
+
+    summary = stats.summary()
+    assert summary["cache_hits"] == 1
+    assert summary["cache_misses"] == 1
+    assert summary["cached_token_ratio"] == 0.45
+    assert summary["avg_ttft"] == 0.6
+
+
+def test_prompt_build_cache_rebuilds_only_on_content_change(tmp_path):
+    content_path = tmp_path / "content.json"
+    content_path.write_text(json.dumps({"faqs": ["a"]}))
+    cache = PromptBuildCache(check_interval=0)
+
+    def render(content):
+        return build_static_prefix("Be helpful.", faqs=content["faqs"])
+
+    content, first = cache.get(content_path, render)
+    _, again = cache.get(content_path, render)
+    assert content == {"faqs": ["a"]}
+    assert again is first
+    assert cache.renders == 1
+
+    # Same bytes with a new mtime: re-hashed, not re-rendered
+    os.utime(content_path, ns=(0, 10**9))
+    assert cache.get(content_path, render)[1] is first
+    assert cache.renders == 1
+
+    content_path.write_text(json.dumps({"faqs": ["a", "b"]}))
+    os.utime(content_path, ns=(0, 2 * 10**9))
+    content, changed = cache.get(content_path, render)
+    assert content == {"faqs": ["a", "b"]}
+    assert changed.digest != first.digest
+    assert cache.renders == 2
+
+
+def test_pw_agents_share_the_rendered_prompt():
+    from agent_pw import PhysicsWallahSDRAgent
+
+    first, second = PhysicsWallahSDRAgent(), PhysicsWallahSDRAgent()
+    assert first.static_prefix is second.static_prefix
+    assert first.faq_index is second.faq_index
+    assert "KNOWLEDGE BASE" in first.static_prefix.text
@@ -0,0 +1,124 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from livekit.agents import APIConnectionError, APIConnectOptions, llm, utils
+
+import llm_hedge
+from llm_hedge import HedgedLLM
+
+NO_RETRY = APIConnectOptions(max_retry=0, timeout=5.0)
+
+
+class DelayedLLM(llm.LLM):
+    """Stand-in model: answers with a tool call after `ttft` seconds."""
+
+    def __init__(self, model: str, ttft: float, fail: bool = False):
+        super().__init__()
+        self._model = model
+        self.ttft = ttft
+        self.fail = fail
+        self.requests = 0
+        self.closed = 0
+
+    @property
+    def model(self) -> str:
+        return self._model
+
+    def chat(self, *, chat_ctx, tools=None, conn_options=NO_RETRY, **kwargs):
+        self.requests += 1
+        return _DelayedStream(self, chat_ctx=chat_ctx, tools=tools or [], conn_options=conn_options)
+
+
+class _DelayedStream(llm.LLMStream):
+    async def _run(self) -> None:
+        try:
+            await asyncio.sleep(self._llm.ttft)
+            if self._llm.fail:
+                raise APIConnectionError("model unavailable", retryable=False)
+            call = llm.FunctionToolCall(name="add_to_cart", arguments="{}", call_id=utils.shortuuid())
+            delta = llm.ChoiceDelta(role="assistant", content=f"from {self._llm.model}", tool_calls=[call])
+            self._event_ch.send_nowait(llm.ChatChunk(id=utils.shortuuid(), delta=delta))
+        except asyncio.CancelledError:
+            self._llm.closed += 1
+            raise
+
+
+async def _respond(hedged: HedgedLLM):
+    chunks = []
+    async with hedged.chat(chat_ctx=llm.ChatContext.empty(), conn_options=NO_RETRY) as stream:
+        async for chunk in stream:
+            chunks.append(chunk)
+    return chunks
+
+
+def _fresh_history():
+    llm_hedge._TTFT_HISTORY.clear()
+
+
+async def test_fast_primary_is_not_hedged():
+    _fresh_history()
+    primary, backup = DelayedLLM("primary", 0.05), DelayedLLM("backup", 0.01)
+    hedged = HedgedLLM(primary, backup, initial_deadline=0.3)
+
+    chunks = await _respond(hedged)
+
+    assert [c.delta.content for c in chunks] == ["from primary"]
+    assert backup.requests == 0
+    assert hedged.summary()["hedge_rate"] == 0.0
+
+
+async def test_slow_primary_loses_and_tool_call_is_forwarded_once():
+    _fresh_history()
+    primary, backup = DelayedLLM("primary", 0.6), DelayedLLM("backup", 0.05)
+    hedged = HedgedLLM(primary, backup, initial_deadline=0.1, probe_timeout=1.0)
+
+    chunks = await _respond(hedged)
+    tool_calls = [call for c in chunks for call in c.delta.tool_calls]
+
+    assert [c.delta.content for c in chunks] == ["from backup"]
+    assert len(tool_calls) == 1
+    assert hedged.stats["backup_wins"] == 1
+
+    # The losing primary is probed for its TTFT, then closed
+    await asyncio.sleep(0.6)
+    summary = hedged.summary()
+    assert summary["hedge_rate"] == 1.0
+    assert 0.3 < summary["latency_saved_total_s"] < 0.6
+
+
+async def test_primary_can_still_win_after_hedging():
+    _fresh_history()
+    primary, backup = DelayedLLM("primary", 0.15), DelayedLLM("backup", 1.0)
+    hedged = HedgedLLM(primary, backup, initial_deadline=0.1)
+
+    chunks = await _respond(hedged)
+
+    assert [c.delta.content for c in chunks] == ["from primary"]
+    assert hedged.stats["primary_wins"] == 1
+    assert backup.closed == 1
+
+
+async def test_failed_primary_falls_back_to_backup():
+    _fresh_history()
+    primary, backup = DelayedLLM("primary", 0.01, fail=True), DelayedLLM("backup", 0.01)
+    hedged = HedgedLLM(primary, backup, initial_deadline=1.0)
+
+    chunks = await _respond(hedged)
+
+    assert [c.delta.content for c in chunks] == ["from backup"]
+    assert hedged.stats["primary_failures"] == 1
+
+
+def test_deadline_tracks_p95_of_primary_ttft():
+    _fresh_history()
+    hedged = HedgedLLM(DelayedLLM("primary", 0), DelayedLLM("backup", 0), min_samples=20, max_deadline=4.0)
+    assert hedged.deadline() == hedged.initial_deadline
+
+    hedged.ttft_history.extend([0.5] * 95 + [3.0] * 5)
+    assert hedged.deadline() == 0.5
+
+    hedged.ttft_history.extend([3.0] * 10)
+    assert hedged.deadline() == 3.0
@@ -0,0 +1,18 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from loadtest import parse_args, run_level
+
+
+@pytest.mark.asyncio
+async def test_grocery_level_completes_every_turn():
+    args = parse_args(["--llm-latency", "0.01", "--stt-latency", "0", "--tts-latency", "0"])
+    report = await run_level("grocery", 3, args)
+
+    assert report["errors"] == 0
+    assert report["turns"] == 15
+    assert report["tool_p50_ms"] > 0
@@ -0,0 +1,95 @@
+import json
+import logging
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from log_pipeline import (
+    JsonFormatter,
+    LogPipeline,
+    SamplingFilter,
+    SizeAndTimeRotatingFileHandler,
+    parse_sampling,
+)
+
+
+def _record(msg, level=logging.INFO, name="livekit.agents", args=None, lineno=1):
+    return logging.LogRecord(name, level, __file__, lineno, msg, args, None)
+
+
+def test_samples_per_event_type_and_never_warnings():
+    sampling = SamplingFilter(parse_sampling("*metrics=0.25,livekit.agents:noise=0"), rate_cap=0)
+
+    kept = sum(sampling.filter(_record("STT metrics", lineno=1)) for _ in range(100))
+    assert kept == 25
+    assert sum(sampling.filter(_record("noise", lineno=2)) for _ in range(10)) == 0
+    assert all(sampling.filter(_record("STT metrics", level=logging.WARNING, lineno=3)) for _ in range(10))
+    assert all(sampling.filter(_record("Tool add_to_cart called: %s", args=("x",), lineno=4)) for _ in range(10))
+    assert sampling.dropped[f"livekit.agents:{__file__}:1"] == 75
+
+
+def test_f_string_messages_from_one_call_site_are_one_event_type():
+    sampling = SamplingFilter(parse_sampling("*joined=0.5"), rate_cap=0)
+
+    kept = sum(sampling.filter(_record(f"Room room-{i} joined")) for i in range(100))
+    assert kept == 50
+    assert len(sampling._state) == 1
+
+
+def test_rate_cap_reports_suppressed_count(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("log_pipeline.time.monotonic", lambda: clock[0])
+    sampling = SamplingFilter([], rate_cap=3)
+
+    assert [sampling.filter(_record("EOU event")) for _ in range(5)] == [True, True, True, False, False]
+    clock[0] += 1
+    record = _record("EOU event")
+    assert sampling.filter(record)
+    assert record.suppressed == 2
+
+
+def test_records_are_formatted_on_the_writer_thread(tmp_path):
+    handler = SizeAndTimeRotatingFileHandler(str(tmp_path / "agent.log"), max_bytes=0, interval_s=0, backup_count=1)
+    handler.setFormatter(JsonFormatter())
+    pipeline = LogPipeline([handler], SamplingFilter([], rate_cap=0))
+    log = logging.getLogger("test-log-pipeline")
+    log.propagate = False
+    log.addHandler(pipeline.handler)
+    pipeline.start()
+
+    class Loud:
+        formatted_by = None
+
+        def __str__(self):
+            import threading
+
+            Loud.formatted_by = threading.current_thread().name
+            return "loud"
+
+    try:
+        log.warning("value=%s", Loud(), extra={"room": "r1"})
+        pipeline.drain()
+    finally:
+        pipeline.stop()
+        log.removeHandler(pipeline.handler)
+
+    entry = json.loads((tmp_path / "agent.log").read_text().splitlines()[-1])
+    assert entry["message"] == "value=loud" and entry["room"] == "r1"
+    assert Loud.formatted_by != "MainThread"
+
+
+def test_rotates_on_size_and_age(tmp_path, monkeypatch):
+    path = tmp_path / "agent.log"
+    handler = SizeAndTimeRotatingFileHandler(str(path), max_bytes=200, interval_s=60, backup_count=3)
+    for i in range(5):
+        handler.emit(_record("x" * 80))
+    assert (tmp_path / "agent.log.1").exists()
+
+    backups = len(list(tmp_path.glob("agent.log.*")))
+    handler.emit(_record("small"))
+    monkeypatch.setattr("log_pipeline.time.time", lambda: handler.rollover_at + 1)
+    handler.emit(_record("next day"))
+    handler.close()
+    assert len(list(tmp_path.glob("agent.log.*"))) == backups + 1
+    assert "next day" in path.read_text()
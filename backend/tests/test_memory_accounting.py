@@ -0,0 +1,63 @@
+import sys
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from cart import Cart
+from memory_accounting import MemoryTracker, attribute, soak, subsystem_for
+
+
+class Session:
+    pass
+
+
+def test_subsystem_for_own_modules_and_livekit():
+    src = Path(__file__).resolve().parent.parent / "src"
+    assert subsystem_for(str(src / "cart.py")) == "cart"
+    assert subsystem_for(str(src / "mcp_integration.py")) == "mcp_client"
+    assert subsystem_for("/site-packages/livekit/agents/llm/chat_context.py") == "chat_history"
+    assert subsystem_for("/site-packages/livekit/agents/voice/agent.py") == "livekit"
+    assert subsystem_for("/usr/lib/python3/json/decoder.py") is None
+
+
+def test_attributes_growth_to_the_allocating_subsystem():
+    tracemalloc.start(8)
+    try:
+        before = tracemalloc.take_snapshot()
+        cart = Cart()
+        for i in range(2000):
+            cart.add_item(f"item-{i}", f"Item {i}", 99.0, 1)
+        by_subsystem = attribute(before, tracemalloc.take_snapshot())
+    finally:
+        tracemalloc.stop()
+    assert max(by_subsystem, key=by_subsystem.get) == "cart"
+
+
+def test_flags_objects_that_survive_teardown():
+    tracker = MemoryTracker(leak_grace_s=0.0, check_after_end=False)
+    kept = []
+
+    for n in range(2):
+        session = Session()
+        tracker.session_start(f"s{n}", {"session": session, "cart": Cart()})
+        if n == 1:
+            kept.append(session)
+        del session
+        tracker.session_end(f"s{n}")
+
+    assert tracker.check_leaks() == [("s1", "session")]
+    assert tracker.summary()["leaked_objects"] == {"session": 1}
+    # Reported once only
+    assert tracker.check_leaks() == []
+
+
+@pytest.mark.asyncio
+async def test_soak_reports_steady_state_without_leaks():
+    report = await soak("grocery", sessions=8, concurrency=4, llm_latency=0.001, warmup_waves=1)
+
+    assert report["errors"] == 0
+    assert report["leaked_objects"] == {}
+    assert report["per_concurrent_call_kb"] > 0
@@ -0,0 +1,59 @@
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from menu_search import MenuIndex, parse_price_range
+
+SHARED_DATA = Path(__file__).resolve().parent.parent.parent / "shared-data"
+
+
+def _index(name: str = "burgerking_content.json") -> MenuIndex:
+    return MenuIndex(json.loads((SHARED_DATA / name).read_text()))
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("something under ₹200", (None, 200.0)),
+    ("burger below 150 rupees", (None, 150.0)),
+    ("drinks between 50 and 100", (50.0, 100.0)),
+    ("more than rs 300", (300.0, None)),
+    ("a spicy burger", (None, None)),
+])
+def test_parse_price_range(query, expected):
+    assert parse_price_range(query)[:2] == expected
+
+
+def test_spicy_chicken_under_budget():
+    hits = _index("mcdonalds_content.json").search("something spicy with chicken under ₹200")
+
+    assert hits
+    assert all(hit.item["price"] <= 200 for hit in hits)
+    top = hits[0].item
+    assert "chicken" in (top["name"] + top["description"]).lower()
+
+
+def test_explicit_arguments_override_the_query():
+    hits = _index().search("burger", max_price=180, category="burgers")
+    assert hits and all(h.item["category"] == "Burgers" and h.item["price"] <= 180 for h in hits)
+
+
+def test_budget_only_query_lists_cheapest_first():
+    hits = _index().search("anything under 100")
+    prices = [hit.item["price"] for hit in hits]
+    assert prices and prices == sorted(prices) and max(prices) <= 100
+
+
+def test_no_match_within_budget_returns_nothing():
+    assert _index().search("family feast under 50") == []
+
+
+def test_search_takes_milliseconds():
+    index = _index()
+    start = time.perf_counter()
+    for _ in range(200):
+        index.search("flame grilled chicken burger under 250")
+    assert (time.perf_counter() - start) / 200 < 0.002
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import aiohttp
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from order_events import OrderEvent, OrderEventBus, OrderEventServer
+
+
+def _event(n: int) -> OrderEvent:
+    return OrderEvent(order_id=f"ORD-{n}", order={"order_id": f"ORD-{n}", "total": 100.0 * n})
+
+
+async def test_subscriber_resumes_after_last_seen_order():
+    bus = OrderEventBus(history_size=10)
+    for n in range(1, 4):
+        bus.publish(_event(n))
+
+    sub = bus.subscribe(after=f"{bus.epoch}-1")
+    bus.publish(_event(4))
+    received = [(await sub.get(timeout=1)).order_id for _ in range(3)]
+    assert received == ["ORD-2", "ORD-3", "ORD-4"]
+    assert not sub.reset
+
+
+async def test_unknown_resume_id_gets_a_reset_snapshot():
+    bus = OrderEventBus(history_size=3)
+    for n in range(1, 6):
+        bus.publish(_event(n))
+
+    # Order IDs repeat (one per second), so they are not resume points
+    for after in (f"{bus.epoch}-1", "other-epoch-5", f"{bus.epoch}-9", "ORD-4"):
+        sub = bus.subscribe(after=after)
+        assert sub.reset
+        assert [e.order_id for e in sub.backlog] == ["ORD-3", "ORD-4", "ORD-5"]
+
+    # The oldest retained event's predecessor is still a valid resume point
+    sub = bus.subscribe(after=f"{bus.epoch}-2")
+    assert not sub.reset and len(sub.backlog) == 3
+
+
+async def test_slow_subscriber_is_dropped_without_blocking_publisher():
+    bus = OrderEventBus(queue_size=2)
+    slow = bus.subscribe()
+    fast = bus.subscribe()
+    for n in range(1, 6):
+        bus.publish(_event(n))
+        await fast.get(timeout=1)
+
+    assert slow.lagged and slow.closed
+    assert await slow.get(timeout=1) is None
+    assert bus.subscriber_count == 1
+
+
+async def test_sse_stream_delivers_and_replays_from_last_event_id():
+    bus = OrderEventBus()
+    server = OrderEventServer(bus, port=0)
+    await server.start()
+    url = f"http://127.0.0.1:{server.port}"
+    try:
+        async with aiohttp.ClientSession() as http:
+            await http.post(f"{url}/orders/events", json=[{"order_id": "ORD-1"}, {"order_id": "ORD-2"}])
+            async with http.get(f"{url}/orders/stream", headers={"Last-Event-ID": f"{bus.epoch}-1"}) as resp:
+                bus.publish(_event(3))
+                ids, orders = [], []
+                while len(orders) < 2:
+                    line = (await asyncio.wait_for(resp.content.readline(), 2)).decode().strip()
+                    if line.startswith("id: "):
+                        ids.append(line[4:])
+                    if line.startswith("data: "):
+                        orders.append(json.loads(line[6:])["order_id"])
+            assert orders == ["ORD-2", "ORD-3"]
+            assert ids == [f"{bus.epoch}-2", f"{bus.epoch}-3"]
+
+            async with http.get(f"{url}/orders/stream", headers={"Last-Event-ID": "stale-7"}) as resp:
+                first = [(await asyncio.wait_for(resp.content.readline(), 2)).decode().strip() for _ in range(2)]
+            assert first == ["event: reset", 'data: {"snapshot": 3}']
+    finally:
+        await server.aclose()
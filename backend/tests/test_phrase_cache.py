@@ -0,0 +1,126 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from livekit import rtc
+
+from phrase_cache import PhraseCache, say_phrase, template_values
+
+
+class FakeStream:
+    def __init__(self, text: str):
+        self.text = text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return None
+
+    def __aiter__(self):
+        return self._frames()
+
+    async def _frames(self):
+        for _ in range(3):
+            frame = rtc.AudioFrame(b"\x01\x00" * 480, 24000, 1, 480)
+            yield type("Audio", (), {"frame": frame})()
+
+
+class FakeTTS:
+    provider = "fake"
+    sample_rate = 24000
+    num_channels = 1
+
+    def __init__(self, model: str = "voice-a"):
+        self.model = model
+        self.calls = []
+
+    def synthesize(self, text: str):
+        self.calls.append(text)
+        return FakeStream(text)
+
+
+async def _collect(stream):
+    return [frame async for frame in stream]
+
+
+@pytest.mark.asyncio
+async def test_second_play_is_served_from_disk(tmp_path):
+    cache = PhraseCache(cache_dir=tmp_path)
+    tts = FakeTTS()
+
+    first = await _collect(cache.stream(tts, "Hello"))
+    second = await _collect(cache.stream(tts, "Hello"))
+
+    assert tts.calls == ["Hello"]
+    assert cache.stats() == {"hits": 1, "misses": 1}
+    assert sum(f.samples_per_channel for f in first) == sum(f.samples_per_channel for f in second)
+
+
+@pytest.mark.asyncio
+async def test_voice_change_invalidates(tmp_path):
+    await _collect(PhraseCache(cache_dir=tmp_path).stream(FakeTTS("voice-a"), "Hello"))
+
+    cache = PhraseCache(cache_dir=tmp_path)
+    await _collect(cache.stream(FakeTTS("voice-b"), "Hello"))
+
+    assert not cache.has(FakeTTS("voice-a"), "Hello")
+    assert cache.has(FakeTTS("voice-b"), "Hello")
+
+
+@pytest.mark.asyncio
+async def test_template_only_synthesizes_fields_after_warmup(tmp_path):
+    cache = PhraseCache(cache_dir=tmp_path)
+    tts = FakeTTS()
+    template = "Added {item} to your cart."
+
+    await _collect(cache.stream_template(tts, template, item="a Whopper"))
+    tts.calls.clear()
+    await _collect(cache.stream_template(tts, template, item="fries"))
+
+    assert tts.calls == ["fries"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_for_one_phrase_both_store_it(tmp_path):
+    cache = PhraseCache(cache_dir=tmp_path)
+    tts = FakeTTS()
+
+    await asyncio.gather(_collect(cache.stream(tts, "Hello")), _collect(cache.stream(tts, "Hello")))
+
+    assert cache.has(tts, "Hello")
+    assert len(await _collect(cache.stream(tts, "Hello"))) == 3
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+@pytest.mark.asyncio
+async def test_say_phrase_caches_known_phrases_and_templates_only(tmp_path):
+    cache = PhraseCache(cache_dir=tmp_path)
+    tts = FakeTTS()
+    said = []
+
+    class Session:
+        def __init__(self):
+            self.tts = tts
+
+        def say(self, text, audio=None, **kwargs):
+            said.append((text, audio is not None))
+
+    template = "Removed {item} from your cart."
+    assert template_values(template, "Removed Whopper Jr from your cart.") == {"item": "Whopper Jr"}
+    await cache.warm(tts, ["Your cart is empty."], templates=[template])
+    assert tts.calls == ["Your cart is empty.", "Removed", "from your cart."]
+
+    session = Session()
+    for text in ("Your cart is empty.", "Removed Whopper from your cart.", "Here is your cart: 1x Whopper"):
+        say_phrase(session, cache, text, phrases=["Your cart is empty."], templates=[template])
+
+    assert said == [
+        ("Your cart is empty.", True),
+        ("Removed Whopper from your cart.", True),
+        ("Here is your cart: 1x Whopper", False),
+    ]
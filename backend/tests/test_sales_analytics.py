@@ -0,0 +1,88 @@
+import sys
+from datetime import date
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sales_analytics import SalesAnalytics
+from src.cart import Cart
+from src.order_manager import OrderManager
+
+CATEGORIES = {"bk-001": "Burgers", "bk-010": "Sides", "bk-050": "Deals"}
+
+
+def _order(order_id, timestamp, items):
+    return {
+        "order_id": order_id,
+        "timestamp": timestamp,
+        "items": [
+            {"id": item_id, "name": name, "price": price, "quantity": qty, "notes": None}
+            for item_id, name, price, qty in items
+        ],
+        "total": sum(price * qty for _, _, price, qty in items),
+        "status": "placed",
+    }
+
+
+def test_rollups_answer_day_and_week_reports(tmp_path):
+    analytics = SalesAnalytics(tmp_path / "sales.db", categories=CATEGORIES)
+    analytics.record_order(_order("ORD-1", "2025-11-24T12:05:00", [("bk-001", "Whopper", 199.0, 2)]))
+    analytics.record_order(
+        _order("ORD-2", "2025-11-24T12:40:00", [("bk-050", "Whopper Meal", 299.0, 1), ("bk-010", "Fries", 99.0, 1)])
+    )
+    analytics.record_order(_order("ORD-3", "2025-11-26T19:00:00", [("bk-001", "Whopper", 199.0, 1)]))
+
+    day = analytics.report(date(2025, 11, 24), date(2025, 11, 25))
+    assert day["orders"] == 2
+    assert day["revenue"] == 796.0
+    assert day["deal_attach_rate"] == 0.5
+    assert day["by_hour"] == [{"hour": "2025-11-24T12", "orders": 2, "revenue": 796.0}]
+    assert day["top_items"][0] == {"item_name": "Whopper", "quantity": 2, "revenue": 398.0}
+    assert {row["category"] for row in day["by_category"]} == {"Burgers", "Deals", "Sides"}
+
+    week = analytics.report(date(2025, 11, 24), date(2025, 12, 1))
+    assert week["orders"] == 3
+    assert week["top_items"][0]["quantity"] == 3
+    assert analytics.top_items_per_hour(date(2025, 11, 26), date(2025, 11, 27)) == {
+        "2025-11-26T19": [{"item": "Whopper", "quantity": 1, "revenue": 199.0}]
+    }
+
+
+def test_placed_orders_are_recorded_once(tmp_path):
+    orders_dir = tmp_path / "orders"
+    analytics = SalesAnalytics(tmp_path / "sales.db", categories=CATEGORIES)
+    manager = OrderManager(orders_dir=str(orders_dir), analytics=analytics)
+    cart = Cart()
+    cart.add_item("bk-050", "Whopper Meal", 299.0, 2)
+    manager.place_order(cart)
+    manager.drain_analytics()
+
+    row = analytics.conn.execute("SELECT orders, revenue, deal_orders FROM sales_hourly").fetchone()
+    assert tuple(row) == (1, 598.0, 1)
+    # Replaying the orders directory skips what place_order already recorded
+    assert analytics.backfill(orders_dir) == 0
+
+
+def test_orders_placed_in_the_same_second_get_their_own_files(tmp_path):
+    manager = OrderManager(orders_dir=str(tmp_path / "orders"))
+    cart = Cart()
+    cart.add_item("bk-001", "Whopper", 199.0)
+
+    order_ids = [manager.place_order(cart) for _ in range(3)]
+
+    assert len(set(order_ids)) == 3
+    assert [manager.get_order(order_id)["order_id"] for order_id in order_ids] == order_ids
+    assert len(list((tmp_path / "orders").glob("ORD-*.json"))) == 3
+
+
+def test_orders_sharing_an_id_are_both_recorded(tmp_path):
+    # Order files from before IDs were unique may share one
+    analytics = SalesAnalytics(tmp_path / "sales.db", categories=CATEGORIES)
+    first = dict(_order("ORD-1", "2025-11-24T12:05:00", [("bk-001", "Whopper", 199.0, 1)]), uid="a")
+    second = dict(_order("ORD-1", "2025-11-24T12:05:00", [("bk-010", "Fries", 99.0, 1)]), uid="b")
+
+    assert analytics.record_order(first) and analytics.record_order(second)
+    assert not analytics.record_order(first)
+    row = analytics.conn.execute("SELECT orders, revenue FROM sales_hourly").fetchone()
+    assert tuple(row) == (2, 298.0)
@@ -0,0 +1,98 @@
+import sys
+from dataclasses import asdict
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from cart import Cart
+from session_state import (
+    FileStateStore,
+    LocalRespServer,
+    RespStateStore,
+    SessionState,
+    SessionStateSync,
+    decode_state,
+    encode_state,
+    session_key,
+)
+
+
+def _cart() -> Cart:
+    cart = Cart()
+    cart.add_item("bk_whopper", "Whopper", 199.0, 2, "no onions")
+    cart.add_item("bk_fries_m", "Fries (Medium)", 99.0)
+    return cart
+
+
+def test_encoding_round_trips_and_is_compact():
+    state = SessionState.from_cart(_cart())
+    state.lead = {"name": "Riya", "target_exam": "NEET"}
+    state.lead_saved = True
+
+    data = encode_state(state)
+    decoded = decode_state(data)
+
+    assert [asdict(item) for item in decoded.cart] == [asdict(item) for item in state.cart]
+    assert decoded.lead == state.lead
+    assert decoded.lead_saved
+    assert len(data) < 150
+
+    restored = Cart()
+    decoded.restore_cart(restored)
+    assert restored.to_dict() == _cart().to_dict()
+
+
+async def test_file_store_expires_snapshots(tmp_path):
+    store = FileStateStore(tmp_path)
+    await store.save("k", b"data", ttl=60)
+    assert await store.load("k") == b"data"
+
+    await store.save("k", b"data", ttl=-1)
+    assert await store.load("k") is None
+
+
+async def test_clear_deletes_the_entry_after_pending_snapshots(tmp_path):
+    sync = SessionStateSync(FileStateStore(tmp_path), session_key("burgerking", "caller-1"))
+    sync.snapshot(SessionState.from_cart(_cart()))
+    sync.clear()
+    await sync.aclose()
+    assert await sync.restore() is None
+
+    sync.snapshot(SessionState.from_cart(_cart()))
+    await sync.aclose()
+    assert (await sync.restore()).cart
+
+
+async def test_session_moves_between_nodes_through_resp_stand_in():
+    server = LocalRespServer(port=0)
+    await server.start()
+    node_a = RespStateStore(port=server.port)
+    node_b = RespStateStore(port=server.port)
+    key = session_key("burgerking", "caller-1")
+
+    try:
+        sync = SessionStateSync(node_a, key)
+        for quantity in range(1, 4):
+            cart = _cart()
+            cart.update_quantity("bk_fries_m", quantity)
+            sync.snapshot(SessionState.from_cart(cart))
+        await sync.aclose()
+
+        restored = await SessionStateSync(node_b, key).restore()
+        assert restored.cart[1].quantity == 3
+
+        await node_b.delete(key)
+        assert await node_a.load(key) is None
+    finally:
+        await node_a.aclose()
+        await node_b.aclose()
+        await server.aclose()
+
+
+async def test_restore_survives_a_missing_or_corrupt_snapshot(tmp_path):
+    store = FileStateStore(tmp_path)
+    sync = SessionStateSync(store, "k")
+    assert await sync.restore() is None
+
+    await store.save("k", b"garbage")
+    assert await sync.restore() is None
@@ -0,0 +1,217 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from livekit import rtc
+from livekit.agents import APIConnectionError, stt
+from livekit.agents.types import (
+    DEFAULT_API_CONNECT_OPTIONS,
+    NOT_GIVEN,
+    APIConnectOptions,
+)
+
+from stt_hedge import HedgedSTT
+
+NO_RETRY = APIConnectOptions(max_retry=0, timeout=1.0)
+
+
+class LatencySTT(stt.STT):
+    """Local stand-in provider: transcribes the first utterance after a fixed delay, then ends it."""
+
+    def __init__(self, text: str, interim_delay: float, final_delay: float, fail: bool = False):
+        super().__init__(capabilities=stt.STTCapabilities(streaming=True, interim_results=True))
+        self.text = text
+        self.interim_delay = interim_delay
+        self.final_delay = final_delay
+        self.fail = fail
+        self.streams = 0
+
+    async def _recognize_impl(self, buffer, *, language=NOT_GIVEN, conn_options=DEFAULT_API_CONNECT_OPTIONS):
+        await asyncio.sleep(self.final_delay)
+        return _event(stt.SpeechEventType.FINAL_TRANSCRIPT, self.text)
+
+    def stream(self, *, language=NOT_GIVEN, conn_options=DEFAULT_API_CONNECT_OPTIONS):
+        self.streams += 1
+        return _LatencyStream(stt=self, conn_options=conn_options)
+
+
+class _LatencyStream(stt.RecognizeStream):
+    async def _run(self) -> None:
+        async for _ in self._input_ch:
+            break
+        if self._stt.fail:
+            raise APIConnectionError("provider down", retryable=False)
+        self._event_ch.send_nowait(_event(stt.SpeechEventType.START_OF_SPEECH))
+        await asyncio.sleep(self._stt.interim_delay)
+        self._event_ch.send_nowait(_event(stt.SpeechEventType.INTERIM_TRANSCRIPT, self._stt.text[:3]))
+        await asyncio.sleep(max(self._stt.final_delay - self._stt.interim_delay, 0))
+        self._event_ch.send_nowait(_event(stt.SpeechEventType.FINAL_TRANSCRIPT, self._stt.text))
+        self._event_ch.send_nowait(_event(stt.SpeechEventType.END_OF_SPEECH))
+        async for _ in self._input_ch:
+            pass
+
+
+class ScriptedSTT(LatencySTT):
+    """Provider that sends (seconds after first audio, type, text) events in order."""
+
+    def __init__(self, script):
+        super().__init__("", interim_delay=0, final_delay=0)
+        self.script = script
+
+    def stream(self, *, language=NOT_GIVEN, conn_options=DEFAULT_API_CONNECT_OPTIONS):
+        self.streams += 1
+        return _ScriptedStream(stt=self, conn_options=conn_options)
+
+
+class _ScriptedStream(stt.RecognizeStream):
+    async def _run(self) -> None:
+        async for _ in self._input_ch:
+            break
+        start = asyncio.get_running_loop().time()
+        for at, type, text in self._stt.script:
+            await asyncio.sleep(max(start + at - asyncio.get_running_loop().time(), 0))
+            self._event_ch.send_nowait(_event(type, text))
+        async for _ in self._input_ch:
+            pass
+
+
+def _event(type, text=""):
+    return stt.SpeechEvent(type=type, alternatives=[stt.SpeechData(language="en", text=text)] if text else [])
+
+
+def _frame(voiced: bool = True):
+    samples = (np.sin(np.arange(160) / 3) * (8000 if voiced else 0)).astype(np.int16)
+    return rtc.AudioFrame(samples.tobytes(), sample_rate=16000, num_channels=1, samples_per_channel=160)
+
+
+async def _transcribe(hedged: HedgedSTT, voiced: float, seconds: float):
+    """Push `voiced` seconds of speech followed by silence, up to `seconds` in total."""
+    stream = hedged.stream(conn_options=NO_RETRY)
+    events = []
+
+    async def feed():
+        for i in range(int(seconds / 0.01)):
+            stream.push_frame(_frame(voiced=i < voiced / 0.01))
+            await asyncio.sleep(0.01)
+        stream.end_input()
+
+    async def read():
+        async for ev in stream:
+            events.append(ev)
+
+    await asyncio.gather(feed(), read())
+    await stream.aclose()
+    return [(ev.type, ev.alternatives[0].text if ev.alternatives else "") for ev in events]
+
+
+async def test_fast_primary_is_not_hedged():
+    primary = LatencySTT("a whopper please", interim_delay=0.05, final_delay=0.2)
+    secondary = LatencySTT("secondary", interim_delay=0.05, final_delay=0.1)
+    hedged = HedgedSTT(primary, secondary, deadline=0.3)
+
+    events = await _transcribe(hedged, voiced=0.15, seconds=0.6)
+
+    assert (stt.SpeechEventType.FINAL_TRANSCRIPT, "a whopper please") in events
+    assert secondary.streams == 0
+    assert hedged.stats["utterances"] == 1 and hedged.stats["hedged"] == 0
+
+
+async def test_stalled_primary_hedges_and_secondary_wins():
+    primary = LatencySTT("primary", interim_delay=1.0, final_delay=1.2)
+    # Finals well after the voiced audio ends, or the rest of it would start a second utterance
+    secondary = LatencySTT("a whopper please", interim_delay=0.05, final_delay=0.3)
+    hedged = HedgedSTT(primary, secondary, deadline=0.2)
+
+    events = await _transcribe(hedged, voiced=0.3, seconds=1.5)
+    finals = [text for type, text in events if type == stt.SpeechEventType.FINAL_TRANSCRIPT]
+
+    assert finals == ["a whopper please"]
+    assert secondary.streams == 1
+    assert hedged.stats["secondary_wins"] == 1
+    assert hedged.win_rates()["secondary_win_rate"] == 1.0
+
+
+async def test_primary_can_still_win_after_hedging():
+    primary = LatencySTT("a whopper please", interim_delay=0.4, final_delay=0.45)
+    secondary = LatencySTT("secondary", interim_delay=0.5, final_delay=1.0)
+    hedged = HedgedSTT(primary, secondary, deadline=0.2)
+
+    events = await _transcribe(hedged, voiced=0.3, seconds=1.2)
+    finals = [text for type, text in events if type == stt.SpeechEventType.FINAL_TRANSCRIPT]
+
+    assert finals == ["a whopper please"]
+    assert hedged.stats["primary_wins"] == 1
+
+
+async def test_late_primary_final_is_dropped_for_its_own_utterance_only():
+    primary = ScriptedSTT(
+        [
+            (0.9, stt.SpeechEventType.INTERIM_TRANSCRIPT, "a wh"),
+            (1.0, stt.SpeechEventType.FINAL_TRANSCRIPT, "a whopper please"),
+            (1.05, stt.SpeechEventType.END_OF_SPEECH, ""),
+            (1.3, stt.SpeechEventType.FINAL_TRANSCRIPT, "and a pepsi"),
+            (1.35, stt.SpeechEventType.END_OF_SPEECH, ""),
+        ]
+    )
+    secondary = LatencySTT("a whopper please", interim_delay=0.05, final_delay=0.3)
+    hedged = HedgedSTT(primary, secondary, deadline=0.2)
+
+    events = await _transcribe(hedged, voiced=0.3, seconds=1.6)
+    finals = [text for type, text in events if type == stt.SpeechEventType.FINAL_TRANSCRIPT]
+
+    # The primary's late transcript of the first utterance (interim and final) never reaches the session,
+    # and its next final is delivered
+    assert finals == ["a whopper please", "and a pepsi"]
+    assert (stt.SpeechEventType.INTERIM_TRANSCRIPT, "a wh") not in events
+    assert hedged.stats["late_finals_dropped"] == 1
+
+
+async def test_segmented_finals_of_the_winning_primary_are_all_delivered():
+    # Deepgram finals long speech in segments; the utterance ends at END_OF_SPEECH, not the first final
+    primary = ScriptedSTT(
+        [
+            (0.3, stt.SpeechEventType.INTERIM_TRANSCRIPT, "a wh"),
+            (0.35, stt.SpeechEventType.FINAL_TRANSCRIPT, "a whopper"),
+            (0.5, stt.SpeechEventType.FINAL_TRANSCRIPT, "and a pepsi"),
+            (0.55, stt.SpeechEventType.END_OF_SPEECH, ""),
+        ]
+    )
+    secondary = LatencySTT("secondary", interim_delay=0.1, final_delay=0.15)
+    hedged = HedgedSTT(primary, secondary, deadline=0.2)
+
+    events = await _transcribe(hedged, voiced=0.3, seconds=0.9)
+    finals = [text for type, text in events if type == stt.SpeechEventType.FINAL_TRANSCRIPT]
+
+    assert finals == ["a whopper", "and a pepsi"]
+    assert secondary.streams == 1
+    assert hedged.stats["utterances"] == 1 and hedged.stats["primary_wins"] == 1
+    assert hedged.stats["late_finals_dropped"] == 0
+
+
+async def test_failed_primary_falls_back_to_secondary():
+    primary = LatencySTT("primary", interim_delay=0.05, final_delay=0.1, fail=True)
+    secondary = LatencySTT("a whopper please", interim_delay=0.05, final_delay=0.1)
+    hedged = HedgedSTT(primary, secondary, deadline=0.5)
+
+    events = await _transcribe(hedged, voiced=0.3, seconds=0.5)
+
+    assert (stt.SpeechEventType.FINAL_TRANSCRIPT, "a whopper please") in events
+    assert hedged.stats["primary_failures"] == 1
+
+
+@pytest.mark.parametrize("primary_delay, winner, hedge_rate", [(0.05, "primary", 0.0), (1.0, "secondary", 1.0)])
+async def test_recognize_takes_first_final(primary_delay, winner, hedge_rate):
+    primary = LatencySTT("primary", interim_delay=0, final_delay=primary_delay)
+    secondary = LatencySTT("secondary", interim_delay=0, final_delay=0.05)
+    hedged = HedgedSTT(primary, secondary, deadline=0.2)
+
+    frame = _frame()
+    ev = await hedged.recognize(frame, conn_options=NO_RETRY)
+
+    assert ev.alternatives[0].text == winner
+    assert hedged.win_rates()["hedge_rate"] == hedge_rate
@@ -0,0 +1,60 @@
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from text_index import BM25Index, FAQIndex, tokenize
+
+SHARED_DATA = Path(__file__).resolve().parent.parent.parent / "shared-data"
+
+
+def _content(name: str):
+    return json.loads((SHARED_DATA / name).read_text())
+
+
+def test_tokenize_drops_stopwords_and_folds_plurals():
+    assert tokenize("What are the Batches for NEET droppers?") == ["batch", "neet", "dropper"]
+
+
+def test_faq_lookup_finds_the_relevant_answer():
+    index = FAQIndex.from_content(_content("pw_content.json"))
+
+    assert "fee" in index.lookup("how much are the fees")[0].title.lower()
+    assert "NEET" in index.lookup("medical entrance coaching")[0].title
+    assert index.context_for("zzz unrelated") is None
+
+
+def test_same_shape_works_for_tata_content():
+    index = FAQIndex.from_content(_content("day5_tata_content.json"))
+    assert "sales" in index.lookup("contact sales for a company")[0].title.lower()
+
+
+def test_bm25_prefers_rarer_terms_and_honours_mask():
+    index = BM25Index(["spicy chicken burger", "chicken nuggets", "veg burger", "chicken wrap"])
+    results = index.search("spicy chicken", k=2)
+    assert results[0][0] == 0
+
+    mask = [False, True, True, True]
+    assert all(doc_id != 0 for doc_id, _ in index.search("spicy chicken", k=3, mask=mask))
+
+
+def test_lookup_stays_fast_and_prompt_stays_flat_with_thousands_of_faqs():
+    from agent_pw import PhysicsWallahSDRAgent
+
+    content = _content("pw_content.json")
+    big = dict(content, faqs=content["faqs"] + [
+        {"question": f"Question {i} about topic{i} batch{i % 50}", "answer": f"Answer {i} for topic{i}."}
+        for i in range(5000)
+    ])
+
+    small_prompt = PhysicsWallahSDRAgent._get_instructions(content)
+    assert PhysicsWallahSDRAgent._get_instructions(big) == small_prompt
+
+    index = FAQIndex.from_content(big)
+    start = time.perf_counter()
+    for _ in range(100):
+        passages = index.lookup("topic4321 batch21")
+    assert (time.perf_counter() - start) / 100 < 0.005
+    assert passages[0].title.startswith("Question 4321 ")
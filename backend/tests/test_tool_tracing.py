@@ -0,0 +1,108 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from livekit.agents import Agent, RunContext, function_tool, llm
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+import tool_tracing
+from tool_tracing import TOOL_STATS, setup_tool_tracing, traced_tool
+
+EXPORTER = InMemorySpanExporter()
+
+
+class ShopAgent(Agent):
+    def __init__(self):
+        super().__init__(instructions="test")
+
+    @function_tool
+    @traced_tool
+    async def add_to_cart(self, ctx: RunContext, item_name: str, quantity: int = 1):
+        """Add an item to the cart."""
+        if item_name == "unicorn":
+            raise ValueError("not on the menu")
+        return f"Added {quantity}x {item_name}"
+
+    @traced_tool(name="mcp.todoist.create_tasks")
+    async def create_tasks(self, configured: bool):
+        if not configured:
+            return {"status": "error", "message": "Todoist not configured"}
+        return {"status": "success", "task_ids": ["t1"]}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def provider():
+    # Keep only errors and slow spans, so sampling is observable
+    provider = setup_tool_tracing(exporter=EXPORTER, sample_rate=0.0, slow_ms=1000)
+    yield provider
+    provider.force_flush()
+
+
+def _exported():
+    tool_tracing._provider.force_flush()
+    return EXPORTER.get_finished_spans()
+
+
+def test_traced_tool_keeps_the_tool_schema():
+    tool = ShopAgent().tools[0]
+    schema = llm.utils.build_legacy_openai_schema(tool, internally_tagged=True)
+    assert schema["name"] == "add_to_cart"
+    assert set(schema["parameters"]["properties"]) == {"item_name", "quantity"}
+
+
+async def test_calls_are_counted_and_only_errors_exported_at_zero_sample_rate():
+    agent = ShopAgent()
+    EXPORTER.clear()
+    assert await agent.add_to_cart(None, "Whopper", 2) == "Added 2x Whopper"
+    with pytest.raises(ValueError):
+        await agent.add_to_cart(None, "unicorn")
+
+    spans = _exported()
+    assert [span.name for span in spans] == ["tool add_to_cart"]
+    assert spans[0].status.status_code.name == "ERROR"
+    assert spans[0].attributes["tool.args_bytes"] > 0
+    assert spans[0].events[0].name == "exception"
+
+    stats = TOOL_STATS.summary()["add_to_cart"]
+    assert stats["calls"] >= 2 and stats["error_rate"] > 0
+
+
+async def test_failures_reported_in_the_result_mark_the_span_as_an_error(monkeypatch):
+    monkeypatch.setattr(tool_tracing, "_current_room", lambda: "room-mcp")
+    agent = ShopAgent()
+    EXPORTER.clear()
+    await agent.create_tasks(True)
+    assert await agent.create_tasks(False) == {"status": "error", "message": "Todoist not configured"}
+
+    spans = _exported()
+    assert [(span.name, span.status.description) for span in spans] == [
+        ("tool mcp.todoist.create_tasks", "Todoist not configured")
+    ]
+    assert TOOL_STATS.summary("room-mcp")["mcp.todoist.create_tasks"]["error_rate"] == 0.5
+
+
+async def test_finished_sessions_are_dropped_from_the_stats(monkeypatch):
+    monkeypatch.setattr(tool_tracing, "_current_room", lambda: "room-done")
+    await ShopAgent().add_to_cart(None, "Whopper")
+    assert TOOL_STATS.summary("room-done")
+
+    TOOL_STATS.drop("room-done")
+    assert TOOL_STATS.summary("room-done") == {}
+    assert not any(session == "room-done" for session, _ in TOOL_STATS.durations)
+
+
+def test_file_exporter_appends_json_lines(tmp_path, monkeypatch):
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+
+    monkeypatch.setattr(tool_tracing, "TOOL_TRACE_FILE", tmp_path / "traces" / "spans.jsonl")
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(tool_tracing._build_exporter("file")))
+    for name in ("tool a", "tool b"):
+        provider.get_tracer("test").start_span(name).end()
+
+    lines = (tmp_path / "traces" / "spans.jsonl").read_text().splitlines()
+    assert [json.loads(line)["name"] for line in lines] == ["tool a", "tool b"]
@@ -0,0 +1,102 @@
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from livekit.agents.metrics import EOUMetrics, LLMMetrics, STTMetrics, VADMetrics
+
+from usage_ledger import UsageLedger, usage_from_metrics
+
+
+def _llm(prompt=1000, cached=0, completion=100):
+    return LLMMetrics(
+        label="google.LLM", request_id="r", timestamp=0.0, duration=0.5, ttft=0.2, cancelled=False,
+        completion_tokens=completion, prompt_tokens=prompt, prompt_cached_tokens=cached,
+        total_tokens=prompt + completion, tokens_per_second=50.0,
+    )
+
+
+def _stt(seconds=30.0):
+    return STTMetrics(label="deepgram.STT", request_id="r", timestamp=0.0, duration=0.0,
+                      audio_duration=seconds, streamed=True)
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = UsageLedger(tmp_path / "usage.db", flush_interval=0)
+    yield ledger
+    ledger.close()
+
+
+def test_prices_billable_metrics_only():
+    kind, _, counts = usage_from_metrics(_llm(prompt=1_000_000, cached=1_000_000, completion=0))
+    assert kind == "llm" and counts["cost"] == pytest.approx(0.075)
+    assert usage_from_metrics(_stt(60))[2]["cost"] == pytest.approx(0.0077)
+    vad = VADMetrics(label="vad", timestamp=0.0, idle_time=0.0, inference_duration_total=0.0, inference_count=1)
+    assert usage_from_metrics(vad) is None
+
+
+def test_rollups_per_minute_hour_and_day(ledger):
+    # Recent, or minute rows would be pruned as past retention
+    start = (datetime.now() - timedelta(days=1)).replace(hour=10, minute=0, second=30, microsecond=0)
+    day = start.date().isoformat()
+    next_day = (start.date() + timedelta(days=1)).isoformat()
+    for minute in range(3):
+        for room in ("room-a", "room-b"):
+            ledger.record("grocery", room, "llm", "gemini-2.5-flash", usage_from_metrics(_llm())[2],
+                          at=start + timedelta(minutes=minute))
+    assert ledger.flush() == 6
+
+    minutes = ledger.report(day, next_day, by="minute")
+    assert [row["bucket"] for row in minutes] == [f"{day}T10:00", f"{day}T10:01", f"{day}T10:02"]
+    assert minutes[0]["events"] == 2
+    (hour,) = ledger.report(day, next_day, by="hour")
+    (total,) = ledger.report(day, next_day, by="day")
+    assert hour["events"] == total["events"] == 6 and total["prompt_tokens"] == 6000
+    assert ledger.room_usage("room-a")["llm"]["completion_tokens"] == 300
+
+
+def test_cost_per_order_counts_only_converting_calls(ledger):
+    for n in range(3):
+        usage = ledger.session("grocery", f"room-{n}")
+        usage.collect(_llm(prompt=100_000))
+        usage.collect(_stt())
+        if n < 2:
+            # Order IDs are per second, so two calls can place the same one
+            usage.outcome("order", "ORD-1", value=500.0)
+        usage.close()
+
+    today = datetime.now().date()
+    result = ledger.cost_per_outcome("order", today.isoformat(), (today + timedelta(days=1)).isoformat())
+    per_call = usage.cost
+    assert result["outcomes"] == 2 and result["calls"] == 3
+    assert result["cost_per_outcome"] == pytest.approx(per_call, rel=1e-3)
+    assert result["all_calls_cost_per_outcome"] == pytest.approx(per_call * 1.5, rel=1e-3)
+
+
+def test_alerts_when_cost_per_call_drifts(ledger):
+    def call(prompt):
+        usage = ledger.session("pw", "room")
+        usage.collect(_llm(prompt=prompt))
+        return usage.close()
+
+    assert all(call(10_000) is None for _ in range(25))
+    alerts = [call(20_000) for _ in range(20)]
+    assert alerts[0] is None
+    assert alerts[-1]["ratio"] > 1.25
+
+
+def test_turns_count_user_turns_not_llm_requests(ledger):
+    usage = ledger.session("grocery", "room")
+    eou = EOUMetrics(timestamp=0.0, end_of_utterance_delay=0.3, transcription_delay=0.1,
+                     on_user_turn_completed_delay=0.0, speech_id="s")
+    # One user turn that took a tool call: two LLM requests
+    usage.collect(eou)
+    usage.collect(_llm())
+    usage.collect(_llm())
+    usage.close()
+    assert usage.turns == 1
+    assert ledger.conn.execute("SELECT turns FROM usage_sessions").fetchone()[0] == 1
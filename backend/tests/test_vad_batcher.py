@@ -0,0 +1,38 @@
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from livekit.plugins.silero import onnx_model
+
+from vad_batcher import BatchedOnnxModel, VADBatcher
+
+
+def test_batched_matches_per_stream_inference():
+    session = onnx_model.new_inference_session(force_cpu=True)
+    batcher = VADBatcher(session)
+    rng = np.random.default_rng(0)
+    streams = [rng.uniform(-0.5, 0.5, (8, 512)).astype(np.float32) for _ in range(4)]
+
+    expected = []
+    for audio in streams:
+        model = onnx_model.OnnxModel(onnx_session=session, sample_rate=16000)
+        expected.append([model(window) for window in audio])
+
+    results = [None] * len(streams)
+
+    def run(i):
+        model = BatchedOnnxModel(batcher=batcher, onnx_session=session, sample_rate=16000)
+        results[i] = [model(window) for window in streams[i]]
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(streams))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    np.testing.assert_allclose(results, expected, atol=1e-5)
+    assert batcher.stats()["batches"] > 0
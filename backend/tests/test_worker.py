@@ -0,0 +1,63 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+import worker
+from worker import DEFAULT_AGENT_TYPE, resolve_agent_type
+
+
+def _ctx(job_metadata, room_metadata=""):
+    room = SimpleNamespace(metadata=room_metadata)
+    return SimpleNamespace(job=SimpleNamespace(id="job-1", metadata=job_metadata, room=room))
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    calls = []
+
+    def fake_entrypoint(agent_type):
+        async def run(ctx):
+            calls.append((agent_type, ctx))
+
+        return run
+
+    monkeypatch.setattr(worker, "AGENT_TYPES", {name: fake_entrypoint(name) for name in worker.AGENT_TYPES})
+    return calls
+
+
+@pytest.mark.parametrize("agent_type", sorted(worker.AGENT_TYPES))
+async def test_entrypoint_dispatches_to_each_agent_type(dispatched, agent_type):
+    for metadata in (agent_type, f'{{"agent": "{agent_type}"}}', f"  {agent_type}\n"):
+        ctx = _ctx(metadata)
+        await worker.entrypoint(ctx)
+        assert dispatched[-1] == (agent_type, ctx)
+    assert len(dispatched) == 3
+
+
+async def test_room_metadata_is_used_when_dispatch_metadata_is_missing(dispatched):
+    await worker.entrypoint(_ctx("", room_metadata='{"agent": "pw"}'))
+    await worker.entrypoint(_ctx("burgerking", room_metadata="pw"))
+
+    assert [agent_type for agent_type, _ in dispatched] == ["pw", "burgerking"]
+
+
+@pytest.mark.parametrize(
+    "job_metadata, room_metadata",
+    [
+        (None, None),
+        ("", ""),
+        ("   ", "not json {"),
+        ("grocery", '{"agent": "grocery"}'),
+        ('{"agent_type": "pw"}', '["pw"]'),
+        ('{"agent": null}', "42"),
+    ],
+)
+async def test_unknown_or_missing_metadata_uses_the_default(dispatched, job_metadata, room_metadata):
+    assert resolve_agent_type(job_metadata, room_metadata) == DEFAULT_AGENT_TYPE
+
+    await worker.entrypoint(_ctx(job_metadata, room_metadata))
+    assert [agent_type for agent_type, _ in dispatched] == [DEFAULT_AGENT_TYPE]
@@ -14,6 +14,8 @@ const API_KEY = process.env.LIVEKIT_API_KEY;
 const API_SECRET = process.env.LIVEKIT_API_SECRET;
 const LIVEKIT_URL = process.env.LIVEKIT_URL;
 
+const CALLER_ID_PATTERN = /^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$/i;
+
 // don't cache the results
 export const revalidate = 0;
 
@@ -35,7 +37,13 @@ export async function POST(req: Request) {
 
     // Generate participant token
     const participantName = 'user';
-    const participantIdentity = `voice_assistant_user_${Math.floor(Math.random() * 10_000)}`;
+    // A stable identity lets the agent resume a dropped call; the caller id is a random UUID kept by
+    // the browser, so it cannot be guessed to read someone else's session
+    const callerId: unknown = body?.caller_id;
+    const participantIdentity =
+      typeof callerId === 'string' && CALLER_ID_PATTERN.test(callerId)
+        ? `voice_assistant_user_${callerId}`
+        : `voice_assistant_user_${crypto.randomUUID()}`;
     const roomName = `voice_assistant_room_${Math.floor(Math.random() * 10_000)}`;
 
     const participantToken = await createParticipantToken(
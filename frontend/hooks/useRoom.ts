@@ -3,6 +3,19 @@ import { Room, RoomEvent, TokenSource } from 'livekit-client';
 import { AppConfig } from '@/app-config';
 import { toastAlert } from '@/components/livekit/alert-toast';
 
+const CALLER_ID_KEY = 'voice-assistant-caller-id';
+
+// The agent keys resumable session state by participant identity, and every connection gets a
+// fresh room, so reconnects send the same random caller id
+function getCallerId(): string {
+  let callerId = window.localStorage.getItem(CALLER_ID_KEY);
+  if (!callerId) {
+    callerId = crypto.randomUUID();
+    window.localStorage.setItem(CALLER_ID_KEY, callerId);
+  }
+  return callerId;
+}
+
 export function useRoom(appConfig: AppConfig) {
   const aborted = useRef(false);
   const room = useMemo(() => new Room(), []);
@@ -52,6 +65,7 @@ export function useRoom(appConfig: AppConfig) {
               'X-Sandbox-Id': appConfig.sandboxId ?? '',
             },
             body: JSON.stringify({
+              caller_id: getCallerId(),
               room_config: appConfig.agentName
                 ? {
                     agents: [{ agent_name: appConfig.agentName }],